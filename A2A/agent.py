@@ -31,6 +31,9 @@ class A2Agent(object):
                 observation_viewmode='lit',
                 action_buffer=None,
                 rule_based=True,
+                world_state=None,
+                navigation_engine=None,
+                planner=None,
                 ):
         self.name = name
         self.model = model
@@ -48,18 +51,46 @@ class A2Agent(object):
         self.direction = None  # Assuming the initial direction is facing 'up' in the 2D plane
         self.rule_based = rule_based
         self.dt = dt
+        self.world_state = world_state # shared WorldStateCache, poses are read from its snapshot
+        self.navigation_engine = navigation_engine # shared NavigationEngine, moves all agents in batched ticks
+        self.planner = planner # shared RoadPlanner, used when Config.USE_PLANNER is set
         self.update_position_and_direction()
 
         
     def navigate(self, waypoint: List[int]):
         """Navigate to the waypoint"""
-        self.next_waypoint = Vector(int(waypoint[0]), int(waypoint[1]))
-        if self.rule_based:
-            self.navigate_rule_based()
+        destination = Vector(int(waypoint[0]), int(waypoint[1]))
+        if Config.USE_PLANNER and self.planner is not None:
+            # the LLM names the destination, the planner fills in the road waypoints
+            waypoints = self.planner.plan(self.position, destination)
         else:
-            self.navigate_vision_based()
+            waypoints = [destination]
+        if self.navigation_engine is not None:
+            self.next_waypoint = destination
+            self.navigation_engine.set_waypoints(self.name, [(w.x, w.y) for w in waypoints])
+            timeout = self.navigation_timeout(waypoints)
+            if not self.navigation_engine.wait(self.name, timeout):
+                # engine not ticking, or the actor is missing from the world state
+                self.navigation_engine.remove(self.name)
+                raise TimeoutError(f"{self.name} did not reach {destination} within {timeout:.1f} seconds")
+        else:
+            for self.next_waypoint in waypoints:
+                if self.rule_based:
+                    self.navigate_rule_based()
+                else:
+                    self.navigate_vision_based()
         self.update_position_and_direction()
         
+    def navigation_timeout(self, waypoints):
+        """Seconds to wait for the NavigationEngine: a multiple of the route's travel time at MIN_SPEED"""
+        distance = 0.0
+        previous = self.position
+        for waypoint in waypoints:
+            if previous is not None:
+                distance += previous.distance(waypoint)
+            previous = waypoint
+        return max(Config.NAVIGATION_MIN_TIMEOUT, distance / Config.MIN_SPEED * Config.NAVIGATION_TIMEOUT_FACTOR)
+
     def navigate_rule_based(self):
         while not self.walk_arrive_at_waypoint():
             while not self.align_direction():
@@ -112,8 +143,12 @@ class A2Agent(object):
             return None
         
     def parse(self, user_prompt: str):
+        return self.act(self.decide(user_prompt))
+
+    def decide(self, user_prompt: str):
+        """LLM step of `parse`: returns the chosen tool call without acting on it"""
         self.action_history = self.action_buffer.get_action_history(self.name)
-        result = self.model.function_calling(
+        return self.model.function_calling(
             system_prompt= self.system_prompt,
             user_prompt=user_prompt, # plan given by the user is integrated into this prompt
             functions=self.functions, # 给大模型选择function
@@ -121,16 +156,25 @@ class A2Agent(object):
             temperature=self.temperature
         )[0][0]
 
-        if result.type == "function":
+    def act(self, result):
+        """Action step of `parse`: executes a tool call returned by `decide`"""
+        if result is not None and result.type == "function":
             self._process_function_call(result)
             return 'success'
         else:
             print("No function call found in the result")
             return None
         
-    def update_position_and_direction(self):
+    def update_position_and_direction(self, fresh=False):
+        if self.world_state is not None:
+            pose = self.world_state.get_pose(self.name, fresh)
+            if pose is not None:
+                position, direction = pose[:2], pose[2]
+                self.position = Vector(position[0], position[1])
+                self.direction = direction
+                return position, direction
         position = self.client.d_get_location(self.name)[:-1] # Ignore Z coordinate
-        direction = self.client.d_get_orientation(self.name)[1] # Yaw
+        direction = self.client.d_get_rotation(self.name)[1] # Yaw
         self.position = Vector(position[0], position[1])
         self.direction = direction
         return position, direction
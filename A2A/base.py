@@ -1,86 +1,368 @@
-from Communicator import UnrealCV
+import threading
+import time
+from collections import deque
+
+from UE import UnrealCV
+from Config import Config
+
+
+def _sum_rotations(first, second):
+    # Rotate_Angle [duration, angle, direction]: durations and angles add up, direction follows the sign
+    angle = round(float(first.action_args[1]) + float(second.action_args[1]), 2)
+    duration = float(first.action_args[0]) + float(second.action_args[0])
+    if angle == 0:
+        return None
+    return Action(first.actor_name, first.action_command, [duration, angle, 1 if angle > 0 else -1])
+
+
+def _keep_last(first, second):
+    return second
+
+
+# how two consecutive commands of the same actor merge into one (None cancels both);
+# StepForward and MoveForward are issued from a fresh pose every tick, so queued repeats are redundant
+COALESCE_RULES = {
+    'Rotate_Angle': _sum_rotations,
+    'Move_Speed': _keep_last,
+    'StepForward': _keep_last,
+    'MoveForward': _keep_last,
+    'StopDeliveryMan': _keep_last,
+    'EnableController': _keep_last,
+}
+
+
+def coalesce(actions):
+    """Merge consecutive compatible actions of one actor with COALESCE_RULES."""
+    merged = []
+    for action in actions:
+        rule = COALESCE_RULES.get(action.action_command)
+        if rule is not None and merged and merged[-1].action_command == action.action_command:
+            merged[-1] = rule(merged[-1], action)
+            if merged[-1] is None:
+                merged.pop()
+        else:
+            merged.append(action)
+    return merged
+
+
+class ActionHistory:
+    """Most recent commands of one actor, rendered once per change."""
+    __slots__ = ('lines', '_text', 'lock')
+
+    def __init__(self, max_size=5):
+        self.lines = deque(maxlen=max_size)
+        self._text = None
+        self.lock = threading.Lock()
+
+    def append(self, action):
+        with self.lock:
+            self.lines.append(action.__str__())
+            self._text = None
+
+    def render(self, max_tokens=None):
+        """The history as text, keeping only the most recent lines that fit `max_tokens` (~4 chars per token)"""
+        with self.lock:
+            if max_tokens is None:
+                if self._text is None:
+                    self._text = "\n".join(self.lines)
+                return self._text
+            lines = list(self.lines)
+        budget = max_tokens * 4
+        kept = []
+        for line in reversed(lines):
+            budget -= len(line) + 1
+            if budget < 0:
+                break
+            kept.append(line)
+        return "\n".join(reversed(kept))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __str__(self):
+        return self.render()
+
+# lower lanes are drained first; everything not listed goes to NORMAL_PRIORITY
+EMERGENCY_PRIORITY = 0
+NORMAL_PRIORITY = 1
+ACTION_PRIORITIES = {
+    'StopDeliveryMan': EMERGENCY_PRIORITY,
+}
 
 class ActionBuffer:
-    def __init__(self, max_size=5, unrealcv_client: UnrealCV=None):
+    """Per-actor action queues fed by many producer threads and drained by one sender.
+
+    Producers only take the lock of the actor they push to (the buffer lock is held just to
+    create a new actor's queue), so agents never contend with each other or with the sender
+    for longer than a deque operation. Each queue has priority lanes, see ACTION_PRIORITIES.
+
+    Args:
+        max_size (int): Pending actions per actor.
+        unrealcv_client (UnrealCV): Client the batches are sent with.
+        flush_budget (int): Actions drained per actor and flush, before coalescing.
+        history_size (int): Commands kept per actor for `get_action_history`.
+        policy (str): What a push does when the actor's queue is full: 'overwrite' drops the
+            oldest lowest-priority action, 'drop' rejects the new one, 'block' waits up to
+            `block_timeout` for the sender to make room and then rejects it. An emergency
+            action cancels the actor's pending normal actions whatever the policy.
+    """
+    POLICIES = ('overwrite', 'drop', 'block')
+
+    def __init__(self, max_size=5, unrealcv_client: UnrealCV=None, flush_budget=Config.ACTION_FLUSH_BUDGET,
+                 history_size=None, policy='overwrite', block_timeout=1.0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown full-queue policy {policy}, use one of {self.POLICIES}")
         self.buffer = {}
+        self.history = {} # actor name -> ActionHistory of the commands pushed for it
+        self.history_size = max_size if history_size is None else history_size
         self.max_size = max_size
         self.unrealcv_client = unrealcv_client
+        self.flush_budget = flush_budget # actions drained per actor and flush
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.lock = threading.Lock() # guards creation of per-actor queues and histories
+        self.flush_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.flushes = 0
+        self.commands_per_tick = 0 # commands sent by the last flush
+        self.commands_sent = 0
+        self.commands_saved = 0 # actions merged away by coalescing
+
+    def _queue(self, actor_name):
+        queue = self.buffer.get(actor_name)
+        if queue is None:
+            with self.lock:
+                queue = self.buffer.get(actor_name)
+                if queue is None:
+                    queue = self.buffer[actor_name] = ActionQueue(self.max_size, self.policy, self.block_timeout)
+        return queue
 
-    def push_action(self, action):
-        if action.actor_name not in self.buffer:
-            self.buffer[action.actor_name] = ActionQueue(self.max_size)
-        self.buffer[action.actor_name].push_action(action)
+    def push_action(self, action, priority=None):
+        """Queue an action, returns False if the full-queue policy rejected it"""
+        accepted = self._queue(action.actor_name).push_action(action, priority)
+        if accepted:
+            self._record(action)
+        return accepted
 
-    def insert_action(self, action):
-        if action.actor_name not in self.buffer:
-            self.buffer[action.actor_name] = ActionQueue(self.max_size)
-        self.buffer[action.actor_name].insert_action(action)
+    def insert_action(self, action, priority=None):
+        accepted = self._queue(action.actor_name).insert_action(action, priority)
+        if accepted:
+            self._record(action)
+        return accepted
 
-    def pop_actions(self):
+    def _record(self, action):
+        history = self.history.get(action.actor_name)
+        if history is None:
+            with self.lock:
+                history = self.history.get(action.actor_name)
+                if history is None:
+                    history = self.history[action.actor_name] = ActionHistory(self.history_size)
+        history.append(action)
+
+    def pop_actions(self, budget=1):
         actions = []
-        for actor_name in self.buffer:
-            action = self.buffer[actor_name].pop_action()
-            if action is not None:
-                actions.append(action.__str__())
+        for queue in list(self.buffer.values()):
+            actions.extend(action.__str__() for action in queue.drain(budget))
         return actions
 
-    def get_action_history(self, actor_name):
-        if actor_name in self.buffer:
-            return self.buffer[actor_name].__str__()
+    def get_action_history(self, actor_name, max_tokens=None):
+        history = self.history.get(actor_name)
+        if history is not None:
+            return history.render(max_tokens)
         else:
             return ""
 
+    def flush(self, budget=None):
+        """Drain up to `budget` actions per actor, coalesce them and send them in one batch"""
+        budget = self.flush_budget if budget is None else budget
+        commands = []
+        drained = 0
+        # snapshot, producers may add actors while we drain
+        for queue in list(self.buffer.values()):
+            actions = queue.drain(budget)
+            drained += len(actions)
+            commands.extend(action.__str__() for action in coalesce(actions))
+        with self.flush_lock:
+            self.flushes += 1
+            self.commands_per_tick = len(commands)
+            self.commands_sent += len(commands)
+            self.commands_saved += drained - len(commands)
+        if len(commands) > 0:
+            # through the session, the socket is shared with pose queries on other threads
+            with self.unrealcv_client.session() as client:
+                client.request_batch_async(commands)
+        return len(commands)
+
     def send_actions(self):
-        actions = self.pop_actions()
-        if len(actions) > 0:
-            self.unrealcv_client.client.request_batch_async(actions)
+        return self.flush()
+
+    @property
+    def dropped(self):
+        return sum(queue.dropped for queue in list(self.buffer.values()))
+
+    @property
+    def overwritten(self):
+        return sum(queue.overwritten for queue in list(self.buffer.values()))
+
+    @property
+    def preempted(self):
+        return sum(queue.preempted for queue in list(self.buffer.values()))
+
+    def start(self, dt=Config.UE_UPDATE_DT):
+        """Flush from a dedicated sender thread every `dt` seconds"""
+        if self.thread is not None and self.thread.is_alive():
+            return self
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(dt,), daemon=True, name='action-sender')
+        self.thread.start()
+        return self
+
+    def stop(self, flush=True):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        if flush:
+            self.flush()
+
+    def _run(self, dt):
+        while not self.stop_event.is_set():
+            start = time.time()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing actions: {e}")
+            self.stop_event.wait(max(0.0, dt - (time.time() - start)))
 
     def display_actions(self):
         # write the actions in the buffer and update it into file
         with open("actions.txt", "w") as f:
-            for actor_name in self.buffer:
+            for actor_name, queue in list(self.buffer.items()):
                 f.write(f"{actor_name}:\n")
-                f.write(f"    {self.buffer[actor_name].__str__()}\n")
+                f.write(f"    {queue.__str__()}\n")
 
 class ActionQueue:
-    def __init__(self, max_size=5):
+    def __init__(self, max_size=5, policy='overwrite', block_timeout=1.0, priorities=NORMAL_PRIORITY + 1):
 
-        self.queue = []
+        self.lanes = [deque() for _ in range(priorities)] # lane 0 is drained first
         self.max_size = max_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.size = 0
+        self.not_full = threading.Condition(threading.Lock())
+        self.dropped = 0
+        self.overwritten = 0
+        self.preempted = 0 # normal actions cancelled by an emergency one
+
+    def _lane(self, action, priority):
+        if priority is None:
+            priority = ACTION_PRIORITIES.get(action.action_command, NORMAL_PRIORITY)
+        return min(max(priority, 0), len(self.lanes) - 1)
+
+    def _preempt(self, index):
+        # called with the lock held: an emergency action cancels everything queued behind it,
+        # otherwise older moves would be sent right after the stop and undo it
+        if index != EMERGENCY_PRIORITY:
+            return
+        for lane in self.lanes[index + 1:]:
+            self.preempted += len(lane)
+            self.size -= len(lane)
+            lane.clear()
 
-    def push_action(self, action):
-        if self.is_full():
-            self.pop_action()
-        self.queue.append(action)
+    def _make_room(self, index):
+        # called with the lock held, True once there is room for one more action in lane `index`
+        if self.size < self.max_size:
+            return True
+        # 'overwrite' may drop the oldest action of the pushed lane itself, the other policies
+        # only let higher-priority actions displace the oldest of the lowest non-empty lane
+        victims = self.lanes[index:] if self.policy == 'overwrite' else self.lanes[index + 1:]
+        for victim in reversed(victims):
+            if victim:
+                victim.popleft()
+                self.size -= 1
+                self.overwritten += 1
+                return True
+        if self.policy == 'block':
+            deadline = time.time() + self.block_timeout
+            while self.size >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.not_full.wait(remaining):
+                    break
+            if self.size < self.max_size:
+                return True
+        self.dropped += 1
+        return False
 
-    # insert action at the front of the queue
-    def insert_action(self, action):
-        self.queue.insert(0, action)
+    def push_action(self, action, priority=None):
+        index = self._lane(action, priority)
+        with self.not_full:
+            self._preempt(index)
+            if not self._make_room(index):
+                return False
+            self.lanes[index].append(action)
+            self.size += 1
+            return True
+
+    # insert action at the front of its lane
+    def insert_action(self, action, priority=None):
+        index = self._lane(action, priority)
+        with self.not_full:
+            self._preempt(index)
+            if not self._make_room(index):
+                return False
+            self.lanes[index].appendleft(action)
+            self.size += 1
+            return True
 
     def pop_action(self):
-        if self.is_empty():
-            return None
-        return self.queue.pop(0)
+        actions = self.drain(1)
+        return actions[0] if actions else None
+
+    def drain(self, budget):
+        """Pop up to `budget` actions, highest priority lane first"""
+        actions = []
+        with self.not_full:
+            for lane in self.lanes:
+                while lane and len(actions) < budget:
+                    actions.append(lane.popleft())
+            if actions:
+                self.size -= len(actions)
+                self.not_full.notify(len(actions))
+        return actions
 
     def is_empty(self):
-        return len(self.queue) == 0
+        return self.size == 0
 
     def is_full(self):
-        return len(self.queue) == self.max_size
+        return self.size >= self.max_size
+
+    def __len__(self):
+        return self.size
 
     def __str__(self):
-        return "\n".join([action.__str__() for action in self.queue])
+        with self.not_full:
+            return "\n".join([action.__str__() for lane in self.lanes for action in lane])
 
 class Action:
+    __slots__ = ('actor_name', 'action_command', 'action_args', '_command')
+
     def __init__(self, actor_name, action_command, action_args: list[str]):
 
         self.actor_name = actor_name
         self.action_command = action_command
-        self.action_args = action_args
+        self.action_args = tuple(action_args) # immutable, so the cached command cannot go stale
+        self._command = None
 
     def __str__(self):
-        if len(self.action_args) > 0:
-            action_args = " ".join([str(arg) for arg in self.action_args])
-        else:
-            action_args = ""
-        return f"vbp {self.actor_name} {self.action_command} {action_args}"
\ No newline at end of file
+        if self._command is None:
+            if len(self.action_args) > 0:
+                action_args = " ".join([str(arg) for arg in self.action_args])
+            else:
+                action_args = ""
+            self._command = f"vbp {self.actor_name} {self.action_command} {action_args}"
+        return self._command
+
+    def __repr__(self):
+        return f"Action({self.__str__()!r})"
@@ -0,0 +1,162 @@
+import numpy as np
+
+from Config import Config
+from .base import Action
+from .navigation import NavigationEngine
+
+
+class SteeringController(NavigationEngine):
+    """Continuous PID steering with dead reckoning between pose polls.
+
+    Every tick each agent gets a `Rotate_Angle` correction from a PID on its heading error
+    (Config.PID_KP/KI/KD) and a `Move_Speed` between Config.MIN_SPEED and MAX_SPEED. The pose is
+    then predicted from the commanded yaw and speed instead of being queried. An agent is
+    resynced with UE only when its predicted error (distance travelled since the last sync
+    times the observed drift rate) exceeds `max_error`, or when it may have reached its
+    waypoint. All agents that need a resync share one world-state query.
+
+    Args:
+        action_buffer (ActionBuffer): Buffer the commands are pushed to and flushed from.
+        world_state (WorldStateCache): Source of actor poses for resyncs.
+        dt (float): Tick length in seconds, also the duration of every command.
+        max_error (float): Predicted position error in cm that triggers a resync.
+        drift (float): Initial predicted error per cm travelled, refined from observed errors.
+    """
+
+    def __init__(self, action_buffer, world_state, dt=Config.UE_UPDATE_DT,
+                 arrive_distance=Config.WALK_ARRIVE_WAYPOINT_DISTANCE,
+                 max_error=Config.DEAD_RECKONING_MAX_ERROR, drift=Config.DEAD_RECKONING_DRIFT,
+                 kp=Config.PID_KP, ki=Config.PID_KI, kd=Config.PID_KD,
+                 min_speed=Config.MIN_SPEED, max_speed=Config.MAX_SPEED, max_yaw_rate=Config.MAX_YAW_RATE):
+        super().__init__(action_buffer, world_state, arrive_distance)
+        self.dt = dt
+        self.max_error = max_error
+        self.kp, self.ki, self.kd = kp, ki, kd
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.max_yaw_rate = max_yaw_rate
+
+        # per-agent state, row i belongs to self.names[i]
+        self.names = []
+        self.positions = np.zeros((0, 2))
+        self.yaws = np.zeros(0)
+        self.integral = np.zeros(0)
+        self.prev_error = np.zeros(0)
+        self.uncertainty = np.zeros(0)
+        self.since_sync = np.zeros(0)
+        self.synced = np.zeros(0, dtype=bool)
+        self.drift = np.zeros(0)
+        self.default_drift = drift
+
+        self.pose_queries = 0
+        self.distance_traveled = 0.0
+
+    @property
+    def queries_per_meter(self):
+        return self.pose_queries / max(self.distance_traveled / 100.0, 1e-9)
+
+    def _sync_agents(self, names):
+        # add rows for new agents and drop rows of agents that left, keeping row order stable
+        if names == self.names:
+            return
+        rows = {name: i for i, name in enumerate(self.names)}
+        keep = np.array([rows.get(name, -1) for name in names], dtype=np.int64)
+        new = keep < 0
+        keep[new] = 0
+
+        def take(array, fill):
+            out = array[keep] if len(array) else np.empty((len(names),) + array.shape[1:], array.dtype)
+            out[new] = fill
+            return out
+
+        self.positions = take(self.positions, np.nan)
+        self.yaws = take(self.yaws, np.nan)
+        self.integral = take(self.integral, 0.0)
+        self.prev_error = take(self.prev_error, 0.0)
+        self.uncertainty = take(self.uncertainty, np.inf)
+        self.since_sync = take(self.since_sync, 0.0)
+        self.synced = take(self.synced, False)
+        self.drift = take(self.drift, self.default_drift)
+        self.names = list(names)
+
+    def tick(self):
+        with self.lock:
+            names = list(self.routes)
+            targets = np.array([self.routes[name][0] for name in names], dtype=np.float64).reshape(-1, 2)
+        self._sync_agents(names)
+        if not names:
+            return 0
+        self.ticks += 1
+        dt = self.dt
+
+        # resync agents whose prediction is too uncertain or that may have arrived
+        to_target = targets - self.positions
+        distances = np.hypot(to_target[:, 0], to_target[:, 1])
+        resync = ~self.synced | (self.uncertainty > self.max_error) | \
+            (distances < self.arrive_distance + self.uncertainty)
+        resync_rows = np.flatnonzero(resync)
+        if len(resync_rows):
+            positions, yaws, found = self.world_state.get_poses([names[i] for i in resync_rows], fresh=True)
+            self.pose_queries += 1
+            rows = resync_rows[found]
+            observed = np.hypot(*(self.positions[rows] - positions[found]).T)
+            travelled = self.since_sync[rows]
+            learn = self.synced[rows] & (travelled > 0)
+            drift = 0.8 * self.drift[rows[learn]] + 0.2 * observed[learn] / travelled[learn]
+            self.drift[rows[learn]] = np.maximum(drift, 0.1 * self.default_drift)
+            self.positions[rows] = positions[found]
+            self.yaws[rows] = yaws[found]
+            self.uncertainty[rows] = 0.0
+            self.since_sync[rows] = 0.0
+            self.synced[rows] = True
+            to_target = targets - self.positions
+            distances = np.hypot(to_target[:, 0], to_target[:, 1])
+
+        active = self.synced.copy()
+        arrived = active & (self.uncertainty == 0.0) & (distances < self.arrive_distance)
+        moving = active & ~arrived
+
+        # PID on the signed heading error, positive turns right (clockwise yaw in UE)
+        headings = np.degrees(np.arctan2(to_target[:, 1], to_target[:, 0]))
+        error = (headings - self.yaws + 180.0) % 360.0 - 180.0
+        self.integral = np.where(moving, np.clip(self.integral + error * dt, -180.0, 180.0), 0.0)
+        derivative = np.where(moving, (error - self.prev_error) / dt, 0.0)
+        self.prev_error = np.where(moving, error, 0.0)
+        max_turn = self.max_yaw_rate * dt
+        turn = np.clip(self.kp * error + self.ki * self.integral + self.kd * derivative, -max_turn, max_turn)
+        turn = np.where(moving, turn, 0.0)
+
+        # full speed when aligned, slower while turning, no forward motion when facing away
+        alignment = np.cos(np.radians(error))
+        speed = np.where(alignment > 0, self.min_speed + (self.max_speed - self.min_speed) * alignment, 0.0)
+        speed = np.where(moving, np.minimum(speed, distances / dt), 0.0)
+
+        sent = 0
+        for i in np.flatnonzero(moving & (np.abs(turn) >= 0.5)):
+            angle = round(float(turn[i]), 2)
+            self.action_buffer.push_action(Action(names[i], 'Rotate_Angle', [dt, angle, 1 if angle > 0 else -1]))
+            sent += 1
+        for i in np.flatnonzero(speed > 0):
+            self.action_buffer.push_action(Action(names[i], 'Move_Speed', [round(float(speed[i]), 1), dt, 0]))
+            sent += 1
+        for i in np.flatnonzero(arrived):
+            if len(self.routes.get(names[i], ())) <= 1:
+                # last waypoint of the route
+                self.action_buffer.push_action(Action(names[i], 'StopDeliveryMan', []))
+                sent += 1
+
+        # dead reckoning from the commanded yaw and speed
+        self.yaws = self.yaws + turn
+        step = speed * dt
+        radians = np.radians(self.yaws)
+        self.positions = self.positions + step[:, None] * np.stack([np.cos(radians), np.sin(radians)], axis=1)
+        self.since_sync = self.since_sync + step
+        self.uncertainty = self.uncertainty + self.drift * step
+        self.distance_traveled += float(step.sum())
+
+        for i in np.flatnonzero(arrived):
+            self._advance_route(names[i])
+        if sent:
+            # rotation and speed commands of one agent share the tick and go out in the same flush
+            self.action_buffer.flush(budget=max(self.action_buffer.flush_budget, 3))
+        return sent
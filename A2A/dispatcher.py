@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+from Config import Config
+
+
+# run_round outcome of an agent whose decision or action did not finish in time
+TIMED_OUT = 'timeout'
+
+
+class DecisionResult(object):
+    __slots__ = ('agent', 'user_prompt', 'tool_call', 'error', 'latency')
+
+    def __init__(self, agent, user_prompt, tool_call=None, error=None, latency=0.0):
+        self.agent = agent
+        self.user_prompt = user_prompt
+        self.tool_call = tool_call
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class DecisionDispatcher(object):
+    """Runs the LLM decision step of many A2Agents concurrently.
+
+    `dispatch` issues `agent.decide(prompt)` for every (agent, user_prompt) pair on a thread
+    pool and yields each DecisionResult as soon as its call completes, so a round takes
+    about as long as its slowest call. `run_round` also executes every returned tool call
+    with `agent.act` on a separate pool, so a long navigation of one agent does not hold an
+    LLM slot or delay the others.
+
+    Args:
+        max_workers (int): Maximum number of concurrent LLM calls.
+        act_workers (int): Maximum number of agents acting at the same time.
+    """
+
+    def __init__(self, max_workers=Config.NUM_THREADS, act_workers=Config.NUM_THREADS):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+        self.act_executor = ThreadPoolExecutor(max_workers=act_workers, thread_name_prefix='act')
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def _decide(self, agent, user_prompt):
+        start = time.time()
+        try:
+            tool_call = agent.decide(user_prompt)
+            return DecisionResult(agent, user_prompt, tool_call, latency=time.time() - start)
+        except Exception as e:
+            return DecisionResult(agent, user_prompt, error=e, latency=time.time() - start)
+
+    def dispatch(self, requests, timeout=None):
+        """Yield a DecisionResult per (agent, user_prompt) pair, in completion order.
+
+        Raises concurrent.futures.TimeoutError once `timeout` seconds passed, decisions that
+        have not started by then are cancelled.
+        """
+        futures = [self.executor.submit(self._decide, agent, user_prompt) for agent, user_prompt in requests]
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                result = future.result()
+                with self.lock:
+                    self.calls += 1
+                    if not result.ok:
+                        self.errors += 1
+                if not result.ok:
+                    print(f"Error in decision of {result.agent.name}: {result.error}")
+                yield result
+        except FuturesTimeoutError:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def run_round(self, requests, timeout=None):
+        """Decide for every agent and act on each tool call as it arrives.
+
+        With `timeout`, the round returns after that many seconds with partial results: agents
+        whose decision or action has not finished are reported as TIMED_OUT and their pending
+        work is cancelled. Work that already started cannot be interrupted and finishes in
+        the background.
+
+        Returns:
+            dict: agent name -> return value of `agent.act`, None for failed decisions,
+                TIMED_OUT for agents that did not finish in time.
+        """
+        requests = list(requests)
+        deadline = None if timeout is None else time.time() + timeout
+        outcomes = {}
+        acting = {}
+        try:
+            for result in self.dispatch(requests, timeout):
+                if result.ok:
+                    acting[self.act_executor.submit(result.agent.act, result.tool_call)] = result.agent.name
+                else:
+                    outcomes[result.agent.name] = None
+        except FuturesTimeoutError:
+            pass
+        # actions already submitted get whatever is left of the round
+        remaining = None if deadline is None else max(0.0, deadline - time.time())
+        try:
+            for future in as_completed(acting, timeout=remaining):
+                outcomes[acting[future]] = self._action_outcome(acting[future], future)
+        except FuturesTimeoutError:
+            for future, name in acting.items():
+                if name not in outcomes:
+                    future.cancel()
+        timed_out = [agent.name for agent, _ in requests if agent.name not in outcomes]
+        for name in timed_out:
+            outcomes[name] = TIMED_OUT
+        if timed_out:
+            with self.lock:
+                self.timeouts += len(timed_out)
+            print(f"Decision round timed out after {timeout} seconds for {', '.join(timed_out)}")
+        return outcomes
+
+    def _action_outcome(self, name, future):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error in action of {name}: {e}")
+            return None
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.act_executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
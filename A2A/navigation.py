@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from Config import Config
+from .base import Action
+
+
+class NavigationEngine(object):
+    """Rule-based navigation for all active agents at once.
+
+    Each tick reads every agent's pose from one world-state snapshot, computes headings,
+    turn angles and arrival with NumPy, and pushes one `Rotate_Angle` or `StepForward`
+    per agent into the ActionBuffer, which sends them in a single batch.
+
+    Args:
+        action_buffer (ActionBuffer): Buffer the commands are pushed to and flushed from.
+        world_state (WorldStateCache): Source of actor poses.
+        arrive_distance (float): Distance at which a waypoint counts as reached.
+        align_angle (float): Heading error in degrees below which the agent steps instead of turning.
+        fresh_poses (bool): Force a pose query every tick instead of reusing a warm snapshot.
+    """
+
+    def __init__(self, action_buffer, world_state, arrive_distance=Config.WALK_ARRIVE_WAYPOINT_DISTANCE,
+                 align_angle=5, fresh_poses=True):
+        self.action_buffer = action_buffer
+        self.world_state = world_state
+        self.arrive_distance = arrive_distance
+        self.align_angle = align_angle
+        self.fresh_poses = fresh_poses
+
+        self.routes = {}  # agent name -> deque of (x, y) waypoints
+        self.arrived = {}  # agent name -> threading.Event
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.ticks = 0
+
+    def set_waypoints(self, agent_name, waypoints):
+        """Replace the route of an agent, waypoints are visited in order."""
+        with self.lock:
+            self.routes[agent_name] = deque((float(x), float(y)) for x, y in waypoints)
+            event = self.arrived.setdefault(agent_name, threading.Event())
+            event.clear()
+        return event
+
+    def remove(self, agent_name):
+        with self.lock:
+            self.routes.pop(agent_name, None)
+            event = self.arrived.pop(agent_name, None)
+        if event is not None:
+            event.set()
+
+    def is_active(self, agent_name):
+        return agent_name in self.routes
+
+    def wait(self, agent_name, timeout=None):
+        """Block until the agent reached its last waypoint, False on timeout."""
+        event = self.arrived.get(agent_name)
+        return True if event is None else event.wait(timeout)
+
+    def tick(self):
+        """Advance every active agent by one command, return the number of commands sent."""
+        with self.lock:
+            names = list(self.routes)
+            targets = np.array([self.routes[name][0] for name in names], dtype=np.float64).reshape(-1, 2)
+        if not names:
+            return 0
+        self.ticks += 1
+
+        positions, yaws, found = self.world_state.get_poses(names, fresh=self.fresh_poses)
+        to_target = targets - positions
+        distances = np.hypot(to_target[:, 0], to_target[:, 1])
+        arrived = found & (distances < self.arrive_distance)
+
+        # signed heading error in (-180, 180], positive turns right (clockwise yaw in UE)
+        headings = np.degrees(np.arctan2(to_target[:, 1], to_target[:, 0]))
+        turns = (headings - yaws + 180.0) % 360.0 - 180.0
+        rotate = found & ~arrived & (np.abs(turns) >= self.align_angle)
+        step = found & ~arrived & ~rotate
+
+        for i in np.flatnonzero(rotate):
+            angle = round(float(turns[i]), 2)
+            self.action_buffer.push_action(Action(names[i], 'Rotate_Angle', [1, angle, 1 if angle > 0 else -1]))
+        for i in np.flatnonzero(step):
+            self.action_buffer.push_action(Action(names[i], 'StepForward', []))
+        for i in np.flatnonzero(arrived):
+            self._advance_route(names[i])
+
+        sent = int(rotate.sum() + step.sum())
+        if sent:
+            self.action_buffer.send_actions()
+        return sent
+
+    def _advance_route(self, agent_name):
+        with self.lock:
+            route = self.routes.get(agent_name)
+            if route is None:
+                return
+            route.popleft()
+            if route:
+                return
+            del self.routes[agent_name]
+            event = self.arrived.get(agent_name)
+        if event is not None:
+            event.set()
+
+    def run(self, dt=Config.UE_UPDATE_DT, max_ticks=None):
+        """Tick every `dt` seconds until all agents arrived or `max_ticks` is reached."""
+        ticks = 0
+        while self.routes and (max_ticks is None or ticks < max_ticks) and not self.stop_event.is_set():
+            start = time.time()
+            self.tick()
+            ticks += 1
+            self.stop_event.wait(max(0.0, dt - (time.time() - start)))
+        return ticks
+
+    def start(self, dt=Config.UE_UPDATE_DT):
+        if self.thread is not None and self.thread.is_alive():
+            return self
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(dt,), daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self, dt):
+        while not self.stop_event.is_set():
+            start = time.time()
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error in navigation tick: {e}")
+            self.stop_event.wait(max(0.0, dt - (time.time() - start)))
@@ -27,6 +27,26 @@ class Config:
     PID_KP = 0.15
     PID_KI = 0.005
     PID_KD = 0.12
+    MAX_YAW_RATE = 90  # unit: degree/s
+    DEAD_RECKONING_MAX_ERROR = 100  # unit: cm, resync the pose with UE above this predicted error
+    DEAD_RECKONING_DRIFT = 0.05  # initial predicted error per cm travelled
+    NAVIGATION_TIMEOUT_FACTOR = 3  # navigate gives up after this many times the travel time at MIN_SPEED
+    NAVIGATION_MIN_TIMEOUT = 10  # unit: s
+
+    # Action buffer
+    ACTION_FLUSH_BUDGET = 4  # actions drained per actor and flush, before coalescing
+
+    # Camera capture
+    CAPTURE_RATE = 10  # unit: frames/s per registered camera
+    CAPTURE_MAX_STALENESS = 0.5  # unit: s
+
+    # LLM
+    LLM_IMAGE_MAX_SIDE = 768  # unit: px, frames are downscaled before upload
+    LLM_IMAGE_QUALITY = 85
+    LLM_IMAGE_FORMAT = 'jpeg'  # jpeg, png, webp
+    LLM_TRACE_ENABLED = False  # writes LLM_TRACE_DIR relative to the working directory
+    LLM_TRACE_DIR = 'traces'
+    LLM_TRACE_SAMPLE_RATE = 1.0  # fraction of LLM calls written to the trace
 
     # UE
     DELIVERY_MAN_MODEL_PATH = "/Game/TrafficSystem/Pedestrian/BP_DeliveryMan.BP_DeliveryMan_C"
@@ -1,13 +1,13 @@
 import math
 import json
-import re
-from Communicator.unrealcv_delivery import UnrealCvDelivery
+from .unrealcv_a2a import UnrealCvA2A
+from .pose_parser import PoseIndex
 from Base import DeliveryMan
 from typing import List
 from utils.Types import Vector
 from Config import Config
 
-class Communicator(UnrealCvDelivery):
+class Communicator(UnrealCvA2A):
     def __init__(self, port, ip, resolution):
         super().__init__(port, ip, resolution)
 
@@ -31,88 +31,118 @@ class Communicator(UnrealCvDelivery):
         self.d_rotate(self.get_delivery_man_name(delivery_man_id), angle, turn_direction)
 
     def get_position_and_direction(self, delivery_man_ids):
+        if self.delivery_manager_name is None:
+            print("Warning: delivery_manager_name is not set")
+            return {}
         try:
-            if self.delivery_manager_name is None:
-                print("Warning: delivery_manager_name is not set")
-                return {}
-
             info_str = self.get_informations(self.delivery_manager_name)
-            if not info_str:
-                print("Warning: No information received from Unreal Engine")
-                return {}
-            # print(f"Received info from UE: {info_str}")  # Debug print
-            info = json.loads(info_str)
+        except Exception as e:
+            print(f"Error in get_position_and_direction: {e}")
+            return {}
+        return self.parse_position_and_direction(info_str, delivery_man_ids)
+
+    def parse_position_and_direction(self, info_str, delivery_man_ids):
+        index = self.parse_pose_index(info_str)
+        if index is None:
+            return {}
+        try:
             result = {}
-            d_locations = info["DLocations"]
-            d_rotations = info["DRotations"]
-            s_locations = info["SLocations"]
-            s_rotations = info["SRotations"]
             for delivery_man_id in delivery_man_ids:
                 name = self.get_delivery_man_name(delivery_man_id)
-                # Parse location
-                location_pattern = f"{name}X=(.*?) Y=(.*?) Z="
-                match = re.search(location_pattern, d_locations)
-                if match:
-                    x, y = float(match.group(1)), float(match.group(2))
-                    position = Vector(x, y)
-                    # Parse rotation
-                    rotation_pattern = f"{name}P=.*? Y=(.*?) R="
-                    match = re.search(rotation_pattern, d_rotations)
-                    if match:
-                        direction = float(match.group(1))
-                        result[delivery_man_id] = (position, direction)
-                    else:
-                        print(f"Warning: Could not parse rotation for {name}")
-                    continue
-
-                match = re.search(location_pattern, s_locations)
-                if match:
-                    x, y = float(match.group(1)), float(match.group(2))
-                    position = Vector(x, y)
-                    # Parse rotation
-                    rotation_pattern = f"{name}P=.*? Y=(.*?) R="
-                    match = re.search(rotation_pattern, s_rotations)
-                    if match:
-                        direction = float(match.group(1))
-                        result[delivery_man_id] = (position, direction)    
-                    else:
-                        print(f"Warning: Could not parse rotation for {name}")
+                pose = index.get(name)
+                if pose is not None:
+                    x, y, direction = pose
+                    result[delivery_man_id] = (Vector(x, y), direction)
+                elif name in index.missing_rotation:
+                    print(f"Warning: Could not parse rotation for {name}")
                 else:
                     print(f"Warning: Could not parse location for {name}")
-
-
             return result
+        except Exception as e:
+            print(f"Error in get_position_and_direction: {e}")
+            return {}
+
+    def parse_pose_index(self, info_str):
+        # one pass over the DLocations/DRotations/SLocations/SRotations payloads, None on failure
+        try:
+            if not info_str:
+                print("Warning: No information received from Unreal Engine")
+                return None
+            return PoseIndex.from_informations(info_str)
         except json.JSONDecodeError as e:
             print(f"Error decoding JSON: {e}")
             print(f"Raw data: {info_str}")
-            return {}
+            return None
         except Exception as e:
             print(f"Error in get_position_and_direction: {e}")
-            return {}
-
-    def spawn_delivery_men(self, delivery_men: List[DeliveryMan]):
+            return None
+
+    def get_poses(self, delivery_man_ids):
+        """Poses of all requested delivery men from one informations query.
+
+        Returns:
+            positions (np.ndarray): (N, 2) x, y, NaN for delivery men that were not found.
+            yaws (np.ndarray): (N,) yaw in degrees, NaN for delivery men that were not found.
+            found (np.ndarray): (N,) bool mask.
+        """
+        names = [self.get_delivery_man_name(delivery_man_id) for delivery_man_id in delivery_man_ids]
+        index = None
+        if self.delivery_manager_name is not None:
+            index = self.parse_pose_index(self.get_informations(self.delivery_manager_name))
+        return (index or PoseIndex()).arrays(names)
+
+    def spawn_delivery_men(self, delivery_men: List[DeliveryMan], chunk_size=256):
+        """Spawn and configure delivery men with pipelined `request_batch` calls.
+
+        All spawn/location/orientation/scale/collision/mobility commands are built up front
+        and sent in chunks of `chunk_size` commands, so N actors cost about 6N / chunk_size
+        round trips instead of 6N.
+
+        Returns:
+            dict: delivery man id -> list of error responses, only for actors that failed.
+        """
+        commands, owners = self._spawn_commands(delivery_men)
+        responses = []
+        with self.session() as client:
+            for start in range(0, len(commands), chunk_size):
+                responses.extend(client.request_batch(commands[start:start + chunk_size]))
+        return self._spawn_errors(commands, owners, responses)
+
+    def _spawn_commands(self, delivery_men: List[DeliveryMan]):
+        # every setup command of every delivery man, with the id of the delivery man it belongs to
+        commands = []
+        owners = []
         for delivery_man in delivery_men:
             name = f'GEN_DELIVERY_MAN_{delivery_man.id}'
             self.delivery_man_id_to_name[delivery_man.id] = name
-            model_name = Config.DELIVERY_MAN_MODEL_PATH
-            self.spawn_bp_asset(model_name, name)
-            # Convert 2D position to 3D (x,y -> x,y,z)
-            location_3d = (
-                delivery_man.position.x,
-                delivery_man.position.y,
-                110 # Z coordinate (ground level)
-            )
-            # Convert 2D direction to 3D orientation (assuming rotation around Z axis)
-            orientation_3d = (
-                0,  # Pitch
-                math.degrees(math.atan2(delivery_man.direction.y, delivery_man.direction.x)),  # Yaw
-                0  # Roll
-            )
-            self.set_location(location_3d, name)
-            self.set_orientation(orientation_3d, name)
-            self.set_scale((1, 1, 1), name)  # Default scale
-            self.set_collision(name, True)
-            self.set_movable(name, True)
+            for cmd in self._delivery_man_spawn_commands(delivery_man, name):
+                commands.append(cmd)
+                owners.append(delivery_man.id)
+        return commands, owners
+
+    @staticmethod
+    def _spawn_errors(commands, owners, responses):
+        errors = {}
+        for cmd, owner, res in zip(commands, owners, responses):
+            if res is None or (isinstance(res, str) and res.lower().startswith('error')):
+                errors.setdefault(owner, []).append(f'{cmd}: {res}')
+        for delivery_man_id, messages in errors.items():
+            print(f"Warning: failed to spawn delivery man {delivery_man_id}: {messages}")
+        return errors
+
+    def _delivery_man_spawn_commands(self, delivery_man: DeliveryMan, name):
+        # Convert 2D position to 3D (x,y -> x,y,z), Z is the ground level
+        x, y, z = delivery_man.position.x, delivery_man.position.y, 110
+        # Convert 2D direction to 3D orientation (assuming rotation around Z axis)
+        yaw = math.degrees(math.atan2(delivery_man.direction.y, delivery_man.direction.x))
+        return [
+            f'vset /objects/spawn_bp_asset {Config.DELIVERY_MAN_MODEL_PATH} {name}',
+            f'vset /object/{name}/location {x} {y} {z}',
+            f'vset /object/{name}/rotation {0} {yaw} {0}',
+            f'vset /object/{name}/scale {1} {1} {1}',  # Default scale
+            f'vset /object/{name}/collision {True}',
+            f'vset /object/{name}/object_mobility {True}',
+        ]
 
     def spawn_delivery_manager(self):
         self.delivery_manager_name = 'GEN_DeliveryManager'
@@ -1,3 +1,13 @@
 from .Communicator import Communicator
 from .unrealcv_basic import UnrealCV
-from .unrealcv_a2a import UnrealCvA2A
\ No newline at end of file
+from .unrealcv_a2a import UnrealCvA2A
+
+_ASYNC = ('AsyncUnrealCV', 'AsyncUnrealCvA2A', 'AsyncCommunicator')
+
+
+def __getattr__(name):
+    # the asyncio client is only imported when it is asked for
+    if name in _ASYNC:
+        from . import unrealcv_async
+        return getattr(unrealcv_async, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import numpy as np
+
+from Config import Config
+
+
+class CapturedFrame(object):
+    __slots__ = ('camera_id', 'viewmode', 'image', 'timestamp', 'seq')
+
+    def __init__(self, camera_id, viewmode, image, timestamp, seq):
+        self.camera_id = camera_id
+        self.viewmode = viewmode
+        self.image = image
+        self.timestamp = timestamp
+        self.seq = seq
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+
+class CaptureService(object):
+    """Polls registered (camera_id, viewmode) pairs on a background thread.
+
+    Every pair is double buffered: the poller writes into the back buffer and then publishes
+    it, so `get_latest` never waits for a frame transfer or for the client lock. A published
+    image is rewritten two polls later; `get_latest(copy=True)` returns a copy that is safe
+    to keep.
+
+    Args:
+        client (UnrealCvA2A): Client used for `grab_camera_observation`.
+        rate (float): Polls per second of every registered pair.
+        max_staleness (float): Default age in seconds after which `get_latest` returns None.
+    """
+
+    def __init__(self, client, rate=Config.CAPTURE_RATE, max_staleness=Config.CAPTURE_MAX_STALENESS):
+        self.client = client
+        self.rate = rate
+        self.max_staleness = max_staleness
+
+        self.keys = []
+        self.buffers = {}  # (camera_id, viewmode) -> [array, array]
+        self.latest = {}  # (camera_id, viewmode) -> CapturedFrame
+        self.writing = {}  # (camera_id, viewmode) -> seq of the frame being written into its buffer
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def register(self, camera_id, viewmode='lit'):
+        key = (camera_id, viewmode)
+        with self.lock:
+            if key not in self.keys:
+                self.keys = self.keys + [key]
+
+    def unregister(self, camera_id, viewmode='lit'):
+        key = (camera_id, viewmode)
+        with self.lock:
+            self.keys = [k for k in self.keys if k != key]
+            self.buffers.pop(key, None)
+            self.latest.pop(key, None)
+            self.writing.pop(key, None)
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return self
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def get_latest(self, camera_id, viewmode='lit', max_staleness=None, copy=False):
+        """Most recent frame of a pair without blocking, None if missing or older than max_staleness.
+
+        Without `copy` the image is the published buffer itself, with `copy` it is copied out
+        and retried if the poller started rewriting that buffer meanwhile.
+        """
+        key = (camera_id, viewmode)
+        frame = self.latest.get(key)
+        max_staleness = self.max_staleness if max_staleness is None else max_staleness
+        if frame is None or (max_staleness is not None and frame.age > max_staleness):
+            return None
+        while copy:
+            image = frame.image.copy()
+            # the buffer of frame `seq` is rewritten by frame `seq + 2`
+            if self.writing.get(key, 0) < frame.seq + 2:
+                return CapturedFrame(frame.camera_id, frame.viewmode, image, frame.timestamp, frame.seq)
+            frame = self.latest.get(key)
+            if frame is None:
+                return None
+        return frame
+
+    def wait_for_frame(self, camera_id, viewmode='lit', after_seq=0, timeout=None):
+        """Block until a frame newer than `after_seq` is published, None on timeout."""
+        key = (camera_id, viewmode)
+        with self.new_frame:
+            self.new_frame.wait_for(
+                lambda: key in self.latest and self.latest[key].seq > after_seq, timeout)
+            frame = self.latest.get(key)
+        if frame is None or frame.seq <= after_seq:
+            return None
+        return frame
+
+    def capture_once(self):
+        for key in self.keys:
+            camera_id, viewmode = key
+            try:
+                image = self.client.grab_camera_observation(camera_id, viewmode)
+            except Exception as e:
+                print(f"Error capturing camera {camera_id} ({viewmode}): {e}")
+                continue
+            if image is None:
+                continue
+            self._publish(key, image)
+
+    def _publish(self, key, image):
+        if key not in self.keys:
+            return
+        buffers = self.buffers.get(key)
+        previous = self.latest.get(key)
+        seq = previous.seq + 1 if previous is not None else 1
+        if buffers is None or buffers[0].shape != image.shape or buffers[0].dtype != image.dtype:
+            buffers = [np.empty_like(image), np.empty_like(image)]
+            self.buffers[key] = buffers
+        back = buffers[seq % 2]
+        self.writing[key] = seq
+        np.copyto(back, image)
+        frame = CapturedFrame(key[0], key[1], back, time.time(), seq)
+        with self.new_frame:
+            self.latest[key] = frame
+            self.new_frame.notify_all()
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        while not self.stop_event.is_set():
+            start = time.time()
+            self.capture_once()
+            self.stop_event.wait(max(0.0, interval - (time.time() - start)))
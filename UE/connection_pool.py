@@ -0,0 +1,158 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import SimpleQueue
+
+import unrealcv
+
+
+class UnrealCVConnectionPool(object):
+    """A fixed set of unrealcv.Client connections to one server.
+
+    Connections are checked out by one caller at a time, so independent agents no longer
+    queue behind a single lock. `image_connections` of them form a separate lane for camera
+    traffic, so large frame transfers do not delay small movement and pose commands.
+    Passing an `affinity` key (e.g. an actor name) prefers the same connection of its lane
+    for that key, and falls back to any idle one while it is busy.
+
+    A stock UnrealCV server accepts a single client and rejects the others, so several
+    connections need a server that accepts them (a multi-client build, or the fake server).
+    Connections the server refuses are left out, and with one connection left the pool
+    behaves like the single shared client behind a lock.
+
+    Args:
+        ip (str): Server address.
+        port (int): Server port.
+        size (int): Number of connections for commands.
+        image_connections (int): Additional connections reserved for image traffic.
+        timeout (float): Default seconds to wait in `checkout`, None waits forever.
+        client (unrealcv.Client): An already connected client to use as the first command
+            connection, e.g. the one a stock server accepted.
+    """
+
+    def __init__(self, ip, port, size=4, image_connections=1, timeout=None, client=None):
+        self.endpoint = (ip, port)
+        self.timeout = timeout
+        command = [client] if client is not None else []
+        while len(command) < size:
+            connection = self._connect()
+            if connection is None:
+                break
+            command.append(connection)
+        image = []
+        # no image lane once the server refused a connection, images share the command lane
+        while len(command) == size and len(image) < image_connections:
+            connection = self._connect()
+            if connection is None:
+                break
+            image.append(connection)
+        if not command:
+            raise ConnectionError(f'Can not connect to UnrealCV server at {ip}:{port}')
+        if len(command) + len(image) < size + image_connections:
+            print(f'UnrealCV server at {ip}:{port} accepted {len(command) + len(image)} of '
+                  f'{size + image_connections} connections, the pool is limited to those')
+        self.lanes = {
+            'command': command,
+            'image': image,
+        }
+        self.busy = set()
+        self.condition = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.reconnects = 0
+
+    def _connect(self):
+        client = unrealcv.Client(self.endpoint)
+        if not client.connect():
+            client.disconnect()
+            return None
+        return client
+
+    def _lane(self, image):
+        if image and self.lanes['image']:
+            return self.lanes['image']
+        return self.lanes['command']
+
+    def _pick(self, lane, affinity):
+        if affinity is not None:
+            client = lane[hash(affinity) % len(lane)]
+            if id(client) not in self.busy:
+                return client
+        for client in lane:
+            if id(client) not in self.busy:
+                return client
+        return None
+
+    def checkout(self, affinity=None, image=False, timeout=None):
+        """Take a connection out of the pool, raise TimeoutError if none frees up in time."""
+        lane = self._lane(image)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            client = self._pick(lane, affinity)
+            if client is None:
+                self.waits += 1
+            while client is None:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'No UnrealCV connection available after {timeout} seconds')
+                self.condition.wait(remaining)
+                client = self._pick(lane, affinity)
+            self.busy.add(id(client))
+            self.checkouts += 1
+        if not client.isconnected():
+            self._reconnect(client)
+        return client
+
+    def checkin(self, client):
+        with self.condition:
+            self.busy.discard(id(client))
+            self.condition.notify_all()
+
+    @contextmanager
+    def connection(self, affinity=None, image=False, timeout=None):
+        client = self.checkout(affinity, image, timeout)
+        try:
+            yield client
+        finally:
+            self.checkin(client)
+
+    def _reconnect(self, client):
+        self.reconnects += 1
+        client.disconnect()
+        # a new connection starts numbering messages from 0, drop what the old one left behind
+        client.send_message_id = 0
+        client.recv_message_id = 0
+        client.recv_num_q = SimpleQueue()
+        client.recv_data_q = SimpleQueue()
+        return client.connect()
+
+    def health_check(self):
+        """Ping every idle connection and reconnect broken ones, return the number of healthy ones."""
+        healthy = 0
+        for lane in self.lanes.values():
+            for client in lane:
+                with self.condition:
+                    if id(client) in self.busy:
+                        healthy += 1
+                        continue
+                    self.busy.add(id(client))
+                try:
+                    ok = client.isconnected() and client.request('vget /unrealcv/status', timeout=5) is not None
+                except Exception:
+                    ok = False
+                if not ok:
+                    ok = self._reconnect(client)
+                healthy += int(bool(ok))
+                self.checkin(client)
+        return healthy
+
+    def close(self, keep=None):
+        # `keep` stays connected, e.g. the client the pool was built around
+        for lane in self.lanes.values():
+            for client in lane:
+                if client is not keep:
+                    client.disconnect()
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes.values())
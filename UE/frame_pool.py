@@ -0,0 +1,111 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class Frame(object):
+    """A decoded camera frame living in a FramePool slot.
+
+    `bgra`, `bgr` and `rgb` are views on the same memory, nothing is copied when they are
+    accessed. The slot is reused once the pool wraps around, so copy the array if it has to
+    outlive the next `size` decodes.
+    """
+    __slots__ = ('bgra', 'seq', 'timestamp', 'bytes_copied')
+
+    def __init__(self, bgra, seq, timestamp, bytes_copied):
+        self.bgra = bgra
+        self.seq = seq
+        self.timestamp = timestamp
+        self.bytes_copied = bytes_copied
+
+    @property
+    def bgr(self):
+        return self.bgra[:, :, :3]
+
+    @property
+    def rgb(self):
+        return self.bgra[:, :, 2::-1]
+
+    @property
+    def shape(self):
+        return self.bgra.shape
+
+
+class FramePool(object):
+    """Ring buffer of preallocated uint8 BGRA frames that camera responses are decoded into.
+
+    Args:
+        resolution (tuple): (width, height) of the frames, used to locate the BMP pixel data.
+        size (int): Number of slots in the ring.
+    """
+
+    def __init__(self, resolution, size=4):
+        self.resolution = tuple(resolution)
+        self.size = size
+        self.slots = [None] * size
+        self.seq = 0
+        self.last_bytes_copied = 0
+        self.total_bytes_copied = 0
+        self.lock = threading.Lock()
+
+    def _next_slot(self, h, w):
+        with self.lock:
+            index = self.seq % self.size
+            self.seq += 1
+            seq = self.seq
+            slot = self.slots[index]
+            if slot is None or slot.shape[:2] != (h, w):
+                # allocated once per slot, again only if the resolution changes
+                slot = np.empty((h, w, 4), dtype=np.uint8)
+                slot[:, :, 3] = 255
+                self.slots[index] = slot
+        return slot, seq
+
+    def _record(self, slot, seq, bytes_copied):
+        with self.lock:
+            self.last_bytes_copied = bytes_copied
+            self.total_bytes_copied += bytes_copied
+        return Frame(slot, seq, time.time(), bytes_copied)
+
+    def decode_bmp(self, res, copy=True):
+        """Decode a 32-bit BMP response.
+
+        With `copy=False` the frame is a read-only view on `res` itself and no bytes are copied;
+        otherwise the pixels are copied once into the next ring slot.
+        """
+        w, h = self.resolution
+        nbytes = w * h * 4
+        view = np.frombuffer(res, dtype=np.uint8, count=nbytes, offset=len(res) - nbytes)
+        view = view.reshape(h, w, 4)
+        if not copy:
+            with self.lock:
+                self.seq += 1
+                seq = self.seq
+            return self._record(view, seq, 0)
+        slot, seq = self._next_slot(h, w)
+        np.copyto(slot, view)
+        return self._record(slot, seq, nbytes)
+
+    def decode_png(self, res):
+        """Decode a PNG response into the next ring slot.
+
+        The PNG decoder has to materialize the image once, it is then copied into the slot,
+        both are counted in `bytes_copied`.
+        """
+        img = cv2.imdecode(np.frombuffer(res, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if img is None:
+            raise ValueError('Failed to decode png image')
+        h, w = img.shape[:2]
+        slot, seq = self._next_slot(h, w)
+        if img.ndim == 2:
+            slot[:, :, :3] = img[:, :, None]
+            written = h * w * 3
+        elif img.shape[2] == 3:
+            slot[:, :, :3] = img
+            written = h * w * 3
+        else:
+            np.copyto(slot, img)
+            written = h * w * 4
+        return self._record(slot, seq, img.nbytes + written)
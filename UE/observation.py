@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+@dataclass
+class ObservationBundle:
+    """Images captured together by one batched request.
+
+    images maps (camera_id, viewmode, format) to the decoded array: BGR uint8 for
+    `png`/`bmp`, the raw array (e.g. float depth) for `npy`. Errors use the same keys.
+    """
+    images: Dict[Tuple[int, str, str], np.ndarray] = field(default_factory=dict)
+    timestamp: float = 0.0
+    errors: Dict[Tuple[int, str, str], str] = field(default_factory=dict)
+
+    def get(self, camera_id, viewmode='lit', fmt=None):
+        """The image of one camera and viewmode, in `fmt` or the first format requested."""
+        if fmt is not None:
+            return self.images.get((camera_id, viewmode, fmt))
+        for (cam, mode, _), image in self.images.items():
+            if cam == camera_id and mode == viewmode:
+                return image
+        return None
+
+    def camera(self, camera_id):
+        """All viewmodes captured for one camera, viewmode -> image (first format requested)."""
+        images = {}
+        for (cam, viewmode, _), image in self.images.items():
+            if cam == camera_id:
+                images.setdefault(viewmode, image)
+        return images
+
+    @property
+    def cameras(self):
+        return sorted({cam for cam, _, _ in self.images})
+
+    def __len__(self):
+        return len(self.images)
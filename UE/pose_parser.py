@@ -0,0 +1,72 @@
+import json
+import re
+
+import numpy as np
+
+# `<name>X=1.000 Y=2.000 Z=3.000` and `<name>P=0.000 Y=90.000 R=0.000`, as written by the delivery manager
+LOCATION_PATTERN = re.compile(r'([A-Za-z_]\w*?)X=(\S+) Y=(\S+) Z=')
+ROTATION_PATTERN = re.compile(r'([A-Za-z_]\w*?)P=\S+ Y=(\S+) R=')
+
+
+class PoseIndex(object):
+    """name -> (x, y, yaw) index built with a single scan of each informations payload.
+
+    Delivery men (`DLocations`/`DRotations`) take precedence over scooters
+    (`SLocations`/`SRotations`), like the per-name lookup it replaces.
+    """
+
+    def __init__(self, names=(), poses=None):
+        self.rows = {name: i for i, name in enumerate(names)}
+        self.poses = np.zeros((0, 3)) if poses is None else poses  # (N, 3): x, y, yaw
+        self.missing_rotation = set()
+
+    @classmethod
+    def from_informations(cls, info):
+        if isinstance(info, (str, bytes)):
+            info = json.loads(info)
+        index = cls()
+        names, rows = [], []
+        seen = set()
+        for locations, rotations in ((info.get('DLocations', ''), info.get('DRotations', '')),
+                                     (info.get('SLocations', ''), info.get('SRotations', ''))):
+            yaws = {name: yaw for name, yaw in ROTATION_PATTERN.findall(rotations)}
+            for name, x, y in LOCATION_PATTERN.findall(locations):
+                if name in seen:
+                    continue
+                seen.add(name)
+                yaw = yaws.get(name)
+                if yaw is None:
+                    index.missing_rotation.add(name)
+                    continue
+                names.append(name)
+                rows.append((x, y, yaw))
+        index.rows = {name: i for i, name in enumerate(names)}
+        index.poses = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        return index
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, name):
+        row = self.rows.get(name)
+        if row is None:
+            return None
+        x, y, yaw = self.poses[row]
+        return float(x), float(y), float(yaw)
+
+    def arrays(self, names):
+        """Poses of `names` as NumPy arrays.
+
+        Returns:
+            positions (np.ndarray): (N, 2) x, y; NaN where the name was not found.
+            yaws (np.ndarray): (N,) yaw in degrees; NaN where the name was not found.
+            found (np.ndarray): (N,) bool mask.
+        """
+        rows = np.fromiter((self.rows.get(name, -1) for name in names), dtype=np.int64, count=len(names))
+        found = rows >= 0
+        poses = np.full((len(names), 3), np.nan)
+        poses[found] = self.poses[rows[found]]
+        return poses[:, :2], poses[:, 2], found
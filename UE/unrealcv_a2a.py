@@ -1,4 +1,8 @@
-from Communicator.unrealcv_basic import UnrealCV
+from .unrealcv_basic import UnrealCV
+from .capture_service import CaptureService
+from .connection_pool import UnrealCVConnectionPool
+from Config import Config
+from contextlib import contextmanager
 import threading
 
 import numpy as np
@@ -7,11 +11,33 @@ class UnrealCvA2A(UnrealCV):
     def __init__(self, ip, port, resolution):
         super().__init__(ip, port, resolution)
         self.lock = threading.Lock()
+        self.pool = None
+        self.capture_service = None
+
+    def use_connection_pool(self, size=Config.NUM_THREADS, image_connections=1, timeout=None):
+        # open extra connections to the same server so independent agents stop sharing self.lock;
+        # self.client is the first one, a stock server that only accepts one client leaves it at that
+        ip, port = self.client.endpoint
+        if self.pool is not None:
+            self.pool.close(keep=self.client)
+        self.pool = UnrealCVConnectionPool(ip, port, size, image_connections, timeout, client=self.client)
+        return self.pool
+
+    @contextmanager
+    def session(self, affinity=None, image=False):
+        # yields a client to talk to UE: the shared client under the global lock,
+        # or a pooled connection when use_connection_pool() was called
+        if self.pool is None:
+            with self.lock:
+                yield self.client
+        else:
+            with self.pool.connection(affinity, image) as client:
+                yield client
 
     def d_move_forward(self, object_name):
-        with self.lock:
+        with self.session(object_name) as client:
             cmd = f'vbp {object_name} MoveForward'
-            self.client.request(cmd)
+            client.request(cmd)
     # def d_move_forward_sec(self, object_name, sec):
     #     with self.lock:
     #         self.apply_action_transition(object_name, 'MoveForward', sec)
@@ -22,9 +48,9 @@ class UnrealCvA2A(UnrealCV):
         elif direction == 'left':
             angle = -angle
             clockwise = -1
-        with self.lock:
+        with self.session(object_name) as client:
             cmd = f'vbp {object_name} Rotate_Angle {1} {angle} {clockwise}'
-            self.client.request(cmd)
+            client.request(cmd)
 
     def d_turn_around(self, object_name, angle, direction='left'):
         if direction == 'right':
@@ -32,15 +58,15 @@ class UnrealCvA2A(UnrealCV):
         elif direction == 'left':
             angle = -angle
             clockwise = -1
-        with self.lock:
+        with self.session(object_name) as client:
             cmd = f'vbp {object_name} TurnAround {angle} {clockwise}'
-            self.client.request(cmd)
+            client.request(cmd)
             
     def d_get_location(self,object_name):
-        with self.lock:
+        with self.session(object_name) as client:
             try:
                 cmd = f'vget /object/{object_name}/location'
-                res = self.client.request(cmd)
+                res = client.request(cmd)
                 location = [float(i) for i in res.split()]
                 return np.array(location)
             except Exception as e:
@@ -51,10 +77,10 @@ class UnrealCvA2A(UnrealCV):
                 print('res:', res)
                 
     def d_get_rotation(self, object_name):
-        with self.lock:
+        with self.session(object_name) as client:
             try:
                 cmd = f'vget /object/{object_name}/rotation'
-                res = self.client.request(cmd)
+                res = client.request(cmd)
                 rotation = [float(i) for i in res.split()]
                 return np.array(rotation)
             except Exception as e:
@@ -65,15 +91,50 @@ class UnrealCvA2A(UnrealCV):
                 print('res:', res)
 
     def d_step_forward(self, object_name):
-        with self.lock:
+        with self.session(object_name) as client:
             cmd = f'vbp {object_name} StepForward'
-            self.client.request(cmd)
+            client.request(cmd)
 
     def d_stop(self, object_name):
-        with self.lock:
+        with self.session(object_name) as client:
             cmd = f'vbp {object_name} StopDeliveryMan'
-            self.client.request(cmd)
+            client.request(cmd)
+
+    def get_informations(self, manager_name):
+        with self.session(manager_name) as client:
+            cmd = f'vbp {manager_name} GetInformations'
+            return client.request(cmd)
+
+    def start_capture_service(self, cameras, rate=Config.CAPTURE_RATE, max_staleness=Config.CAPTURE_MAX_STALENESS):
+        # prefetch (camera_id, viewmode) pairs in the background, get_camera_observation serves from it
+        self.capture_service = CaptureService(self, rate, max_staleness)
+        for camera_id, viewmode in cameras:
+            self.capture_service.register(camera_id, viewmode)
+        return self.capture_service.start()
+
+    def stop_capture_service(self):
+        if self.capture_service is not None:
+            self.capture_service.stop()
+            self.capture_service = None
+
+    def get_camera_observation(self, camera_id, viewmode='lit', max_staleness=None, copy=True):
+        # copy=False returns the capture (or frame pool) buffer itself, which is rewritten
+        # a few captures later; only use it for frames consumed right away
+        if self.capture_service is not None:
+            frame = self.capture_service.get_latest(camera_id, viewmode, max_staleness, copy)
+            if frame is not None:
+                return frame.image
+        image = self.grab_camera_observation(camera_id, viewmode)
+        if copy and self.frame_pool is not None:
+            image = image.copy()
+        return image
+
+    def grab_camera_observation(self, camera_id, viewmode='lit'):
+        with self.session(image=True) as client:
+            return self.read_image(camera_id, viewmode, 'fast', client=client)
 
-    def get_camera_observation(self, camera_id, viewmode='lit'):
-        with self.lock:
-            return self.read_image(camera_id, viewmode, 'fast')
\ No newline at end of file
+    def get_camera_observations(self, specs, num_workers=4):
+        # only the transfer holds the connection, decoding runs in the decode thread pool
+        with self.session(image=True) as client:
+            responses = client.request_batch(self.image_batch_commands(specs))
+        return self.decode_image_batch(specs, responses, num_workers)
\ No newline at end of file
@@ -0,0 +1,330 @@
+import asyncio
+import itertools
+import re
+import struct
+import time
+from typing import List
+
+import numpy as np
+
+from Base import DeliveryMan
+from Config import Config
+from .unrealcv_basic import UnrealCV
+from .Communicator import Communicator
+from .observation import ObservationBundle
+from .pose_parser import PoseIndex
+
+# framing used by the UnrealCV plugin: uint32 magic, uint32 payload size, payload
+MAGIC = 0x9E2B83C1
+HEADER = struct.Struct('II')
+
+
+class AsyncUnrealCV(object):
+    """asyncio counterpart of UnrealCV.
+
+    One socket carries any number of in-flight requests: every request gets a message id,
+    a reader task resolves the matching future when the `<id>:<response>` message arrives.
+    Call `await connect()` before use.
+    """
+
+    def __init__(self, port, ip, resolution):
+        self.ip = ip
+        self.port = port
+        self.resolution = resolution
+        self.reader = None
+        self.writer = None
+        self.reader_task = None
+        self.message_ids = itertools.count()
+        self.pending = {}  # message id -> future, None for fire-and-forget requests
+        self.raw_message_regexp = re.compile(rb'(\d+):')
+
+    async def connect(self, timeout=5):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.ip, self.port), timeout)
+        message = await self._receive()
+        if message is None or not message.startswith(b'connected'):
+            await self.close()
+            raise ConnectionError(f'Can not get connection confirm from {self.ip}:{self.port}')
+        self.reader_task = asyncio.ensure_future(self._receive_loop())
+        await self.ini_unrealcv(self.resolution)
+        return self
+
+    async def ini_unrealcv(self, resolution=(320, 240)):
+        [w, h] = resolution
+        self.request_async(f'vrun setres {w}x{h}w')  # set resolution of the display window
+        self.request_async('DisableAllScreenMessages')  # disable all screen messages
+        self.request_async('vrun sg.ShadowQuality 0')  # set shadow quality to low
+        self.request_async('vrun sg.TextureQuality 0')  # set texture quality to low
+        self.request_async('vrun sg.EffectsQuality 0')  # set effects quality to low
+        await self.writer.drain()
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.reader_task = None
+        self._fail_pending(ConnectionError('UnrealCV connection closed'))
+
+    def isconnected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def _receive(self):
+        try:
+            header = await self.reader.readexactly(HEADER.size)
+            magic, size = HEADER.unpack(header)
+            if magic != MAGIC:
+                return None
+            return await self.reader.readexactly(size)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    async def _receive_loop(self):
+        while True:
+            message = await self._receive()
+            if message is None:
+                self._fail_pending(ConnectionError('Can not receive message from UnrealCV server'))
+                return
+            match = self.raw_message_regexp.match(message)
+            if not match:
+                continue
+            body = message[match.end():]
+            try:
+                body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                pass  # images stay bytes
+            future = self.pending.pop(int(match.group(1)), None)
+            if future is not None and not future.done():
+                future.set_result(body)
+
+    def _fail_pending(self, error):
+        for future in self.pending.values():
+            if future is not None and not future.done():
+                future.set_exception(error)
+        self.pending = {}
+
+    def _send(self, message, future):
+        if not self.isconnected():
+            raise ConnectionError('Failed to send: socket is closed')
+        message_id = next(self.message_ids)
+        self.pending[message_id] = future
+        if not isinstance(message, bytes):
+            message = message.encode('utf-8')
+        payload = b'%d:%s' % (message_id, message)
+        self.writer.write(HEADER.pack(MAGIC, len(payload)) + payload)
+        return message_id
+
+    async def request(self, message, timeout=15):
+        future = asyncio.get_running_loop().create_future()
+        message_id = self._send(message, future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError as exception:
+            self.pending.pop(message_id, None)
+            raise TimeoutError(f'Request timed out after {timeout} seconds') from exception
+
+    def request_async(self, message):
+        # send without waiting for the reply, the response is dropped by the reader task
+        self._send(message, None)
+
+    async def request_batch(self, batch, timeout=15):
+        return await asyncio.gather(*[self.request(message, timeout) for message in batch])
+
+    async def vget(self, path, *args):
+        return await self.request(' '.join(['vget', path] + [str(arg) for arg in args]))
+
+    async def vset(self, path, *args):
+        return await self.request(' '.join(['vset', path] + [str(arg) for arg in args]))
+
+    async def vbp(self, object_name, function, *args):
+        return await self.request(' '.join(['vbp', object_name, function] + [str(arg) for arg in args]))
+
+    async def spawn(self, prefab, name):
+        return await self.vset('/objects/spawn', prefab, name)
+
+    async def spawn_bp_asset(self, prefab_path, name):
+        return await self.vset('/objects/spawn_bp_asset', prefab_path, name)
+
+    async def set_location(self, loc, name):
+        [x, y, z] = loc
+        return await self.vset(f'/object/{name}/location', x, y, z)
+
+    async def set_orientation(self, orientation, name):
+        [pitch, yaw, roll] = orientation
+        return await self.vset(f'/object/{name}/rotation', pitch, yaw, roll)
+
+    async def set_scale(self, scale, name):
+        [x, y, z] = scale
+        return await self.vset(f'/object/{name}/scale', x, y, z)
+
+    async def set_collision(self, actor_name, hasCollision):
+        return await self.vset(f'/object/{actor_name}/collision', hasCollision)
+
+    async def set_movable(self, actor_name, isMovable):
+        return await self.vset(f'/object/{actor_name}/object_mobility', isMovable)
+
+    async def enable_controller(self, name, enable_controller):
+        return await self.vbp(name, 'EnableController', enable_controller)
+
+    async def destroy(self, actor_name):
+        return await self.vset(f'/object/{actor_name}/destroy')
+
+    async def get_objects(self):
+        res = await self.vget('/objects')
+        return res.split()
+
+    async def get_location(self, actor_name):
+        res = await self.vget(f'/object/{actor_name}/location')
+        return self._parse_vector(res)
+
+    async def get_orientation(self, actor_name):
+        res = await self.vget(f'/object/{actor_name}/rotation')
+        return self._parse_vector(res)
+
+    async def get_location_batch(self, actor_names):
+        res = await self.request_batch([f'vget /object/{name}/location' for name in actor_names])
+        return [self._parse_vector(r) for r in res]
+
+    async def get_orientation_batch(self, actor_names):
+        res = await self.request_batch([f'vget /object/{name}/rotation' for name in actor_names])
+        return [self._parse_vector(r) for r in res]
+
+    @staticmethod
+    def _parse_vector(res):
+        return np.array([float(i) for i in res.split()])
+
+    async def read_image(self, cam_id, viewmode, mode='fast'):
+        # mode: direct (png) or fast (bmp), decoding runs in the default executor
+        fmt = 'png' if mode == 'direct' else 'bmp'
+        res = await self.vget(f'/camera/{cam_id}/{viewmode}', fmt)
+        return await asyncio.get_running_loop().run_in_executor(None, self.decode_image, res, fmt)
+
+    async def read_image_batch(self, specs):
+        # specs: list of (cam_id, viewmode, format), format: png, bmp or npy
+        responses = await self.request_batch(self.image_batch_commands(specs))
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *[loop.run_in_executor(None, self.decode_image, res, fmt)
+              for (_, _, fmt), res in zip(specs, responses)],
+            return_exceptions=True)
+        bundle = ObservationBundle(timestamp=time.time())
+        for spec, result in zip(specs, results):
+            if isinstance(result, Exception):
+                bundle.errors[tuple(spec)] = f'{type(result).__name__}: {result}'
+            else:
+                bundle.images[tuple(spec)] = result
+        return bundle
+
+    # decoding does not touch the connection, share it with the blocking client
+    image_batch_commands = UnrealCV.image_batch_commands
+    decode_image = UnrealCV.decode_image
+    decode_png = UnrealCV.decode_png
+    decode_bmp = UnrealCV.decode_bmp
+    decode_npy = UnrealCV.decode_npy
+
+
+class AsyncUnrealCvA2A(AsyncUnrealCV):
+    async def d_move_forward(self, object_name):
+        return await self.vbp(object_name, 'MoveForward')
+
+    async def d_rotate(self, object_name, angle, direction='left'):
+        if direction == 'right':
+            clockwise = 1
+        elif direction == 'left':
+            angle = -angle
+            clockwise = -1
+        return await self.vbp(object_name, 'Rotate_Angle', 1, angle, clockwise)
+
+    async def d_turn_around(self, object_name, angle, direction='left'):
+        if direction == 'right':
+            clockwise = 1
+        elif direction == 'left':
+            angle = -angle
+            clockwise = -1
+        return await self.vbp(object_name, 'TurnAround', angle, clockwise)
+
+    async def d_get_location(self, object_name):
+        return await self.get_location(object_name)
+
+    async def d_get_rotation(self, object_name):
+        return await self.get_orientation(object_name)
+
+    async def d_step_forward(self, object_name):
+        return await self.vbp(object_name, 'StepForward')
+
+    async def d_stop(self, object_name):
+        return await self.vbp(object_name, 'StopDeliveryMan')
+
+    async def get_informations(self, manager_name):
+        return await self.vbp(manager_name, 'GetInformations')
+
+    async def get_camera_observation(self, camera_id, viewmode='lit'):
+        return await self.read_image(camera_id, viewmode, 'fast')
+
+
+class AsyncCommunicator(AsyncUnrealCvA2A):
+    def __init__(self, port, ip, resolution):
+        super().__init__(port, ip, resolution)
+
+        self.delivery_manager_name = None
+
+        self.delivery_man_id_to_name = {}
+
+    async def delivery_man_turn_around(self, delivery_man_id, angle, clockwise):
+        return await self.d_turn_around(self.get_delivery_man_name(delivery_man_id), 90, 'left')
+
+    async def delivery_man_step_forward(self, delivery_man_id):
+        return await self.d_step_forward(self.get_delivery_man_name(delivery_man_id))
+
+    async def delivery_man_move_forward(self, delivery_man_id):
+        return await self.d_move_forward(self.get_delivery_man_name(delivery_man_id))
+
+    async def delivery_man_stop(self, delivery_man_id):
+        return await self.d_stop(self.get_delivery_man_name(delivery_man_id))
+
+    async def delivery_man_rotate(self, delivery_man_id, angle, turn_direction):
+        return await self.d_rotate(self.get_delivery_man_name(delivery_man_id), angle, turn_direction)
+
+    async def get_position_and_direction(self, delivery_man_ids):
+        if self.delivery_manager_name is None:
+            print("Warning: delivery_manager_name is not set")
+            return {}
+        try:
+            info_str = await self.get_informations(self.delivery_manager_name)
+        except Exception as e:
+            print(f"Error in get_position_and_direction: {e}")
+            return {}
+        return self.parse_position_and_direction(info_str, delivery_man_ids)
+
+    async def get_poses(self, delivery_man_ids):
+        names = [self.get_delivery_man_name(delivery_man_id) for delivery_man_id in delivery_man_ids]
+        index = None
+        if self.delivery_manager_name is not None:
+            index = self.parse_pose_index(await self.get_informations(self.delivery_manager_name))
+        return (index or PoseIndex()).arrays(names)
+
+    async def spawn_delivery_men(self, delivery_men: List[DeliveryMan]):
+        """Spawn delivery men with all setup commands in flight at once.
+
+        Returns:
+            dict: delivery man id -> list of error responses, only for actors that failed.
+        """
+        commands, owners = self._spawn_commands(delivery_men)
+        return self._spawn_errors(commands, owners, await self.request_batch(commands))
+
+    async def spawn_delivery_manager(self):
+        self.delivery_manager_name = 'GEN_DeliveryManager'
+        return await self.spawn_bp_asset(Config.DELIVERY_MANAGER_MODEL_PATH, self.delivery_manager_name)
+
+    # parsing and naming do not touch the connection, share them with the blocking Communicator
+    parse_position_and_direction = Communicator.parse_position_and_direction
+    parse_pose_index = Communicator.parse_pose_index
+    _spawn_commands = Communicator._spawn_commands
+    _spawn_errors = staticmethod(Communicator._spawn_errors)
+    _delivery_man_spawn_commands = Communicator._delivery_man_spawn_commands
+    get_delivery_man_name = Communicator.get_delivery_man_name
@@ -1,10 +1,13 @@
 import unrealcv
 import cv2
 import time
-import PIL.Image
-from io import BytesIO
 import numpy as np
 import json
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from .frame_pool import FramePool
+from .observation import ObservationBundle
 
 class UnrealCV(object):
     def __init__(self, port, ip, resolution):
@@ -14,8 +17,17 @@ class UnrealCV(object):
         self.client.connect()
 
         self.resolution = resolution
+        self.frame_pool = None
+        self.decode_executor = None
+        self.decode_workers = 0
+        self.decode_lock = threading.Lock()
         self.ini_unrealcv(resolution)
 
+    def enable_frame_pool(self, size=4):
+        # decode camera frames into a ring of preallocated arrays instead of a new frame per call
+        self.frame_pool = FramePool(self.resolution, size)
+        return self.frame_pool
+
     def ini_unrealcv(self, resolution=(320, 240)):
         self.check_connection()
         [w, h] = resolution
@@ -158,31 +170,87 @@ class UnrealCV(object):
         cv2.imshow(title, img)
         cv2.waitKey(3)
 
-    def read_image(self, cam_id, viewmode, mode='direct'):
+    def read_image(self, cam_id, viewmode, mode='direct', client=None):
             # cam_id:0 1 2 ...
             # viewmode:lit,  =normal, depth, object_mask
             # mode: direct, file
+            # client: connection to use, defaults to self.client
+            client = self.client if client is None else client
             res = None
             if mode == 'direct': # get image from unrealcv in png format
                 cmd = f'vget /camera/{cam_id}/{viewmode} png'
-                image = self.decode_png(self.client.request(cmd))
+                if self.frame_pool is not None:
+                    image = self.frame_pool.decode_png(client.request(cmd)).bgr
+                else:
+                    image = self.decode_png(client.request(cmd))
             elif mode == 'file': # save image to file and read it
                 cmd = f'vget /camera/{cam_id}/{viewmode} {viewmode}{self.ip}.png'
-                img_dirs = self.client.request(cmd)
+                img_dirs = client.request(cmd)
                 image = cv2.imread(img_dirs)
             elif mode == 'fast': # get image from unrealcv in bmp format
                 cmd = f'vget /camera/{cam_id}/{viewmode} bmp'
-                image = self.decode_bmp(self.client.request(cmd))
+                if self.frame_pool is not None:
+                    image = self.frame_pool.decode_bmp(client.request(cmd)).bgr
+                else:
+                    image = self.decode_bmp(client.request(cmd))
             return image
 
+    def read_image_batch(self, specs, num_workers=4):
+        # specs: list of (cam_id, viewmode, format), format: png, bmp or npy
+        # all images are fetched in one pipelined request_batch and decoded in a thread pool
+        responses = self.client.request_batch(self.image_batch_commands(specs))
+        return self.decode_image_batch(specs, responses, num_workers)
+
+    def image_batch_commands(self, specs):
+        return [f'vget /camera/{cam_id}/{viewmode} {fmt}' for cam_id, viewmode, fmt in specs]
+
+    def decode_image_batch(self, specs, responses, num_workers=4):
+        bundle = ObservationBundle(timestamp=time.time())
+        futures = self._submit_decodes(specs, responses, num_workers)
+        for spec, res, future in zip(specs, responses, futures):
+            try:
+                bundle.images[tuple(spec)] = future.result()
+            except Exception as e:
+                preview = res[:64] if res is not None else None
+                bundle.errors[tuple(spec)] = f'{type(e).__name__}: {e} (response: {preview!r})'
+        return bundle
+
+    def _submit_decodes(self, specs, responses, num_workers):
+        # the executor is rebuilt when a call asks for a different number of workers; swapping and
+        # submitting share the lock, so no batch submits to an executor that was shut down
+        with self.decode_lock:
+            if self.decode_executor is None or self.decode_workers != num_workers:
+                if self.decode_executor is not None:
+                    # decodes already queued still run, its threads exit once they are done
+                    self.decode_executor.shutdown(wait=False)
+                self.decode_executor = ThreadPoolExecutor(max_workers=num_workers)
+                self.decode_workers = num_workers
+            return [self.decode_executor.submit(self.decode_image, res, fmt)
+                    for (_, _, fmt), res in zip(specs, responses)]
+
+    def decode_image(self, res, fmt):
+        if res is None:
+            raise ValueError('No response')
+        if fmt == 'png':
+            return self.decode_png(res)
+        elif fmt == 'bmp':
+            return self.decode_bmp(res)
+        elif fmt == 'npy':
+            return self.decode_npy(res)
+        raise ValueError(f'Unknown image format {fmt}')
+
+    def decode_npy(self, res): # decode npy array, e.g. depth
+        return np.load(BytesIO(res))
+
     def decode_png(self, res): # decode png image
-        img = np.asarray(PIL.Image.open(BytesIO(res)))
-        img = img[:, :, :-1]  # delete alpha channel
-        img = img[:, :, ::-1]  # transpose channel order
-        return img
-
-    def decode_bmp(self, res, channel=4): # decode bmp image
-        img = np.fromstring(res, dtype=np.uint8)
-        img=img[-self.resolution[1]*self.resolution[0]*channel:]
+        img = cv2.imdecode(np.frombuffer(res, dtype=np.uint8), cv2.IMREAD_UNCHANGED)  # already BGRA
+        return img[:, :, :3]  # delete alpha channel
+
+    def decode_bmp(self, res, channel=4, copy=True): # decode bmp image
+        # copy=False returns a read-only view on `res`, no bytes are copied
+        nbytes = self.resolution[1]*self.resolution[0]*channel
+        img = np.frombuffer(res, dtype=np.uint8, count=nbytes, offset=len(res) - nbytes)
         img=img.reshape(self.resolution[1], self.resolution[0], channel)
+        if copy:
+            return np.ascontiguousarray(img[:, :, :-1]) # writable, alpha channel dropped in the copy
         return img[:, :, :-1] # delete alpha channel
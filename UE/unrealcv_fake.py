@@ -0,0 +1,435 @@
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+# framing used by the UnrealCV plugin: uint32 magic, uint32 payload size, payload
+MAGIC = 0x9E2B83C1
+HEADER = struct.Struct('II')
+
+
+class FakeActor(object):
+    def __init__(self, name, prefab):
+        self.name = name
+        self.prefab = prefab
+        self.location = [0.0, 0.0, 0.0]
+        self.rotation = [0.0, 0.0, 0.0]
+        self.scale = [1.0, 1.0, 1.0]
+        self.physics = False
+        self.collision = False
+        self.movable = False
+        self.controller = False
+        self.collision_num = 0
+        self.calls = []
+
+
+class FakeUnrealCVServer(object):
+    """Loopback stand-in for the UnrealCV plugin.
+
+    Speaks the same message framing and `<id>:<command>` protocol as the UE
+    server, keeps a small actor table and returns synthetic camera frames, so
+    UnrealCV, UnrealCvA2A and Communicator can be exercised without Unreal Engine.
+
+    Args:
+        port (int): Port to listen on, 0 picks a free port.
+        ip (str): Interface to bind.
+        resolution (tuple): (width, height) of synthetic frames, `vrun setres` overrides it.
+        latency (float): Seconds added before every response.
+        latency_jitter (float): Upper bound of a uniform random delay added on top of `latency`.
+        bandwidth (float): Optional bytes/second used to delay large (image) responses.
+        step_distance (float): Distance covered by one `StepForward` / `MoveForward`.
+        seed (int): Seed for the synthetic frames and jitter.
+        max_clients (int): Reject connections beyond this many, like the UE plugin which
+            accepts a single client. None accepts any number.
+    """
+
+    def __init__(self, port=0, ip='127.0.0.1', resolution=(320, 240), latency=0.0,
+                 latency_jitter=0.0, bandwidth=None, step_distance=100.0, seed=42, max_clients=None):
+        self.ip = ip
+        self.port = port
+        self.resolution = tuple(resolution)
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.bandwidth = bandwidth
+        self.step_distance = step_distance
+        self.seed = seed
+        self.max_clients = max_clients
+
+        self.actors = {}
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._frames = {}
+        self._sock = None
+        self._running = False
+        self._threads = []
+        self._connections = []
+
+    # ------------------------------------------------------------------ server
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.ip, self.port))
+        self._sock.listen(64)
+        self.port = self._sock.getsockname()[1]
+        self._running = True
+        thread = threading.Thread(target=self._accept_loop, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+        for conn in list(self._connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+            except OSError:
+                pass
+        self._connections = []
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2.0)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.max_clients is not None and len(self._connections) >= self.max_clients:
+                try:
+                    self._send(conn, b'error Only one client is allowed')
+                    conn.close()
+                except OSError:
+                    pass
+                continue
+            self._connections.append(conn)
+            thread = threading.Thread(target=self._serve, args=(conn,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _serve(self, conn):
+        try:
+            self._send(conn, b'connected to FakeUnrealCV')
+            while self._running:
+                payload = self._recv(conn)
+                if payload is None:
+                    break
+                message_id, _, command = payload.partition(b':')
+                response = self.handle(command.decode('utf-8'))
+                if isinstance(response, str):
+                    response = response.encode('utf-8')
+                self._delay(len(response))
+                self._send(conn, message_id + b':' + response)
+        except OSError:
+            pass
+        finally:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _delay(self, size):
+        delay = self.latency
+        if self.latency_jitter:
+            with self.lock:
+                delay += self._random.uniform(0, self.latency_jitter)
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _recv_exact(conn, size):
+        chunks = []
+        while size:
+            chunk = conn.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def _recv(self, conn):
+        header = self._recv_exact(conn, HEADER.size)
+        if header is None:
+            return None
+        magic, size = HEADER.unpack(header)
+        if magic != MAGIC:
+            return None
+        return self._recv_exact(conn, size)
+
+    @staticmethod
+    def _send(conn, payload):
+        conn.sendall(HEADER.pack(MAGIC, len(payload)) + payload)
+
+    # ---------------------------------------------------------------- commands
+    def handle(self, command):
+        """Execute one UnrealCV command against the actor table and return the response."""
+        with self.lock:
+            self.request_count += 1
+        parts = command.split()
+        if not parts:
+            return 'error empty command'
+        try:
+            if parts[0] == 'vget':
+                return self._vget(parts)
+            if parts[0] == 'vset':
+                return self._vset(parts)
+            if parts[0] == 'vbp':
+                return self._vbp(parts)
+            if parts[0] == 'vrun':
+                return self._vrun(parts)
+            if parts[0] == 'DisableAllScreenMessages':
+                return 'ok'
+        except Exception as e:
+            return f'error {e}'
+        return f'error Can not find a handler for command {command}'
+
+    def _actor(self, name):
+        actor = self.actors.get(name)
+        if actor is None:
+            raise ValueError(f'Can not find object {name}')
+        return actor
+
+    def _vrun(self, parts):
+        if parts[1] == 'setres':
+            match = re.match(r'(\d+)x(\d+)', parts[2])
+            if match:
+                with self.lock:
+                    self.resolution = (int(match.group(1)), int(match.group(2)))
+                    self._frames = {}
+        return 'ok'
+
+    def _vget(self, parts):
+        path = parts[1].strip('/').split('/')
+        if path == ['unrealcv', 'commands']:
+            return '\n'.join(COMMAND_TEMPLATES)
+        if path == ['unrealcv', 'status']:
+            return 'Is Listening\nClient Connected'
+        if path == ['objects']:
+            with self.lock:
+                return ' '.join(self.actors)
+        if path[0] == 'object':
+            actor = self._actor(path[1])
+            if path[2] == 'location':
+                return ' '.join(f'{v:.3f}' for v in actor.location)
+            if path[2] == 'rotation':
+                return ' '.join(f'{v:.3f}' for v in actor.rotation)
+            if path[2] == 'scale':
+                return ' '.join(f'{v:.3f}' for v in actor.scale)
+        if path[0] == 'camera':
+            return self._camera(path[1], path[2], parts[2] if len(parts) > 2 else 'png')
+        return f'error Can not find a handler for vget {parts[1]}'
+
+    def _vset(self, parts):
+        path = parts[1].strip('/').split('/')
+        args = parts[2:]
+        if path == ['objects', 'spawn'] or path == ['objects', 'spawn_bp_asset']:
+            prefab, name = args[0], args[1]
+            with self.lock:
+                self.actors[name] = FakeActor(name, prefab)
+            return name
+        if path == ['action', 'clean_garbage']:
+            return 'ok'
+        if path[0] == 'object':
+            actor = self._actor(path[1])
+            prop = path[2]
+            if prop == 'destroy':
+                with self.lock:
+                    del self.actors[actor.name]
+            elif prop == 'location':
+                actor.location = [float(v) for v in args[:3]]
+            elif prop == 'rotation':
+                actor.rotation = [float(v) for v in args[:3]]
+            elif prop == 'scale':
+                actor.scale = [float(v) for v in args[:3]]
+            elif prop == 'physics':
+                actor.physics = _to_bool(args[0])
+            elif prop == 'collision':
+                actor.collision = _to_bool(args[0])
+            elif prop == 'object_mobility':
+                actor.movable = _to_bool(args[0])
+            else:
+                return f'error Can not find a handler for vset {parts[1]}'
+            return 'ok'
+        return f'error Can not find a handler for vset {parts[1]}'
+
+    def _vbp(self, parts):
+        actor = self._actor(parts[1])
+        function, args = parts[2], parts[3:]
+        actor.calls.append(function)
+        if function == 'GetCollisionNum':
+            return json.dumps({'TotalCollision': str(actor.collision_num)})
+        if function == 'GetInformations':
+            return json.dumps(self.informations())
+        if function == 'EnableController':
+            actor.controller = _to_bool(args[0])
+        elif function in ('MoveForward', 'StepForward'):
+            self._advance(actor, self.step_distance)
+        elif function == 'Move_Speed':
+            speed, duration, direction = float(args[0]), float(args[1]), int(args[2])
+            self._advance(actor, abs(speed) * duration, direction)
+        elif function in ('Rotate_Angle', 'TurnAround'):
+            # d_rotate / d_turn_around already sign the angle for the turn direction
+            angle = float(args[1] if function == 'Rotate_Angle' else args[0])
+            actor.rotation[1] = (actor.rotation[1] + angle + 180.0) % 360.0 - 180.0
+        return '{}'
+
+    def _advance(self, actor, distance, direction=0):
+        # direction follows apply_action_transition: 0 forward, 1 backward, 2 right, 3 left
+        yaw = actor.rotation[1] + {0: 0.0, 1: 180.0, 2: 90.0, 3: -90.0}.get(direction, 0.0)
+        actor.location[0] += distance * np.cos(np.radians(yaw))
+        actor.location[1] += distance * np.sin(np.radians(yaw))
+
+    def informations(self):
+        """Build the delivery manager info payload (`DLocations`, `DRotations`, ...)."""
+        d_locations, d_rotations, s_locations, s_rotations = [], [], [], []
+        with self.lock:
+            actors = list(self.actors.values())
+        for actor in actors:
+            x, y, z = actor.location
+            p, yaw, r = actor.rotation
+            location = f'{actor.name}X={x:.3f} Y={y:.3f} Z={z:.3f}'
+            rotation = f'{actor.name}P={p:.3f} Y={yaw:.3f} R={r:.3f}'
+            if 'Scooter' in actor.prefab:
+                s_locations.append(location)
+                s_rotations.append(rotation)
+            elif 'DeliveryMan' in actor.prefab and 'DeliveryManager' not in actor.prefab:
+                d_locations.append(location)
+                d_rotations.append(rotation)
+        return {
+            'DLocations': ', '.join(d_locations),
+            'DRotations': ', '.join(d_rotations),
+            'SLocations': ', '.join(s_locations),
+            'SRotations': ', '.join(s_rotations),
+        }
+
+    # ------------------------------------------------------------------ frames
+    def _camera(self, cam_id, viewmode, fmt):
+        if viewmode in ('location', 'rotation'):
+            return '0.000 0.000 0.000'
+        if fmt in ('png', 'bmp', 'npy'):
+            return self.frame(cam_id, viewmode, fmt)
+        # anything else is treated as a file name, like the real `vget /camera/0/lit x.png`
+        cv2.imwrite(fmt, self.frame_array(cam_id, viewmode))
+        return fmt
+
+    def frame_array(self, cam_id, viewmode):
+        """Synthetic BGRA frame for a camera and viewmode at the current resolution."""
+        w, h = self.resolution
+        rng = np.random.default_rng([self.seed, int(cam_id), sum(map(ord, viewmode))])
+        xs = np.linspace(0, 255, w, dtype=np.float32)[None, :]
+        ys = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+        frame = np.empty((h, w, 4), dtype=np.uint8)
+        frame[:, :, 0] = (xs + 0 * ys).astype(np.uint8)
+        frame[:, :, 1] = (ys + 0 * xs).astype(np.uint8)
+        frame[:, :, 2] = rng.integers(0, 256, (h, w), dtype=np.uint8)
+        frame[:, :, 3] = 255
+        return frame
+
+    def frame(self, cam_id, viewmode, fmt='png'):
+        """Encoded synthetic frame, cached per (camera, viewmode, format, resolution)."""
+        key = (cam_id, viewmode, fmt, self.resolution)
+        data = self._frames.get(key)
+        if data is None:
+            frame = self.frame_array(cam_id, viewmode)
+            if fmt == 'bmp':
+                data = encode_bmp(frame)
+            elif fmt == 'npy':
+                # float32 depth-like array, as returned for `vget /camera/0/depth npy`
+                output = BytesIO()
+                np.save(output, frame[:, :, 0].astype(np.float32) * 10.0)
+                data = output.getvalue()
+            else:
+                data = cv2.imencode('.png', frame)[1].tobytes()
+            self._frames[key] = data
+        return data
+
+
+def encode_bmp(frame):
+    """Encode a BGRA frame as a top-down 32-bit BMP, the layout decode_bmp expects."""
+    h, w = frame.shape[:2]
+    pixels = np.ascontiguousarray(frame, dtype=np.uint8).tobytes()
+    info = struct.pack('<IiiHHIIiiII', 40, w, -h, 1, 32, 0, len(pixels), 2835, 2835, 0, 0)
+    header = struct.pack('<2sIHHI', b'BM', 14 + len(info) + len(pixels), 0, 0, 14 + len(info))
+    return header + info + pixels
+
+
+def _to_bool(value):
+    return str(value).lower() in ('1', 'true')
+
+
+# advertised through `vget /unrealcv/commands` so the client's capability check passes
+COMMAND_TEMPLATES = [
+    'vget /unrealcv/commands',
+    'vget /unrealcv/status',
+    'vget /objects',
+    'vget /object/[str]/location',
+    'vget /object/[str]/rotation',
+    'vget /object/[str]/scale',
+    'vget /camera/[uint]/location',
+    'vget /camera/[uint]/rotation',
+    'vget /camera/[uint]/[str] [str]',
+    'vset /objects/spawn [str] [str]',
+    'vset /objects/spawn_bp_asset [str] [str]',
+    'vset /action/clean_garbage',
+    'vset /object/[str]/location [float] [float] [float]',
+    'vset /object/[str]/rotation [float] [float] [float]',
+    'vset /object/[str]/scale [float] [float] [float]',
+    'vset /object/[str]/physics [bool]',
+    'vset /object/[str]/collision [bool]',
+    'vset /object/[str]/object_mobility [bool]',
+    'vset /object/[str]/destroy',
+    'vrun [str]',
+    'vrun [str] [str]',
+    'DisableAllScreenMessages',
+    'vbp [str] [str]',
+    'vbp [str] [str] [str]',
+    'vbp [str] [str] [str] [str]',
+    'vbp [str] [str] [str] [str] [str]',
+]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local fake UnrealCV server')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--resolution', default='320x240')
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    w, h = (int(v) for v in args.resolution.split('x'))
+    server = FakeUnrealCVServer(args.port, args.ip, (w, h), args.latency).start()
+    print(f'FakeUnrealCV listening on {server.ip}:{server.port}')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import numpy as np
+
+from Config import Config
+from .pose_parser import PoseIndex
+
+
+class WorldSnapshot(object):
+    __slots__ = ('version', 'timestamp', 'poses')
+
+    def __init__(self, version, timestamp, poses):
+        self.version = version
+        self.timestamp = timestamp
+        self.poses = poses  # PoseIndex
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+
+class WorldStateCache(object):
+    """Actor poses fetched once per tick and shared by every agent.
+
+    A refresh reads the delivery manager's informations payload (if the client has a
+    `delivery_manager_name`) and fetches any tracked actor missing from it with one
+    batched location/rotation request. Reads are served from the current snapshot until it
+    is older than `ttl`; concurrent readers of an expired snapshot trigger a single refresh.
+
+    Args:
+        client (UnrealCvA2A): Client used for the queries, usually a Communicator.
+        ttl (float): Seconds a snapshot is served before it is refreshed.
+        actor_names (list): Actors to track outside the informations payload.
+    """
+
+    def __init__(self, client, ttl=Config.UE_UPDATE_DT, actor_names=()):
+        self.client = client
+        self.ttl = ttl
+        self.actor_names = list(actor_names)
+        self.current = WorldSnapshot(0, 0.0, PoseIndex())
+        self.refresh_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.refreshes = 0
+        self.reads = 0
+
+    def track(self, *actor_names):
+        for name in actor_names:
+            if name not in self.actor_names:
+                self.actor_names.append(name)
+
+    def refresh(self):
+        version = self.current.version
+        with self.refresh_lock:
+            if self.current.version != version:
+                # another reader refreshed while we were waiting
+                return self.current
+            index = self._fetch()
+            self.current = WorldSnapshot(version + 1, time.time(), index)
+            self.refreshes += 1
+        return self.current
+
+    def _fetch(self):
+        index = None
+        manager_name = getattr(self.client, 'delivery_manager_name', None)
+        if manager_name is not None:
+            index = self.client.parse_pose_index(self.client.get_informations(manager_name))
+        if index is None:
+            index = PoseIndex()
+        missing = [name for name in self.actor_names if name not in index]
+        if not missing:
+            return index
+        commands = [f'vget /object/{name}/location' for name in missing]
+        commands += [f'vget /object/{name}/rotation' for name in missing]
+        with self.client.session() as client:
+            responses = client.request_batch(commands)
+        names = list(index.rows)
+        rows = [index.poses]
+        for i, name in enumerate(missing):
+            try:
+                x, y = [float(v) for v in responses[i].split()][:2]
+                yaw = [float(v) for v in responses[len(missing) + i].split()][1]
+            except (ValueError, IndexError, AttributeError):
+                print(f"Warning: Could not get pose for {name}")
+                continue
+            names.append(name)
+            rows.append(np.array([[x, y, yaw]]))
+        return PoseIndex(names, np.concatenate(rows).reshape(-1, 3))
+
+    def snapshot(self, fresh=False):
+        """The current snapshot, refreshed first if it expired or `fresh` is set."""
+        self.reads += 1
+        if fresh:
+            return self._refresh_now()
+        if self.current.age > self.ttl:
+            return self.refresh()
+        return self.current
+
+    def _refresh_now(self):
+        # `fresh` reads must not reuse a refresh that started before they were issued
+        with self.refresh_lock:
+            self.current = WorldSnapshot(self.current.version + 1, time.time(), self._fetch())
+            self.refreshes += 1
+            return self.current
+
+    def get_pose(self, actor_name, fresh=False):
+        """(x, y, yaw) of an actor, None if it is not in the snapshot."""
+        return self.snapshot(fresh).poses.get(actor_name)
+
+    def get_poses(self, actor_names, fresh=False):
+        """(N, 2) positions, (N,) yaws and a found mask for many actors from one snapshot."""
+        return self.snapshot(fresh).poses.arrays(actor_names)
+
+    def start(self):
+        # keep the snapshot warm in the background, once per ttl
+        if self.thread is not None and self.thread.is_alive():
+            return self
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            start = time.time()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing world state: {e}")
+            self.stop_event.wait(max(0.0, self.ttl - (time.time() - start)))
@@ -0,0 +1,46 @@
+import time
+
+
+AGENT_COUNTS = [10, 100]
+
+
+def bench_agent_tick(runner, ticks=50, latency=0.0):
+    """One navigation tick (pose query, steering, batched commands) against a local fake server."""
+    from UE.unrealcv_fake import FakeUnrealCVServer
+    from UE.Communicator import Communicator
+    from UE.world_state import WorldStateCache
+    from A2A.base import ActionBuffer
+    from A2A.navigation import NavigationEngine
+
+    for count in AGENT_COUNTS:
+        name = f'end_to_end/navigation_tick/{count}'
+        if not runner.selected(name):
+            continue
+        with FakeUnrealCVServer(latency=latency) as server:
+            communicator = Communicator(server.port, '127.0.0.1', server.resolution)
+            server.handle('vset /objects/spawn /Game/BP_DeliveryManager.BP_DeliveryManager_C GEN_DeliveryManager')
+            names = [f'GEN_BP_DeliveryMan_C_{i}' for i in range(count)]
+            for i, actor in enumerate(names):
+                server.handle(f'vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C {actor}')
+                server.handle(f'vset /object/{actor}/location 0 {i * 300} 110')
+            communicator.delivery_manager_name = 'GEN_DeliveryManager'
+            world_state = WorldStateCache(communicator, actor_names=names)
+            buffer = ActionBuffer(unrealcv_client=communicator)
+            engine = NavigationEngine(buffer, world_state)
+            for i, actor in enumerate(names):
+                # far enough that nobody arrives during the run
+                engine.set_waypoints(actor, [(1e6, i * 300)])
+
+            samples = []
+            for _ in range(ticks):
+                start = time.perf_counter()
+                engine.tick()
+                samples.append(time.perf_counter() - start)
+            runner.record(name, samples[1:], agents=count, latency=latency,
+                          commands_sent=buffer.commands_sent)
+            communicator.client.disconnect()
+
+
+GROUPS = {
+    'end_to_end': bench_agent_tick,
+}
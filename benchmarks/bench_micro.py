@@ -0,0 +1,161 @@
+import base64
+import io
+import json
+import random
+import threading
+
+import cv2
+import numpy as np
+
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+ACTOR_COUNTS = [10, 100, 1000]
+
+
+def bench_decode(runner):
+    from UE.unrealcv_fake import FakeUnrealCVServer, encode_bmp
+    from UE.unrealcv_basic import UnrealCV
+    from UE.frame_pool import FramePool
+
+    for width, height in RESOLUTIONS:
+        server = FakeUnrealCVServer(resolution=(width, height))
+        frame = server.frame_array(0, 'lit')
+        bmp = encode_bmp(frame)
+        png = cv2.imencode('.png', frame)[1].tobytes()
+        # decoders only need the resolution, no connection
+        client = UnrealCV.__new__(UnrealCV)
+        client.resolution = (width, height)
+        pool = FramePool((width, height), size=2)
+        size = f'{width}x{height}'
+        # pairs doing the same work: a copy into a new array vs into a ring slot, and the zero-copy views
+        runner.bench(f'decode/bmp/{size}', lambda: client.decode_bmp(bmp, copy=True), bytes=len(bmp))
+        runner.bench(f'decode/bmp_pooled/{size}', lambda: pool.decode_bmp(bmp, copy=True), bytes=len(bmp))
+        runner.bench(f'decode/bmp_view/{size}', lambda: client.decode_bmp(bmp, copy=False), bytes=len(bmp))
+        runner.bench(f'decode/bmp_pooled_view/{size}', lambda: pool.decode_bmp(bmp, copy=False), bytes=len(bmp))
+        runner.bench(f'decode/png/{size}', lambda: client.decode_png(png), bytes=len(png))
+
+
+def bench_vector(runner):
+    from utils.Types import Vector, VectorArray
+
+    rng = random.Random(0)
+    vectors = [Vector(rng.uniform(-1e4, 1e4), rng.uniform(-1e4, 1e4)) for _ in range(1000)]
+    target = Vector(1234.5, -678.9)
+
+    def scalar_ops():
+        for v in vectors:
+            d = (target - v).normalize()
+            (v + d * 100.0).distance(target)
+
+    array = VectorArray.from_vectors(vectors)
+
+    def array_ops():
+        d = (array - target).normalize() * -1.0
+        (array + d * 100.0).distance(target)
+
+    runner.bench('vector/scalar_step_1000', scalar_ops, count=1000)
+    runner.bench('vector/array_step_1000', array_ops, count=1000)
+    runner.bench('vector/construct', lambda: Vector(1.0, 2.0))
+    runner.bench('vector/add', lambda: target + target)
+
+
+def _informations(count):
+    from UE.unrealcv_fake import FakeUnrealCVServer
+
+    server = FakeUnrealCVServer()
+    rng = random.Random(count)
+    for i in range(count):
+        name = f'GEN_BP_DeliveryMan_C_{i}'
+        server.handle(f'vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C {name}')
+        server.handle(f'vset /object/{name}/location {rng.uniform(-1e4, 1e4)} {rng.uniform(-1e4, 1e4)} 110')
+        server.handle(f'vset /object/{name}/rotation 0 {rng.uniform(-180, 180)} 0')
+    # the payload `vbp <manager> GetInformations` answers with
+    return json.dumps(server.informations())
+
+
+def bench_pose_parsing(runner):
+    from UE.pose_parser import PoseIndex
+
+    payloads = {count: _informations(count) for count in ACTOR_COUNTS}
+    for count, info in payloads.items():
+        runner.bench(f'pose/pose_index/{count}', lambda: PoseIndex.from_informations(info), actors=count)
+
+    from UE.Communicator import Communicator
+
+    # parse_position_and_direction only needs the id -> name map, no connection
+    communicator = Communicator.__new__(Communicator)
+    for count, info in payloads.items():
+        communicator.delivery_man_id_to_name = {i: f'GEN_BP_DeliveryMan_C_{i}' for i in range(count)}
+        ids = list(range(count))
+        runner.bench(f'pose/get_position_and_direction/{count}',
+                     lambda: communicator.parse_position_and_direction(info, ids), actors=count)
+
+
+def _null_client():
+    # UnrealCvA2A's own session() and lock around a client that drops the batches,
+    # so a flush takes the same locked path as in production
+    from UE.unrealcv_a2a import UnrealCvA2A
+
+    class NullClient(UnrealCvA2A):
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.pool = None
+            self.client = self
+            self.batches = 0
+
+        def request_batch_async(self, commands):
+            self.batches += 1
+
+    return NullClient()
+
+
+def bench_action_buffer(runner):
+    from A2A.base import ActionBuffer, Action
+
+    for actors in (10, 100, 1000):
+        buffer = ActionBuffer(max_size=8, unrealcv_client=_null_client())
+        names = [f'dm{i}' for i in range(actors)]
+
+        def tick():
+            for name in names:
+                buffer.push_action(Action(name, 'Rotate_Angle', [0.2, 3.0, 1]))
+                buffer.push_action(Action(name, 'Move_Speed', [150.0, 0.2, 0]))
+            buffer.flush()
+
+        runner.bench(f'action_buffer/push_flush/{actors}', tick, actors=actors)
+        runner.bench(f'action_buffer/history/{actors}', lambda: [buffer.get_action_history(n) for n in names],
+                     actors=actors)
+
+
+def bench_image_base64(runner):
+    from PIL import Image
+    from llm.image_encoding import ImageEncoder
+
+    rng = np.random.default_rng(0)
+    for width, height in RESOLUTIONS:
+        # gradient plus noise, compresses like a rendered frame rather than pure noise
+        frame = (np.linspace(0, 200, width, dtype=np.float32)[None, :, None]
+                 + rng.integers(0, 40, (height, width, 3))).astype(np.uint8)
+        size = f'{width}x{height}'
+
+        def legacy():
+            # the PIL path _process_image_to_base64 used before ImageEncoder
+            buffered = io.BytesIO()
+            Image.fromarray(frame).save(buffered, format='JPEG')
+            return base64.b64encode(buffered.getvalue()).decode()
+
+        encoder = ImageEncoder()
+        runner.bench(f'image_base64/pil_full_res/{size}', legacy)
+        runner.bench(f'image_base64/encode_cold/{size}', lambda: ImageEncoder().encode(frame),
+                     max_side=encoder.max_side, quality=encoder.quality)
+        runner.bench(f'image_base64/encode_memoized/{size}', lambda: encoder.encode(frame),
+                     max_side=encoder.max_side, quality=encoder.quality)
+
+
+GROUPS = {
+    'decode': bench_decode,
+    'vector': bench_vector,
+    'pose': bench_pose_parsing,
+    'action_buffer': bench_action_buffer,
+    'image_base64': bench_image_base64,
+}
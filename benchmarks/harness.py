@@ -0,0 +1,171 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+class BenchmarkRunner:
+    """Times benchmark cases and collects the results for JSON output.
+
+    Every case is calibrated so one repeat runs for about `min_time / repeat` seconds, then
+    timed `repeat` times; the per-call median is what baselines are compared on.
+
+    Args:
+        repeat (int): Timed repeats per case.
+        min_time (float): Target total timing time per case in seconds.
+        filter (str): Only run cases whose name contains this substring.
+    """
+
+    def __init__(self, repeat=5, min_time=0.5, filter=None):
+        self.repeat = repeat
+        self.min_time = min_time
+        self.filter = filter
+        self.results = {}
+        self.skipped = {}
+
+    def selected(self, name):
+        return self.filter is None or self.filter in name
+
+    def bench(self, name, fn, number=None, **params):
+        """Time `fn()` and record it under `name`, `params` are stored alongside for reference."""
+        if not self.selected(name):
+            return None
+        fn()  # warm-up, also surfaces errors before timing
+        if number is None:
+            number = self._calibrate(fn)
+        times = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+        result = {
+            'median': statistics.median(times),
+            'min': min(times),
+            'mean': statistics.fmean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'number': number,
+            'repeat': self.repeat,
+            'ops_per_sec': 1.0 / statistics.median(times) if statistics.median(times) > 0 else float('inf'),
+            'params': params,
+        }
+        self.results[name] = result
+        print(f"{name:<60} {format_time(result['median']):>12}  (x{number}, {self.repeat} repeats)")
+        return result
+
+    def record(self, name, seconds, **params):
+        """Record an externally measured per-call time (e.g. per tick of a loop the case drives itself)."""
+        if not self.selected(name):
+            return None
+        seconds = list(seconds)
+        result = {
+            'median': statistics.median(seconds),
+            'min': min(seconds),
+            'mean': statistics.fmean(seconds),
+            'stdev': statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+            'number': 1,
+            'repeat': len(seconds),
+            'ops_per_sec': 1.0 / statistics.median(seconds) if statistics.median(seconds) > 0 else float('inf'),
+            'params': params,
+        }
+        self.results[name] = result
+        print(f"{name:<60} {format_time(result['median']):>12}  ({len(seconds)} samples)")
+        return result
+
+    def skip(self, group, reason):
+        self.skipped[group] = reason
+        print(f"{group:<60} skipped: {reason}")
+
+    def _calibrate(self, fn):
+        target = self.min_time / self.repeat
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= target * 0.2 or number >= 1_000_000:
+                return max(1, int(number * target / max(elapsed, 1e-9)))
+            number *= 10
+
+    def to_json(self):
+        return {'meta': environment(), 'results': self.results, 'skipped': self.skipped}
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                timeout=5, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.time(),
+        'commit': commit or None,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=0.10):
+    """Per-case median ratio against a baseline results file.
+
+    Returns:
+        list of (name, baseline median, current median, ratio, status) with status one of
+        'regression', 'improvement', 'same', 'new' or 'missing'.
+    """
+    current = results['results']
+    previous = baseline.get('results', {})
+    rows = []
+    for name in sorted(set(current) | set(previous)):
+        if name not in previous:
+            rows.append((name, None, current[name]['median'], None, 'new'))
+            continue
+        if name not in current:
+            rows.append((name, previous[name]['median'], None, None, 'missing'))
+            continue
+        old, new = previous[name]['median'], current[name]['median']
+        ratio = new / old if old > 0 else float('inf')
+        if ratio > 1.0 + threshold:
+            status = 'regression'
+        elif ratio < 1.0 / (1.0 + threshold):
+            status = 'improvement'
+        else:
+            status = 'same'
+        rows.append((name, old, new, ratio, status))
+    return rows
+
+
+def print_comparison(rows):
+    for name, old, new, ratio, status in rows:
+        old_text = format_time(old) if old is not None else '-'
+        new_text = format_time(new) if new is not None else '-'
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else '-'
+        print(f"{name:<60} {old_text:>12} -> {new_text:>12}  {ratio_text:>7}  {status}")
+
+
+def load(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save(data, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,70 @@
+"""Benchmark suite for the simulator client stack.
+
+    python -m benchmarks.run --output benchmarks/results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.run --groups decode pose --filter 1000
+
+Results are written as JSON (per-case median/min/mean/stdev per call, plus environment
+metadata). With --baseline, every case is compared on its median and cases slower by
+more than --threshold are reported as regressions.
+
+The decode, pose, action_buffer and end_to_end groups import the UE package, which needs
+the external Base package (and the A2A groups with it). Where it is not importable those
+groups are skipped and listed at the end of the run and under "skipped" in the JSON.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_micro, bench_end_to_end
+from benchmarks.harness import BenchmarkRunner, compare, print_comparison, load, save
+
+
+GROUPS = {**bench_micro.GROUPS, **bench_end_to_end.GROUPS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the simulator client benchmarks.')
+    parser.add_argument('--groups', nargs='*', choices=sorted(GROUPS), help='Groups to run, all by default')
+    parser.add_argument('--filter', help='Only run cases whose name contains this substring')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.5, help='Target timing seconds per case')
+    parser.add_argument('--output', default='benchmarks/results.json')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown counted as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    runner = BenchmarkRunner(repeat=args.repeat, min_time=args.min_time, filter=args.filter)
+    for group in args.groups or GROUPS:
+        try:
+            GROUPS[group](runner)
+        except ImportError as e:
+            # groups whose modules need packages that are not installed are reported, not failed
+            runner.skip(group, f'{type(e).__name__}: {e}')
+
+    results = runner.to_json()
+    save(results, args.output)
+    print(f"\nWrote {len(runner.results)} results to {args.output}")
+    if runner.skipped:
+        print(f"Skipped {len(runner.skipped)} group(s), their cases are missing from the results:")
+        for group, reason in runner.skipped.items():
+            print(f"    {group}: {reason}")
+        if any("'Base'" in reason for reason in runner.skipped.values()):
+            print("The UE package imports the external Base package, make it importable to run these groups.")
+
+    if args.baseline:
+        rows = compare(results, load(args.baseline), args.threshold)
+        print(f"\nComparison against {args.baseline} (threshold {args.threshold:.0%}):")
+        print_comparison(rows)
+        regressions = [row for row in rows if row[4] == 'regression']
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
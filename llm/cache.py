@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from openai.types.chat import ChatCompletionMessageToolCall
+
+
+DATA_URL_PATTERN = re.compile(r'^data:(?P<mime>[\w/+.-]+);base64,(?P<data>.*)$', re.S)
+
+
+def _normalize(value):
+    # replace inline images by the hash of their bytes so keys stay small and stable
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str) and value.startswith('data:'):
+        match = DATA_URL_PATTERN.match(value)
+        if match:
+            digest = hashlib.sha256(match.group('data').encode()).hexdigest()
+            return f"data:{match.group('mime')};sha256,{digest}"
+    return value
+
+
+def make_key(model, messages, tools=None, **params):
+    """Stable sha256 of the model, messages (images by content hash), tool schema and sampling parameters."""
+    payload = {
+        'model': model,
+        'messages': _normalize(messages),
+        'tools': tools or [],
+        'params': params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def dump_tool_calls(results):
+    """JSON-serializable form of the `function_calling` results (one list of tool calls per choice)."""
+    dumped = []
+    for calls in results:
+        if calls is None or isinstance(calls, dict):
+            dumped.append(calls)
+        else:
+            dumped.append([call.model_dump() if hasattr(call, 'model_dump') else call for call in calls])
+    return dumped
+
+
+def load_tool_calls(data):
+    """Inverse of `dump_tool_calls`, tool calls come back with `.type` and `.function.name/arguments`."""
+    results = []
+    for calls in data:
+        if calls is None or isinstance(calls, dict):
+            results.append(calls)
+        else:
+            results.append([ChatCompletionMessageToolCall.model_validate(call) for call in calls])
+    return results
+
+
+class LLMResponseCache:
+    """Two-tier cache of LLM responses keyed by `make_key`.
+
+    Hits are served from an in-memory LRU first, then from JSON files under `directory`
+    (if given). The disk tier is trimmed to `max_disk_bytes`, least recently used files
+    first. Values must be JSON-serializable.
+
+    Args:
+        max_entries (int): Size of the in-memory LRU.
+        directory (str): Directory of the disk tier, None keeps the cache in memory only.
+        max_disk_bytes (int): Size limit of the disk tier.
+    """
+
+    def __init__(self, max_entries=1024, directory=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    make_key = staticmethod(make_key)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+        value = self._read_disk(key)
+        with self.lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self.lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def bypass(self):
+        """Count a request that was deliberately not looked up (e.g. sampled output)."""
+        with self.lock:
+            self.bypasses += 1
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+            os.utime(path)  # mtime doubles as the LRU clock of the disk tier
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, value):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value).encode()
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Warning: Could not write LLM cache entry {key}: {e}")
+            return
+        with self.lock:
+            self.disk_bytes += len(data) - old_size
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        # drop least recently used files until the tier is back under 90% of its limit
+        target = 0.9 * self.max_disk_bytes
+        for _, path, size in sorted(self._disk_entries()):
+            if self.disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.disk_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.directory is not None:
+                for _, path, _ in self._disk_entries():
+                    os.remove(path)
+            self.disk_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_bytes': self.disk_bytes,
+            }
@@ -0,0 +1,136 @@
+import base64
+import hashlib
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from Config import Config
+
+
+FORMATS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'png': ('.png', 'image/png', cv2.IMWRITE_PNG_COMPRESSION),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def frame_hash(image: np.ndarray) -> str:
+    """Content hash of a frame, including its shape and dtype. Reads the whole frame."""
+    digest = hashlib.sha256()
+    digest.update(f'{image.shape}{image.dtype}'.encode())
+    digest.update(memoryview(np.ascontiguousarray(image)).cast('B'))
+    return digest.hexdigest()
+
+
+class ImageEncoder:
+    """Frame -> base64 pipeline for multimodal prompts: crop, downscale, encode with OpenCV.
+
+    Encoded frames are memoized by array identity (the same object and buffer) plus a checksum
+    of every few rows, so sending the same frame again on a retry or to another agent costs no
+    full-frame hash. An equal copy is a different array and is encoded again; an in-place
+    edit confined to rows the checksum skips is not noticed, so do not edit frames in place
+    after encoding them (get_camera_observation returns a private copy by default).
+
+    Args:
+        max_side (int): Longest side after downscaling, None keeps the capture resolution.
+        quality (int): 0-100, higher is better. JPEG/WebP quality; for png, which is lossless,
+            it is mapped to a compression level (100 -> 0, fastest, 0 -> 9, smallest).
+        format (str): 'jpeg', 'png' or 'webp'.
+        crop (tuple): Optional (x, y, width, height) region applied before downscaling.
+        color (str): Channel order of 3-channel input, 'bgr' (UE / OpenCV frames) or 'rgb'.
+        cache_size (int): Number of encoded frames kept.
+        interpolation (int): OpenCV interpolation used for downscaling. INTER_LINEAR is the
+            cheapest; INTER_AREA avoids aliasing on large reductions but costs several times the
+            CPU (about 6 ms instead of 1 ms for 1280x720 -> 768 px).
+    """
+
+    def __init__(self, max_side=Config.LLM_IMAGE_MAX_SIDE, quality=Config.LLM_IMAGE_QUALITY,
+                 format=Config.LLM_IMAGE_FORMAT, crop=None, color='bgr', cache_size=256,
+                 interpolation=cv2.INTER_LINEAR):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported image format {format}, use one of {list(FORMATS)}")
+        if not 0 <= quality <= 100:
+            raise ValueError(f"Image quality must be within 0-100, got {quality}")
+        self.max_side = max_side
+        self.quality = quality
+        self.format = format
+        self.crop = crop
+        self.color = color
+        self.cache_size = cache_size
+        self.interpolation = interpolation
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def mime(self):
+        return FORMATS[self.format][1]
+
+    @property
+    def encode_params(self):
+        _, _, flag = FORMATS[self.format]
+        if self.format == 'png':
+            return [int(flag), round((100 - self.quality) * 9 / 100)]
+        return [int(flag), int(self.quality)]
+
+    def prepare(self, image: np.ndarray) -> np.ndarray:
+        """uint8 BGR frame, cropped and downscaled, ready for cv2.imencode."""
+        if image.dtype != np.uint8:
+            image = (np.clip(image, 0, 1) * 255).astype(np.uint8)
+        if self.crop is not None:
+            x, y, w, h = self.crop
+            image = image[y:y + h, x:x + w]
+        if image.ndim == 3 and image.shape[2] == 1:
+            image = image[:, :, 0]
+        if image.ndim == 3 and image.shape[2] == 4:
+            image = image[:, :, :3]
+        if image.ndim == 3 and self.color == 'rgb':
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        if self.max_side is not None and max(image.shape[:2]) > self.max_side:
+            scale = self.max_side / max(image.shape[:2])
+            size = (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale)))
+            image = cv2.resize(image, size, interpolation=self.interpolation)
+        return image
+
+    def encode_bytes(self, image: np.ndarray) -> bytes:
+        extension = FORMATS[self.format][0]
+        ok, buffer = cv2.imencode(extension, self.prepare(image), self.encode_params)
+        if not ok:
+            raise ValueError(f"Could not encode image of shape {image.shape} as {self.format}")
+        return buffer.tobytes()
+
+    @staticmethod
+    def _identity(image: np.ndarray):
+        # the array object and its buffer, plus a checksum of about 32 evenly spaced rows
+        rows = np.ascontiguousarray(image[::max(1, image.shape[0] // 32)])
+        return (id(image), image.__array_interface__['data'][0], image.shape, image.strides,
+                image.dtype.str, zlib.crc32(rows))
+
+    def encode(self, image: np.ndarray) -> str:
+        """Base64 string of the encoded frame."""
+        key = self._identity(image)
+        with self.lock:
+            entry = self.cache.get(key)
+            # the id of a collected array can be reused, the weak reference tells them apart
+            if entry is not None and entry[0]() is image:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        encoded = base64.b64encode(self.encode_bytes(image)).decode()
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = (weakref.ref(image), encoded)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return encoded
+
+    def data_url(self, image) -> str:
+        """data URL for an image_url message part; strings are passed through as base64 JPEG or full data URLs."""
+        if isinstance(image, str):
+            return image if image.startswith('data:') else f'data:image/jpeg;base64,{image}'
+        return f'data:{self.mime};base64,{self.encode(image)}'
@@ -1,49 +1,59 @@
-import cv2
 import numpy as np
-import io
-import base64
-from PIL import Image
 import time
 from typing import Optional, Union
-import json
 
 from Base.ActionSpace import ActionSpace
 from Base.ReasoningSpace import ReasoningSpace
 from Tools import tools
 from reasoners.lm.openai_model import OpenAIModel, GenerateOutput
+from .cache import dump_tool_calls, load_tool_calls
+from .rate_limiter import get_rate_limiter, estimate_tokens, is_retryable, backoff_delay
+from .image_encoding import ImageEncoder
+from .trace import get_trace_sink
 
 class UEOpenAIModel(OpenAIModel):
-    def __init__(self, model: str, additional_prompt: str = "ANSWER", **kwargs):
+    def __init__(self, model: str, additional_prompt: str = "ANSWER", cache=None, image_encoder=None, tracer=None, **kwargs):
         super().__init__(model, **kwargs)
         self.additional_prompt = additional_prompt
         self.is_instruct_model = False
+        self.cache = cache # optional LLMResponseCache
+        self.image_encoder = image_encoder if image_encoder is not None else ImageEncoder()
+        self.tracer = tracer if tracer is not None else get_trace_sink()
+
+    def _trace(self, kind, messages, tools, result=None, error=None, attempt=1, start=None, **params):
+        """Hand the request and its outcome to the trace sink, serialization happens on its writer thread"""
+        self.tracer.record({
+            "kind": kind,
+            "model": self.model,
+            "messages": messages,
+            "tools": tools,
+            "params": params,
+            "result": result,
+            "error": None if error is None else repr(error),
+            "attempt": attempt,
+            "latency": None if start is None else time.time() - start,
+        })
+
+    def _cache_key(self, messages, tools, temperature, allow_cached_sampling, **params):
+        """Cache key of a request, None if there is no cache or the request must not be cached."""
+        if self.cache is None:
+            return None
+        if temperature and temperature > 0 and not allow_cached_sampling:
+            # sampled outputs are meant to differ between calls
+            self.cache.bypass()
+            return None
+        return self.cache.make_key(self.model, messages, tools, temperature=temperature, **params)
 
     def _process_image_to_base64(self, image: np.ndarray) -> str:
         """Convert numpy array image to base64 string.
 
         Args:
-            image (np.ndarray): Image array (1 or 3 channels)
+            image (np.ndarray): BGR frame (1, 3 or 4 channels), uint8 or float in [0, 1]
 
         Returns:
-            str: Base64 encoded image string
+            str: Base64 encoded image string, in the format of `self.image_encoder`
         """
-        # Convert single channel to 3 channels if needed
-        if len(image.shape) == 2 or (len(image.shape) == 3 and image.shape[2] == 1):
-            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-
-        # Ensure uint8 type
-        if image.dtype != np.uint8:
-            image = (image * 255).astype(np.uint8)
-
-        # Convert to PIL Image
-        pil_image = Image.fromarray(image)
-
-        # Convert to base64
-        buffered = io.BytesIO()
-        pil_image.save(buffered, format="JPEG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-
-        return img_str
+        return self.image_encoder.encode(image)
 
     def function_calling(
         self,
@@ -55,13 +65,15 @@ class UEOpenAIModel(OpenAIModel):
         top_p: float = 1.0,
         num_return_sequences: int = 1,
         rate_limit_per_min: Optional[int] = 20,
+        tokens_per_min: Optional[int] = None,
         stop: Optional[str] = None,
         logprobs: Optional[int] = None,
         temperature=None,
         additional_prompt=None,
-        retry=64,
+        retry=8,
         action_history: Optional[list[str]] = None,
         is_instruct_model: bool = False,
+        allow_cached_sampling: bool = False,
         **kwargs,
     ) -> GenerateOutput:
 
@@ -104,37 +116,46 @@ class UEOpenAIModel(OpenAIModel):
         if images and not supports_vision:
             raise ValueError(f"Model {self.model} does not support vision/multimodal inputs")
 
+        if is_instruct_model:
+            # build the user message once, retries reuse it
+            user_content = []
+            if action_history:
+                user_content.append({"type": "text", "text": f"Your action history is: {action_history}"})
+            # build the message content
+            if user_prompt:
+                user_content.append({"type": "text", "text": user_prompt})
+            if images and supports_vision:
+                if isinstance(images, str):
+                    images = [images]
+                for image in images:
+                    # base64 strings are used directly, frames are encoded (and memoized) by the image encoder
+                    user_content.append({
+                        "type": "image_url",
+                        "image_url": {"url": self.image_encoder.data_url(image)}
+                    })
+
+            messages.append({"role": "user", "content": user_content if len(user_content) > 1 else user_content[0]["text"]})
+
+        cache_key = self._cache_key(messages, functions, temperature, allow_cached_sampling,
+                                    kind="function_calling", instruct=is_instruct_model, max_tokens=max_tokens,
+                                    top_p=top_p, n=num_return_sequences, **kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return load_tool_calls(cached) if is_instruct_model else cached
+
+        # budgets are shared by every caller of this model in the process
+        limiter = get_rate_limiter(self.model, rate_limit_per_min, tokens_per_min)
+        estimated_tokens = estimate_tokens(messages, max_tokens)
+
+        retry = max(1, retry) # at least one attempt, the last one re-raises
         for i in range(1, retry + 1):
+            start = None
             try:
-                if rate_limit_per_min is not None:
-                    time.sleep(60 / rate_limit_per_min)
+                limiter.acquire(estimated_tokens)
+                start = time.time()
 
                 if is_instruct_model:
-                    user_content = []
-                    if action_history:
-                        user_content.append({"type": "text", "text": f"Your action history is: {action_history}"})
-                    # build the message content
-                    if user_prompt:
-                        user_content.append({"type": "text", "text": user_prompt})
-                    if images and supports_vision:
-                        if isinstance(images, str):
-                            images = [images]
-                        for image in images:
-                            # If image is already a base64 string, use it directly
-                            if isinstance(image, str):
-                                img_data = image
-                            else:
-                                img_data = self._process_image_to_base64(image)
-                            user_content.append({
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/jpeg;base64,{img_data}"}
-                            })
-
-                    messages.append({"role": "user", "content": user_content if len(user_content) > 1 else user_content[0]["text"]})
-
-                    with open("messages.json", "w") as f:
-                        json.dump(messages, f)
-
                     response = self.client.chat.completions.create(
                         model=self.model,
                         messages=messages,
@@ -145,6 +166,7 @@ class UEOpenAIModel(OpenAIModel):
                         tools=functions if functions else [],
                         tool_choice="required"
                     )
+                    limiter.record_usage(response, estimated_tokens)
                     # process the returned results
                     results = []
                     for choice in response.choices:
@@ -158,6 +180,10 @@ class UEOpenAIModel(OpenAIModel):
                         else:
                             results.append(choice.message.tool_calls)
 
+                    if cache_key is not None:
+                        self.cache.put(cache_key, dump_tool_calls(results))
+                    self._trace("function_calling", messages, functions, dump_tool_calls(results), attempt=i,
+                                start=start, temperature=temperature, max_tokens=max_tokens)
                     return results
                 else:
                     response = self.client.chat.completions.create(
@@ -170,15 +196,21 @@ class UEOpenAIModel(OpenAIModel):
                         logprobs=0,
                         **kwargs,
                     )
+                    limiter.record_usage(response, estimated_tokens)
+                    if cache_key is not None:
+                        self.cache.put(cache_key, response.choices[0].message.content)
+                    self._trace("function_calling", messages, functions, response.choices[0].message.content,
+                                attempt=i, start=start, temperature=temperature, max_tokens=max_tokens)
                     return response.choices[0].message.content
 
             except Exception as e:
-                print(f"An Error Occurred: {e}, sleeping for {i} seconds")
-                time.sleep(i)
-
-        raise RuntimeError(
-            "GPTCompletionModel failed to generate output, even after 64 tries"
-        )
+                self._trace("function_calling", messages, functions, error=e, attempt=i, start=start,
+                            temperature=temperature, max_tokens=max_tokens)
+                if not is_retryable(e) or i == retry:
+                    raise
+                delay = backoff_delay(i, e)
+                print(f"An Error Occurred: {e}, sleeping for {delay:.1f} seconds")
+                time.sleep(delay)
 
     def generate(
         self,
@@ -189,12 +221,14 @@ class UEOpenAIModel(OpenAIModel):
         top_p: float = 1.0,
         num_return_sequences: int = 1,
         rate_limit_per_min: Optional[int] = 20,
+        tokens_per_min: Optional[int] = None,
         logprobs: Optional[int] = None,
         temperature=None,
         additional_prompt=None,
-        retry=64,
+        retry=8,
         action_history: Optional[list[str]] = None,
         is_instruct_model: bool = False,
+        allow_cached_sampling: bool = False,
         **kwargs,
     ) -> GenerateOutput:
 
@@ -216,14 +250,10 @@ class UEOpenAIModel(OpenAIModel):
             if isinstance(images, str):
                 images = [images]
             for image in images:
-                # If image is already a base64 string, use it directly
-                if isinstance(image, str):
-                    img_data = image
-                else:
-                    img_data = self._process_image_to_base64(image)
+                # base64 strings are used directly, frames are encoded (and memoized) by the image encoder
                 user_content.append({
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{img_data}"}
+                    "image_url": {"url": self.image_encoder.data_url(image)}
                 })
 
         if action_history:
@@ -242,11 +272,25 @@ class UEOpenAIModel(OpenAIModel):
             ):
                 is_instruct_model = True
 
+        cache_key = self._cache_key(messages, None, temperature, allow_cached_sampling,
+                                    kind="generate", instruct=is_instruct_model, max_tokens=max_tokens,
+                                    top_p=top_p, n=num_return_sequences, **kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return GenerateOutput(text=cached["text"], log_prob=cached["log_prob"])
+
+        # budgets are shared by every caller of this model in the process
+        limiter = get_rate_limiter(self.model, rate_limit_per_min, tokens_per_min)
+        estimated_tokens = estimate_tokens(messages, max_tokens)
+
+        retry = max(1, retry) # at least one attempt, the last one re-raises
         for i in range(1, retry + 1):
+            start = None
             try:
-                # sleep several seconds to avoid rate limit
-                if rate_limit_per_min is not None:
-                    time.sleep(60 / rate_limit_per_min)
+                # only blocks when the request or token budget is exhausted
+                limiter.acquire(estimated_tokens)
+                start = time.time()
                 ### GPT 3.5 and higher use a different API
                 if is_instruct_model:
                     response = self.client.beta.chat.completions.parse(
@@ -259,10 +303,16 @@ class UEOpenAIModel(OpenAIModel):
                         # response_format=ActionSpace,
                         **kwargs,
                     )
-                    return GenerateOutput(
+                    limiter.record_usage(response, estimated_tokens)
+                    output = GenerateOutput(
                         text=[choice.message.content for choice in response.choices],
                         log_prob=None,
                     )
+                    if cache_key is not None:
+                        self.cache.put(cache_key, {"text": output.text, "log_prob": output.log_prob})
+                    self._trace("generate", messages, None, output.text, attempt=i, start=start,
+                                temperature=temperature, max_tokens=max_tokens)
+                    return output
                 else:
                     response = self.client.chat.completions.create(
                         model=self.model,
@@ -275,19 +325,25 @@ class UEOpenAIModel(OpenAIModel):
                         # response_format=ActionSpace,
                         **kwargs,
                     )
-                    return GenerateOutput(
+                    limiter.record_usage(response, estimated_tokens)
+                    output = GenerateOutput(
                         text=[choice["text"] for choice in response.choices],
                         log_prob=[choice["logprobs"] for choice in response["choices"]],
                     )
+                    if cache_key is not None:
+                        self.cache.put(cache_key, {"text": output.text, "log_prob": output.log_prob})
+                    self._trace("generate", messages, None, output.text, attempt=i, start=start,
+                                temperature=temperature, max_tokens=max_tokens)
+                    return output
 
             except Exception as e:
-                print(f"An Error Occured: {e}, sleeping for {i} seconds")
-                time.sleep(i)
-
-        # after 64 tries, still no luck
-        raise RuntimeError(
-            "GPTCompletionModel failed to generate output, even after 64 tries"
-        )
+                self._trace("generate", messages, None, error=e, attempt=i, start=start,
+                            temperature=temperature, max_tokens=max_tokens)
+                if not is_retryable(e) or i == retry:
+                    raise
+                delay = backoff_delay(i, e)
+                print(f"An Error Occurred: {e}, sleeping for {delay:.1f} seconds")
+                time.sleep(delay)
 
     # def react(self, system_prompt: str,
     #             context_prompt: str,
@@ -0,0 +1,154 @@
+import email.utils
+import json
+import random
+import threading
+import time
+
+import openai
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate_per_min`, holding at most `capacity`.
+
+    `acquire` reserves immediately and returns how long the caller has to wait for the
+    reservation to be covered; the balance may go negative, so concurrent callers queue
+    up in arrival order instead of racing for the next refill.
+    """
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate_per_min = rate_per_min # as configured, compared exactly by get_rate_limiter
+        self.rate = rate_per_min / 60.0
+        self.capacity = rate_per_min if capacity is None else capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount=1):
+        with self.lock:
+            self._refill(time.monotonic())
+            amount = min(amount, self.capacity)
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def credit(self, amount):
+        """Return (or, if negative, take) tokens after the real cost of a request is known."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ModelRateLimiter:
+    """Request and token budgets of one model, shared by every caller in the process."""
+
+    def __init__(self, requests_per_min=None, tokens_per_min=None):
+        self.requests = TokenBucket(requests_per_min) if requests_per_min else None
+        self.tokens = TokenBucket(tokens_per_min) if tokens_per_min else None
+        self.waits = 0
+        self.waited = 0.0
+
+    def acquire(self, estimated_tokens=0):
+        """Block until both budgets cover the request, return the seconds waited."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        if self.tokens is not None and estimated_tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if wait > 0:
+            self.waits += 1
+            self.waited += wait
+            time.sleep(wait)
+        return wait
+
+    def record_usage(self, response, estimated_tokens):
+        """Correct the token budget with the usage reported in the response."""
+        usage = getattr(response, 'usage', None)
+        total = getattr(usage, 'total_tokens', None)
+        if self.tokens is not None and total is not None:
+            self.tokens.credit(estimated_tokens - total)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model, requests_per_min=None, tokens_per_min=None):
+    """Process-wide limiter of a model, created on first use; later calls with other limits update it."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = ModelRateLimiter(requests_per_min, tokens_per_min)
+            return limiter
+        if requests_per_min and (limiter.requests is None or limiter.requests.rate_per_min != requests_per_min):
+            limiter.requests = TokenBucket(requests_per_min)
+        if tokens_per_min and (limiter.tokens is None or limiter.tokens.rate_per_min != tokens_per_min):
+            limiter.tokens = TokenBucket(tokens_per_min)
+        return limiter
+
+
+def estimate_tokens(messages, max_tokens=None, image_tokens=765):
+    """Rough token count of a request: ~4 characters per text token, a flat cost per image, plus the completion budget."""
+    tokens = 0
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'image_url':
+                    tokens += image_tokens
+                else:
+                    tokens += len(json.dumps(part)) // 4
+        elif content:
+            tokens += len(str(content)) // 4
+    return tokens + (max_tokens or 0)
+
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+NON_RETRYABLE_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError, openai.BadRequestError,
+                        openai.NotFoundError, openai.UnprocessableEntityError)
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection and 5xx errors are retried, anything else fails fast."""
+    if isinstance(error, NON_RETRYABLE_ERRORS):
+        return False
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def retry_after(error):
+    """Seconds requested by the server's Retry-After headers, None if absent."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, error=None, base=1.0, max_delay=60.0):
+    """Full-jitter exponential backoff, or the server's Retry-After (plus a little jitter) when given."""
+    requested = retry_after(error) if error is not None else None
+    if requested is not None:
+        return min(requested, max_delay) + random.uniform(0, 0.1 * base)
+    return random.uniform(0, min(max_delay, base * 2 ** (attempt - 1)))
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+from .cache import dump_tool_calls, load_tool_calls
+from .image_encoding import frame_hash
+
+try:
+    from reasoners.lm.openai_model import GenerateOutput
+except ImportError:
+    # replay must work without the reasoners package, offline benchmarks only need the fields
+    GenerateOutput = namedtuple('GenerateOutput', ['text', 'log_prob'])
+
+
+def call_fingerprint(kind, model, system_prompt, user_prompt, images=None, functions=None,
+                     action_history=None, **params):
+    """Stable sha256 of a function_calling/generate call, images by content hash."""
+    if images is not None and not isinstance(images, list):
+        images = [images]
+    image_keys = []
+    for image in images or []:
+        if isinstance(image, np.ndarray):
+            image_keys.append(frame_hash(image))
+        else:
+            image_keys.append(hashlib.sha256(str(image).encode()).hexdigest())
+    payload = {
+        'kind': kind,
+        'model': model,
+        'system_prompt': system_prompt,
+        'user_prompt': user_prompt,
+        'images': image_keys,
+        'functions': functions or [],
+        'action_history': action_history,
+        'params': {k: v for k, v in params.items() if v is not None},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+# arguments that change the response, everything else (retry, rate limits) is ignored by fingerprints
+FINGERPRINT_PARAMS = ('max_tokens', 'top_p', 'num_return_sequences', 'temperature')
+
+
+def _fingerprint_params(kwargs):
+    return {k: kwargs.get(k) for k in FINGERPRINT_PARAMS}
+
+
+class Cassette:
+    """Recorded LLM calls, one JSON line per call: fingerprint, kind, response and latency.
+
+    Lines are appended as they are recorded, so a crashed run keeps what it recorded.
+    Several responses for the same fingerprint are replayed in recording order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = defaultdict(list)  # fingerprint -> [entry]
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry['fingerprint']].append(entry)
+
+    def append(self, fingerprint, kind, response, latency):
+        entry = {'fingerprint': fingerprint, 'kind': kind, 'response': response, 'latency': latency}
+        with self.lock:
+            self.entries[fingerprint].append(entry)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+
+class RecordingModel:
+    """Wraps a UEOpenAIModel and records every function_calling/generate call to a cassette."""
+
+    def __init__(self, model, cassette):
+        self.model = model
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+
+    def function_calling(self, system_prompt, user_prompt, images=None, functions=None,
+                         action_history=None, **kwargs):
+        fingerprint = call_fingerprint('function_calling', self.model.model, system_prompt, user_prompt, images,
+                                       functions, action_history, **_fingerprint_params(kwargs))
+        start = time.time()
+        results = self.model.function_calling(system_prompt, user_prompt, images=images, functions=functions,
+                                              action_history=action_history, **kwargs)
+        response = dump_tool_calls(results) if isinstance(results, list) else results
+        self.cassette.append(fingerprint, 'function_calling', response, time.time() - start)
+        return results
+
+    def generate(self, system_prompt, user_prompt, images=None, action_history=None, **kwargs):
+        fingerprint = call_fingerprint('generate', self.model.model, system_prompt, user_prompt, images,
+                                       None, action_history, **_fingerprint_params(kwargs))
+        start = time.time()
+        output = self.model.generate(system_prompt, user_prompt, images=images, action_history=action_history,
+                                     **kwargs)
+        self.cassette.append(fingerprint, 'generate', {'text': output.text, 'log_prob': output.log_prob},
+                             time.time() - start)
+        return output
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _decode_response(kind, response):
+    if kind == 'generate':
+        return GenerateOutput(text=response['text'], log_prob=response.get('log_prob'))
+    return load_tool_calls(response) if isinstance(response, list) else response
+
+
+class ReplayModel:
+    """Serves calls from a cassette without touching the network.
+
+    Args:
+        cassette (Cassette or str): Recorded calls.
+        model (str): Model name the calls were recorded with, part of the fingerprint.
+        replay_latency (bool): Sleep for the recorded latency of every call.
+        loop (bool): Restart from the first response once a fingerprint's responses are used up,
+            otherwise raise KeyError.
+    """
+
+    def __init__(self, cassette, model, replay_latency=False, loop=True):
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        self.model = model
+        self.replay_latency = replay_latency
+        self.loop = loop
+        self.positions = defaultdict(int)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.misses = 0
+
+    def _replay(self, kind, fingerprint):
+        with self.lock:
+            entries = self.cassette.entries.get(fingerprint)
+            if not entries:
+                self.misses += 1
+                raise KeyError(f"No recorded {kind} call with fingerprint {fingerprint}")
+            position = self.positions[fingerprint]
+            if position >= len(entries):
+                if not self.loop:
+                    self.misses += 1
+                    raise KeyError(f"Recorded {kind} calls with fingerprint {fingerprint} are used up")
+                position = 0
+            self.positions[fingerprint] = position + 1
+            self.calls += 1
+            entry = entries[position]
+        if self.replay_latency and entry.get('latency'):
+            time.sleep(entry['latency'])
+        return _decode_response(kind, entry['response'])
+
+    def function_calling(self, system_prompt, user_prompt, images=None, functions=None,
+                         action_history=None, **kwargs):
+        fingerprint = call_fingerprint('function_calling', self.model, system_prompt, user_prompt, images,
+                                       functions, action_history, **_fingerprint_params(kwargs))
+        return self._replay('function_calling', fingerprint)
+
+    def generate(self, system_prompt, user_prompt, images=None, action_history=None, **kwargs):
+        fingerprint = call_fingerprint('generate', self.model, system_prompt, user_prompt, images,
+                                       None, action_history, **_fingerprint_params(kwargs))
+        return self._replay('generate', fingerprint)
+
+
+class LatencyDistribution:
+    """Seconds drawn from 'constant' (value), 'uniform' (low, high), 'normal' (mean, std),
+    'lognormal' (median, sigma) or 'exponential' (mean); negative draws are clipped to 0."""
+
+    def __init__(self, kind='constant', *params, seed=None):
+        if kind not in ('constant', 'uniform', 'normal', 'lognormal', 'exponential'):
+            raise ValueError(f"Unknown latency distribution {kind}")
+        self.kind = kind
+        self.params = params or (0.0,)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        with self.lock:
+            if self.kind == 'constant':
+                value = self.params[0]
+            elif self.kind == 'uniform':
+                value = self.random.uniform(*self.params)
+            elif self.kind == 'normal':
+                value = self.random.gauss(*self.params)
+            elif self.kind == 'lognormal':
+                median, sigma = self.params
+                value = self.random.lognormvariate(np.log(median), sigma)
+            else:
+                value = self.random.expovariate(1.0 / self.params[0])
+        return max(0.0, value)
+
+
+def tool_call(name, arguments, call_id=None):
+    """Tool call dict in the shape `load_tool_calls` rebuilds."""
+    return {
+        'id': call_id or f'call_{name}',
+        'type': 'function',
+        'function': {'name': name, 'arguments': json.dumps(arguments)},
+    }
+
+
+class ScriptedModel:
+    """Deterministic LLM stand-in with simulated latency.
+
+    `script` decides the response of every call: a callable `script(kind, system_prompt,
+    user_prompt, **call)` returning tool call dicts (see `tool_call`) for function_calling or
+    a string for generate, or a list of such responses served in order and cycled.
+
+    Args:
+        script (callable or list): Response source.
+        latency (LatencyDistribution): Simulated latency of every call.
+        model (str): Reported model name.
+    """
+
+    def __init__(self, script, latency=None, model='scripted'):
+        self.script = script
+        self.latency = latency if latency is not None else LatencyDistribution('constant', 0.0)
+        self.model = model
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _next(self, kind, system_prompt, user_prompt, **call):
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+        if callable(self.script):
+            response = self.script(kind, system_prompt, user_prompt, **call)
+        else:
+            response = self.script[index % len(self.script)]
+        delay = self.latency.sample()
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    def function_calling(self, system_prompt, user_prompt, images=None, functions=None,
+                         action_history=None, **kwargs):
+        response = self._next('function_calling', system_prompt, user_prompt, images=images, functions=functions,
+                              action_history=action_history)
+        if isinstance(response, dict):
+            response = [response]
+        return load_tool_calls([response])
+
+    def generate(self, system_prompt, user_prompt, images=None, action_history=None,
+                 num_return_sequences=1, **kwargs):
+        response = self._next('generate', system_prompt, user_prompt, images=images, action_history=action_history)
+        return GenerateOutput(text=[response] * num_return_sequences, log_prob=None)
@@ -0,0 +1,184 @@
+import atexit
+import base64
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from Config import Config
+from .cache import DATA_URL_PATTERN
+
+
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp'}
+_FLUSH = object()  # queue marker, the writer flushes the file when it reaches it
+
+
+class TraceSink:
+    """Structured LLM trace written off the request thread.
+
+    `record` only samples and enqueues the event; a background thread replaces inline
+    images by a hash reference (the image is written once to `images/<sha256>.<ext>`),
+    serializes the event and appends it to `trace.jsonl`, rotated to `trace.1.jsonl` ...
+    `trace.<backup_count>.jsonl` when it grows past `max_bytes`. When the queue is full
+    new events are dropped and counted instead of blocking the caller. Only the writer thread
+    touches the file; a closed sink stays closed and drops further events.
+
+    Args:
+        directory (str): Output directory.
+        enabled (bool): Disabled sinks drop every event without enqueueing.
+        sample_rate (float): Fraction of events kept.
+        max_queue (int): Events buffered before new ones are dropped.
+        max_bytes (int): Size at which the JSONL file is rotated.
+        backup_count (int): Rotated files kept.
+    """
+
+    def __init__(self, directory=Config.LLM_TRACE_DIR, enabled=Config.LLM_TRACE_ENABLED,
+                 sample_rate=Config.LLM_TRACE_SAMPLE_RATE, max_queue=1024, max_bytes=64 * 1024 * 1024,
+                 backup_count=5):
+        self.directory = directory
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.file = None
+        self.images = set()
+        self.closed = False
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+
+    def record(self, event):
+        """Enqueue an event (a JSON-serializable dict), never blocks."""
+        if not self.enabled or self.closed or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return False
+        if self.thread is None and not self._start():
+            return False
+        event.setdefault('time', time.time())
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _start(self):
+        with self.lock:
+            if self.thread is not None:
+                return True
+            if self.closed or not self.enabled:
+                return False
+            try:
+                os.makedirs(os.path.join(self.directory, 'images'), exist_ok=True)
+            except OSError as e:
+                print(f"Error creating LLM trace directory {self.directory}, tracing disabled: {e}")
+                self.enabled = False
+                return False
+            self.thread = threading.Thread(target=self._run, daemon=True, name='llm-trace')
+            self.thread.start()
+            atexit.register(self.close)
+            return True
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            try:
+                if event is None:
+                    if self.file is not None:
+                        self.file.close()
+                        self.file = None
+                    return
+                if event is _FLUSH:
+                    if self.file is not None:
+                        self.file.flush()
+                    continue
+                self._write(event)
+            except Exception as e:
+                print(f"Error writing LLM trace: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _externalize(self, value):
+        # swap data URLs for a reference to the image file
+        if isinstance(value, dict):
+            return {k: self._externalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._externalize(v) for v in value]
+        if isinstance(value, str) and value.startswith('data:'):
+            match = DATA_URL_PATTERN.match(value)
+            if match:
+                digest = hashlib.sha256(match.group('data').encode()).hexdigest()
+                name = f"{digest}.{EXTENSIONS.get(match.group('mime'), 'bin')}"
+                if name not in self.images:
+                    path = os.path.join(self.directory, 'images', name)
+                    if not os.path.exists(path):
+                        with open(path, 'wb') as f:
+                            f.write(base64.b64decode(match.group('data')))
+                    self.images.add(name)
+                return {'image_ref': f'images/{name}'}
+        return value
+
+    def _write(self, event):
+        line = json.dumps(self._externalize(event), default=str) + '\n'
+        path = os.path.join(self.directory, 'trace.jsonl')
+        if self.file is None:
+            self.file = open(path, 'a')
+        if self.file.tell() + len(line) > self.max_bytes and self.file.tell() > 0:
+            self._rotate(path)
+        self.file.write(line)
+        if self.queue.empty():
+            self.file.flush()
+        self.written += 1
+
+    def _rotate(self, path):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = os.path.join(self.directory, f'trace.{i}.jsonl')
+            if os.path.exists(source):
+                os.replace(source, os.path.join(self.directory, f'trace.{i + 1}.jsonl'))
+        if self.backup_count > 0:
+            os.replace(path, os.path.join(self.directory, 'trace.1.jsonl'))
+        else:
+            os.remove(path)
+        self.file = open(path, 'a')
+
+    def flush(self):
+        """Block until every enqueued event is written and flushed to disk."""
+        with self.lock:
+            running = self.thread is not None
+            if running:
+                self.queue.put(_FLUSH)
+        if running:
+            self.queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer, the sink cannot be restarted."""
+        with self.lock:
+            self.closed = True
+            thread, self.thread = self.thread, None
+            if thread is not None:
+                self.queue.put(None)
+        if thread is None:
+            return
+        thread.join(timeout=5.0)
+        atexit.unregister(self.close)
+
+
+_default_sink = None
+_default_lock = threading.Lock()
+
+
+def get_trace_sink():
+    """Process-wide sink configured from Config, shared by every model instance."""
+    global _default_sink
+    with _default_lock:
+        if _default_sink is None:
+            _default_sink = TraceSink()
+        return _default_sink
@@ -0,0 +1,170 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+# A2A.base imports the UE package, which needs the external Base package
+base = pytest.importorskip("A2A.base")
+from A2A.base import Action, ActionBuffer, ActionQueue, coalesce  # noqa: E402
+
+
+class RecordingClient:
+    def __init__(self):
+        self.batches = []
+
+    @contextmanager
+    def session(self, affinity=None, image=False):
+        yield self
+
+    def request_batch_async(self, commands):
+        self.batches.append(list(commands))
+
+
+def make_buffer(**kwargs):
+    client = RecordingClient()
+    return ActionBuffer(unrealcv_client=client, **kwargs), client
+
+
+def test_emergency_stop_cancels_older_moves():
+    buffer, client = make_buffer(max_size=5, flush_budget=5)
+    buffer.push_action(Action("dm", "Move_Speed", [150.0, 0.2, 0]))
+    buffer.push_action(Action("dm", "Rotate_Angle", [0.2, 10.0, 1]))
+    buffer.push_action(Action("dm", "StopDeliveryMan", []))
+    buffer.flush()
+    assert client.batches == [["vbp dm StopDeliveryMan "]]
+    assert buffer.preempted == 2
+
+
+def test_moves_after_emergency_stop_are_kept_in_order():
+    buffer, client = make_buffer(max_size=5, flush_budget=5)
+    buffer.push_action(Action("dm", "StopDeliveryMan", []))
+    buffer.push_action(Action("dm", "Move_Speed", [150.0, 0.2, 0]))
+    buffer.flush()
+    assert client.batches == [["vbp dm StopDeliveryMan ", "vbp dm Move_Speed 150.0 0.2 0"]]
+
+
+def test_emergency_only_touches_its_own_actor():
+    buffer, client = make_buffer(max_size=5, flush_budget=5)
+    buffer.push_action(Action("a", "Move_Speed", [150.0, 0.2, 0]))
+    buffer.push_action(Action("b", "StopDeliveryMan", []))
+    buffer.flush()
+    assert sorted(client.batches[0]) == ["vbp a Move_Speed 150.0 0.2 0", "vbp b StopDeliveryMan "]
+
+
+@pytest.mark.parametrize("policy", ["drop", "block"])
+def test_drop_and_block_reject_instead_of_evicting_same_lane(policy):
+    queue = ActionQueue(max_size=2, policy=policy, block_timeout=0.01)
+    first, second = Action("dm", "StopDeliveryMan", ["1"]), Action("dm", "StopDeliveryMan", ["2"])
+    assert queue.push_action(first) and queue.push_action(second)
+    assert not queue.push_action(Action("dm", "StopDeliveryMan", ["3"]))
+    assert queue.drain(5) == [first, second]
+    assert queue.dropped == 1 and queue.overwritten == 0
+
+
+def test_drop_policy_rejects_normal_push_when_full():
+    queue = ActionQueue(max_size=1, policy="drop")
+    kept = Action("dm", "Move_Speed", [1, 1, 0])
+    assert queue.push_action(kept)
+    assert not queue.push_action(Action("dm", "Move_Speed", [2, 1, 0]))
+    assert queue.drain(5) == [kept]
+
+
+def test_overwrite_policy_drops_oldest():
+    queue = ActionQueue(max_size=2, policy="overwrite")
+    actions = [Action("dm", "Move_Speed", [i, 1, 0]) for i in range(3)]
+    for action in actions:
+        assert queue.push_action(action)
+    assert queue.drain(5) == actions[1:]
+    assert queue.overwritten == 1
+
+
+def test_lane_index_does_not_depend_on_lane_contents():
+    # both lanes empty compare equal as deques, the normal lane must still be chosen
+    queue = ActionQueue(max_size=1, policy="drop")
+    assert queue.push_action(Action("dm", "Move_Speed", [1, 1, 0]))
+    assert not queue.push_action(Action("dm", "Move_Speed", [2, 1, 0]))
+    assert len(queue.lanes[0]) == 0 and len(queue.lanes[1]) == 1
+
+
+def test_block_policy_waits_for_sender():
+    queue = ActionQueue(max_size=1, policy="block", block_timeout=2.0)
+    queue.push_action(Action("dm", "Move_Speed", [1, 1, 0]))
+    timer = threading.Timer(0.05, queue.drain, args=(1,))
+    timer.start()
+    assert queue.push_action(Action("dm", "Move_Speed", [2, 1, 0]))
+    timer.join()
+
+
+def test_coalesce_sums_rotations_and_keeps_last_move():
+    actions = [Action("dm", "Rotate_Angle", [0.1, 10.0, 1]), Action("dm", "Rotate_Angle", [0.1, 5.0, 1]),
+               Action("dm", "Move_Speed", [100, 0.2, 0]), Action("dm", "Move_Speed", [150, 0.2, 0])]
+    merged = [str(action) for action in coalesce(actions)]
+    assert merged == ["vbp dm Rotate_Angle 0.2 15.0 1", "vbp dm Move_Speed 150 0.2 0"]
+
+
+def test_opposite_rotations_cancel():
+    actions = [Action("dm", "Rotate_Angle", [0.1, 10.0, 1]), Action("dm", "Rotate_Angle", [0.1, -10.0, -1])]
+    assert coalesce(actions) == []
+
+
+def test_flush_counts_and_history():
+    buffer, client = make_buffer(max_size=5, flush_budget=4, history_size=2)
+    for angle in (1.0, 2.0, 3.0):
+        buffer.push_action(Action("dm", "Rotate_Angle", [0.1, angle, 1]))
+    assert buffer.flush() == 1
+    assert buffer.commands_saved == 2
+    assert buffer.get_action_history("dm").splitlines() == ["vbp dm Rotate_Angle 0.1 2.0 1",
+                                                            "vbp dm Rotate_Angle 0.1 3.0 1"]
+    assert buffer.get_action_history("unknown") == ""
+
+
+def test_concurrent_producers_never_exceed_queue_size():
+    buffer, client = make_buffer(max_size=3, flush_budget=3)
+
+    def produce(name):
+        for i in range(200):
+            buffer.push_action(Action(name, "Move_Speed", [i, 0.1, 0]))
+
+    threads = [threading.Thread(target=produce, args=(f"dm{i % 4}",)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(queue) <= 3 for queue in buffer.buffer.values())
+
+
+def test_sender_thread_shares_the_connection_with_pose_refreshes(capfd):
+    from UE.Communicator import Communicator
+    from UE.unrealcv_fake import FakeUnrealCVServer
+    from UE.world_state import WorldStateCache
+
+    names = [f'dm{i}' for i in range(4)]
+    with FakeUnrealCVServer() as server:
+        communicator = Communicator(server.port, server.ip, server.resolution)
+        for name in names:
+            server.handle(f'vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C {name}')
+        world_state = WorldStateCache(communicator, ttl=0.0, actor_names=names).start()
+        buffer = ActionBuffer(max_size=1000, unrealcv_client=communicator, flush_budget=50).start(dt=0.0)
+        try:
+            def produce(name):
+                for _ in range(200):
+                    buffer.push_action(Action(name, "Rotate_Angle", [0.1, 1.0, 1]))
+
+            threads = [threading.Thread(target=produce, args=(name,)) for name in names]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            buffer.stop()
+            world_state.stop()
+        while buffer.flush():
+            pass
+        try:
+            # coalesced or not, every rotation reached UE and the connection still answers in order
+            for name in names:
+                assert world_state.get_pose(name, fresh=True)[2] == 200.0 - 360.0
+        finally:
+            communicator.client.disconnect()
+    output = capfd.readouterr()
+    assert 'Error' not in output.out and 'mismatch' not in output.err
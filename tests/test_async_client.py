@@ -0,0 +1,59 @@
+import asyncio
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE import Communicator  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+from utils.Types import Vector  # noqa: E402
+
+
+def test_package_import_does_not_load_the_async_client():
+    code = "import sys, UE; print('UE.unrealcv_async' in sys.modules); UE.AsyncCommunicator; " \
+           "print('UE.unrealcv_async' in sys.modules)"
+    # a fresh interpreter, other tests may already have imported the async client
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env).stdout.split()
+    assert output[-2:] == ['False', 'True']
+
+
+def delivery_men(count):
+    return [SimpleNamespace(id=i, position=Vector(i * 100.0, 0.0), direction=Vector(0.0, 1.0)) for i in range(count)]
+
+
+def test_async_and_blocking_spawn_share_commands_and_errors():
+    from UE import AsyncCommunicator
+
+    async def spawn(server):
+        communicator = AsyncCommunicator(server.port, server.ip, server.resolution)
+        await communicator.connect()
+        try:
+            errors = await communicator.spawn_delivery_men(delivery_men(5))
+            locations = await communicator.get_location_batch(
+                [communicator.get_delivery_man_name(i) for i in range(5)])
+        finally:
+            await communicator.close()
+        return errors, locations
+
+    with FakeUnrealCVServer() as server:
+        errors, locations = asyncio.run(spawn(server))
+        assert errors == {}
+        assert [loc[0] for loc in locations] == [i * 100.0 for i in range(5)]
+        blocking = Communicator(server.port, server.ip, server.resolution)
+        try:
+            assert blocking.spawn_delivery_men(delivery_men(3), chunk_size=4) == {}
+            np.testing.assert_allclose(blocking.get_location('GEN_DELIVERY_MAN_2'), [200.0, 0.0, 110.0])
+        finally:
+            blocking.client.disconnect()
+
+
+def test_spawn_errors_are_grouped_by_delivery_man(capsys):
+    commands = ['spawn a', 'locate a', 'spawn b']
+    errors = Communicator._spawn_errors(commands, [0, 0, 1], ['ok', 'error no actor', None])
+    assert errors == {0: ['locate a: error no actor'], 1: ['spawn b: None']}
+    assert 'failed to spawn delivery man 0' in capsys.readouterr().out
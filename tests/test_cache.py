@@ -0,0 +1,63 @@
+import threading
+
+from openai.types.chat import ChatCompletionMessageToolCall
+
+from llm.cache import LLMResponseCache, dump_tool_calls, load_tool_calls, make_key
+
+
+def image_message(data):
+    return [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{data}"}}]}]
+
+
+def test_keys_depend_on_image_content_and_params():
+    assert make_key("m", image_message("AAAA")) == make_key("m", image_message("AAAA"))
+    assert make_key("m", image_message("AAAA")) != make_key("m", image_message("BBBB"))
+    assert make_key("m", [], temperature=0) != make_key("m", [], temperature=0.5)
+    assert make_key("m", [], a=1, b=2) == make_key("m", [], b=2, a=1)
+
+
+def test_memory_tier_is_lru():
+    cache = LLMResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    LLMResponseCache(directory=str(tmp_path)).put("k" * 64, {"text": ["hi"]})
+    cache = LLMResponseCache(directory=str(tmp_path))
+    assert cache.get("k" * 64) == {"text": ["hi"]}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_is_trimmed(tmp_path):
+    cache = LLMResponseCache(max_entries=1, directory=str(tmp_path), max_disk_bytes=2000)
+    for i in range(50):
+        cache.put(f"{i:064d}", "x" * 100)
+    assert cache.disk_bytes <= 2000 and cache.evictions > 0
+
+
+def test_bypasses_are_counted_under_the_lock():
+    cache = LLMResponseCache()
+
+    def bypass():
+        for _ in range(10000):
+            cache.bypass()
+
+    threads = [threading.Thread(target=bypass) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["bypasses"] == 80000
+
+
+def test_tool_calls_round_trip():
+    call = ChatCompletionMessageToolCall.model_validate(
+        {"id": "1", "type": "function", "function": {"name": "navigate", "arguments": '{"x": 1, "y": 2}'}})
+    loaded = load_tool_calls(dump_tool_calls([[call], None]))
+    assert loaded[1] is None
+    assert loaded[0][0].function.name == "navigate" and loaded[0][0].type == "function"
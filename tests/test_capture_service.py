@@ -0,0 +1,85 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE.capture_service import CaptureService  # noqa: E402
+from UE.unrealcv_a2a import UnrealCvA2A  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+
+
+class CountingClient:
+    """Every grab returns a frame filled with the grab count."""
+
+    def __init__(self):
+        self.count = 0
+
+    def grab_camera_observation(self, camera_id, viewmode):
+        self.count += 1
+        return np.full((480, 640, 3), self.count % 256, dtype=np.uint8)
+
+
+def test_copied_frame_outlives_later_captures():
+    service = CaptureService(CountingClient(), rate=1000, max_staleness=None)
+    service.register(0)
+    service.capture_once()
+    frame = service.get_latest(0, copy=True)
+    value = frame.image[0, 0, 0]
+    for _ in range(4):
+        service.capture_once()
+    assert (frame.image == value).all()
+    assert service.get_latest(0).image is not frame.image
+
+
+def test_shared_buffer_is_rewritten_two_captures_later():
+    service = CaptureService(CountingClient(), rate=1000, max_staleness=None)
+    service.register(0)
+    service.capture_once()
+    shared = service.get_latest(0).image
+    service.capture_once()
+    service.capture_once()
+    assert shared[0, 0, 0] == 3
+
+
+def test_copies_are_never_torn_while_capturing():
+    service = CaptureService(CountingClient(), rate=100000, max_staleness=None)
+    service.register(0)
+    service.capture_once()
+    torn = []
+    with service:
+        deadline = time.time() + 0.5
+        while time.time() < deadline:
+            image = service.get_latest(0, copy=True).image
+            if image.min() != image.max():
+                torn.append(image)
+    assert torn == []
+
+
+def test_wait_for_frame_returns_newer_frames():
+    service = CaptureService(CountingClient(), rate=1000, max_staleness=None)
+    service.register(0)
+    threading.Timer(0.05, service.capture_once).start()
+    frame = service.wait_for_frame(0, after_seq=0, timeout=2.0)
+    assert frame is not None and frame.seq == 1
+    assert service.wait_for_frame(0, after_seq=1, timeout=0.05) is None
+
+
+def test_camera_observation_is_a_private_copy():
+    with FakeUnrealCVServer(resolution=(64, 48)) as server:
+        client = UnrealCvA2A(server.port, server.ip, (64, 48))
+        try:
+            client.enable_frame_pool(size=2)
+            images = [client.get_camera_observation(0) for _ in range(3)]
+            assert not np.shares_memory(images[0], images[2])
+            client.start_capture_service([(0, 'lit')], rate=200)
+            time.sleep(0.1)
+            kept = client.get_camera_observation(0)
+            before = kept.copy()
+            time.sleep(0.1)
+            np.testing.assert_array_equal(kept, before)
+            assert kept.flags.writeable
+        finally:
+            client.stop_capture_service()
+            client.client.disconnect()
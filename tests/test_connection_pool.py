@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE.connection_pool import UnrealCVConnectionPool  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with FakeUnrealCVServer() as server:
+        yield server
+
+
+def test_pool_opens_command_and_image_lanes(server):
+    pool = UnrealCVConnectionPool(server.ip, server.port, size=3, image_connections=1)
+    try:
+        assert len(pool.lanes['command']) == 3 and len(pool.lanes['image']) == 1
+        with pool.connection(image=True) as client:
+            assert client is pool.lanes['image'][0]
+            assert client.request('vget /unrealcv/status') is not None
+    finally:
+        pool.close()
+
+
+def test_single_client_server_falls_back_to_one_connection():
+    with FakeUnrealCVServer(max_clients=1) as server:
+        pool = UnrealCVConnectionPool(server.ip, server.port, size=4, image_connections=1)
+        try:
+            assert len(pool) == 1
+            with pool.connection(image=True) as client:
+                assert client.request('vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C dm') == 'dm'
+        finally:
+            pool.close()
+
+
+def test_pool_is_built_around_an_existing_client():
+    with FakeUnrealCVServer(max_clients=1) as server:
+        first = UnrealCVConnectionPool(server.ip, server.port, size=1, image_connections=0)
+        client = first.lanes['command'][0]
+        pool = UnrealCVConnectionPool(server.ip, server.port, size=4, image_connections=1, client=client)
+        try:
+            assert pool.lanes['command'] == [client] and pool.lanes['image'] == []
+        finally:
+            pool.close(keep=client)
+        assert client.isconnected()
+        first.close()
+
+
+def test_affinity_falls_back_to_an_idle_connection(server):
+    pool = UnrealCVConnectionPool(server.ip, server.port, size=2, image_connections=0, timeout=0.5)
+    try:
+        pinned = pool.checkout(affinity='dm0')
+        other = pool.checkout(affinity='dm0')
+        assert other is not pinned
+        pool.checkin(other)
+        pool.checkin(pinned)
+        assert pool.checkout(affinity='dm0') is pinned
+    finally:
+        pool.close()
+
+
+def test_checkout_times_out_when_every_connection_is_busy(server):
+    pool = UnrealCVConnectionPool(server.ip, server.port, size=1, image_connections=0)
+    try:
+        pool.checkout()
+        with pytest.raises(TimeoutError):
+            pool.checkout(timeout=0.05)
+    finally:
+        pool.close()
+
+
+def test_reconnect_resets_message_ids(server):
+    pool = UnrealCVConnectionPool(server.ip, server.port, size=1, image_connections=0)
+    try:
+        client = pool.lanes['command'][0]
+        for _ in range(3):
+            client.request('vget /unrealcv/status')
+        assert pool._reconnect(client)
+        assert client.send_message_id == 0 and client.recv_message_id == 0
+        assert client.request('vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C dm') == 'dm'
+    finally:
+        pool.close()
+
+
+def test_concurrent_checkouts_never_share_a_connection(server):
+    pool = UnrealCVConnectionPool(server.ip, server.port, size=3, image_connections=0)
+    in_use, errors = set(), []
+    lock = threading.Lock()
+
+    def work(i):
+        for _ in range(20):
+            with pool.connection(affinity=f'dm{i}') as client:
+                with lock:
+                    if id(client) in in_use:
+                        errors.append(i)
+                    in_use.add(id(client))
+                client.request('vget /unrealcv/status')
+                with lock:
+                    in_use.discard(id(client))
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+    assert errors == []
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from A2A.base import ActionBuffer  # noqa: E402
+from A2A.controller import SteeringController  # noqa: E402
+from Config import Config  # noqa: E402
+from UE.Communicator import Communicator  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+from UE.world_state import WorldStateCache  # noqa: E402
+
+
+@pytest.fixture
+def world():
+    with FakeUnrealCVServer() as server:
+        communicator = Communicator(server.port, '127.0.0.1', server.resolution)
+        server.handle('vset /objects/spawn /Game/BP_DeliveryManager.BP_DeliveryManager_C GEN_DeliveryManager')
+        communicator.delivery_manager_name = 'GEN_DeliveryManager'
+        names = ['GEN_BP_DeliveryMan_C_0', 'GEN_BP_DeliveryMan_C_1']
+        for i, name in enumerate(names):
+            server.handle(f'vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C {name}')
+            server.handle(f'vset /object/{name}/location 0 {i * 1000} 110')
+        yield server, communicator, WorldStateCache(communicator), names
+        communicator.client.disconnect()
+
+
+def test_controller_steers_every_agent_along_its_route(world):
+    server, communicator, world_state, names = world
+    controller = SteeringController(ActionBuffer(unrealcv_client=communicator), world_state)
+    routes = {names[0]: [(1000.0, 0.0), (1000.0, 1200.0)], names[1]: [(-1500.0, 600.0)]}
+    events = {name: controller.set_waypoints(name, route) for name, route in routes.items()}
+    controller.run(dt=0.0, max_ticks=300)
+    for name, route in routes.items():
+        assert events[name].is_set()
+        position = np.array(server.actors[name].location[:2])
+        assert np.hypot(*(position - route[-1])) < Config.WALK_ARRIVE_WAYPOINT_DISTANCE
+        assert 'StopDeliveryMan' in server.actors[name].calls
+
+
+def test_dead_reckoning_skips_most_pose_queries(world):
+    server, communicator, world_state, names = world
+    controller = SteeringController(ActionBuffer(unrealcv_client=communicator), world_state)
+    controller.set_waypoints(names[0], [(5000.0, 0.0)])
+    controller.run(dt=0.0, max_ticks=300)
+    assert not controller.is_active(names[0])
+    assert controller.pose_queries < controller.ticks / 2
+    assert controller.distance_traveled == pytest.approx(5000.0, rel=0.1)
+    # the fake server moves agents exactly as commanded, every resync lowers the learned drift
+    assert controller.drift[0] < Config.DEAD_RECKONING_DRIFT
+
+
+def test_agents_joining_and_leaving_keep_their_state(world):
+    server, communicator, world_state, names = world
+    controller = SteeringController(ActionBuffer(unrealcv_client=communicator), world_state)
+    controller.set_waypoints(names[0], [(3000.0, 0.0)])
+    controller.tick()
+    position = controller.positions[0].copy()
+    controller.set_waypoints(names[1], [(0.0, 3000.0)])
+    controller.tick()
+    assert controller.names == names
+    # the first agent was only dead-reckoned, the new one was synced from UE and moved one step
+    assert controller.positions[0][0] > position[0]
+    assert controller.pose_queries == 2
+    assert controller.since_sync[1] == pytest.approx(np.hypot(*(controller.positions[1] - (0.0, 1000.0))))
+    controller.remove(names[0])
+    controller.tick()
+    assert controller.names == [names[1]]
+    assert len(controller.positions) == len(controller.drift) == 1
+
+
+def test_controller_thread_runs_next_to_the_world_state_refresh(world, capfd):
+    server, communicator, world_state, names = world
+    world_state.ttl = 0.0
+    world_state.track(*names)
+    world_state.start()
+    controller = SteeringController(ActionBuffer(unrealcv_client=communicator), world_state)
+    routes = {names[0]: [(1000.0, 500.0)], names[1]: [(-800.0, 1000.0)]}
+    events = [controller.set_waypoints(name, route) for name, route in routes.items()]
+    controller.start(dt=0.0)
+    try:
+        assert all(event.wait(30) for event in events)
+    finally:
+        controller.stop()
+        world_state.stop()
+    for name, route in routes.items():
+        position = np.array(server.actors[name].location[:2])
+        assert np.hypot(*(position - route[-1])) < Config.WALK_ARRIVE_WAYPOINT_DISTANCE
+    output = capfd.readouterr()
+    assert 'Error' not in output.out and 'mismatch' not in output.err
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from A2A.dispatcher import DecisionDispatcher, TIMED_OUT
+
+
+class FakeAgent:
+    def __init__(self, name, decide_delay=0.0, act_delay=0.0, fail=False):
+        self.name = name
+        self.decide_delay = decide_delay
+        self.act_delay = act_delay
+        self.fail = fail
+
+    def decide(self, user_prompt):
+        time.sleep(self.decide_delay)
+        if self.fail:
+            raise ValueError("no tool call")
+        return f"call:{user_prompt}"
+
+    def act(self, tool_call):
+        time.sleep(self.act_delay)
+        return tool_call
+
+
+def test_round_decides_and_acts_for_every_agent():
+    agents = [FakeAgent(f"dm{i}", decide_delay=0.01) for i in range(10)]
+    with DecisionDispatcher(max_workers=10, act_workers=10) as dispatcher:
+        outcomes = dispatcher.run_round([(agent, agent.name) for agent in agents])
+    assert outcomes == {agent.name: f"call:{agent.name}" for agent in agents}
+    assert dispatcher.calls == 10 and dispatcher.errors == 0
+
+
+def test_failed_decisions_are_reported_as_none():
+    agents = [FakeAgent("ok"), FakeAgent("bad", fail=True)]
+    with DecisionDispatcher(max_workers=2, act_workers=2) as dispatcher:
+        outcomes = dispatcher.run_round([(agent, "p") for agent in agents])
+    assert outcomes == {"ok": "call:p", "bad": None}
+    assert dispatcher.errors == 1
+
+
+def test_slow_agents_time_out_with_partial_results():
+    agents = [FakeAgent("fast"), FakeAgent("slow_decision", decide_delay=0.5),
+              FakeAgent("slow_action", act_delay=0.5)]
+    dispatcher = DecisionDispatcher(max_workers=3, act_workers=3)
+    start = time.time()
+    outcomes = dispatcher.run_round([(agent, "p") for agent in agents], timeout=0.1)
+    assert time.time() - start < 0.4
+    assert outcomes == {"fast": "call:p", "slow_decision": TIMED_OUT, "slow_action": TIMED_OUT}
+    assert dispatcher.timeouts == 2
+    dispatcher.close()
+
+
+def test_decisions_that_never_started_are_cancelled():
+    release = threading.Event()
+
+    class BlockingAgent(FakeAgent):
+        def decide(self, user_prompt):
+            release.wait(1.0)
+            return super().decide(user_prompt)
+
+    started = []
+
+    class CountingAgent(FakeAgent):
+        def decide(self, user_prompt):
+            started.append(self.name)
+            return super().decide(user_prompt)
+
+    dispatcher = DecisionDispatcher(max_workers=1, act_workers=1)
+    outcomes = dispatcher.run_round([(BlockingAgent("first"), "p"), (CountingAgent("queued"), "p")], timeout=0.05)
+    release.set()
+    dispatcher.close()
+    assert outcomes == {"first": TIMED_OUT, "queued": TIMED_OUT}
+    assert started == []
@@ -0,0 +1,64 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE import UnrealCvA2A  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+
+
+def test_actor_table_commands():
+    server = FakeUnrealCVServer()
+    assert server.handle('vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C dm') == 'dm'
+    assert server.handle('vset /object/dm/location 1 2 3') == 'ok'
+    assert server.handle('vget /object/dm/location') == '1.000 2.000 3.000'
+    assert server.handle('vget /objects') == 'dm'
+    assert server.handle('vset /object/dm/destroy') == 'ok'
+    assert server.handle('vget /object/dm/location').startswith('error')
+    assert server.handle('vget /nothing').startswith('error')
+    assert server.request_count == 7
+
+
+def test_blueprint_calls_move_and_report_the_actor():
+    server = FakeUnrealCVServer(step_distance=100.0)
+    server.handle('vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C dm')
+    server.handle('vset /objects/spawn /Game/BP_Scooter_Pawn.BP_Scooter_Pawn_C scooter')
+    server.handle('vset /objects/spawn /Game/DeliveryManager.DeliveryManager_C manager')
+    server.handle('vbp dm StepForward')
+    server.handle('vbp dm Rotate_Angle 1 90 1')
+    server.handle('vbp dm Move_Speed 200 0.5 0')
+    np.testing.assert_allclose(server.actors['dm'].location[:2], [100.0, 100.0], atol=1e-9)
+    assert server.actors['dm'].calls == ['StepForward', 'Rotate_Angle', 'Move_Speed']
+    info = json.loads(server.handle('vbp manager GetInformations'))
+    assert info['DLocations'] == 'dmX=100.000 Y=100.000 Z=0.000'
+    assert info['DRotations'] == 'dmP=0.000 Y=90.000 R=0.000'
+    assert info['SLocations'].startswith('scooterX=')
+
+
+def test_client_stack_runs_against_the_server():
+    with FakeUnrealCVServer(resolution=(64, 48)) as server:
+        client = UnrealCvA2A(server.port, server.ip, (32, 24))
+        try:
+            # the client sets its resolution on connect, frames follow it
+            assert server.resolution == (32, 24)
+            expected = server.frame_array(0, 'lit')[:, :, :3]
+            np.testing.assert_array_equal(client.read_image(0, 'lit', 'fast'), expected)
+            np.testing.assert_array_equal(client.read_image(0, 'lit', 'direct'), expected)
+            client.client.request('vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C dm')
+            client.d_step_forward('dm')
+            np.testing.assert_allclose(client.d_get_location('dm'), [100.0, 0.0, 0.0])
+        finally:
+            client.client.disconnect()
+
+
+def test_latency_is_added_to_every_response():
+    with FakeUnrealCVServer(latency=0.05) as server:
+        client = UnrealCvA2A(server.port, server.ip, server.resolution)
+        try:
+            start = time.time()
+            client.client.request('vget /unrealcv/status')
+            assert time.time() - start >= 0.05
+        finally:
+            client.client.disconnect()
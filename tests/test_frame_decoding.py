@@ -0,0 +1,129 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE.frame_pool import FramePool  # noqa: E402
+from UE.unrealcv_basic import UnrealCV  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer, encode_bmp  # noqa: E402
+
+
+def offline_client(resolution):
+    # the decoders only need the resolution, no connection
+    client = UnrealCV.__new__(UnrealCV)
+    client.resolution = resolution
+    client.decode_executor = None
+    client.decode_workers = 0
+    client.decode_lock = threading.Lock()
+    return client
+
+
+@pytest.fixture
+def frame():
+    return FakeUnrealCVServer(resolution=(64, 48)).frame_array(0, 'lit')
+
+
+def test_decode_bmp_returns_a_writable_copy(frame):
+    image = offline_client((64, 48)).decode_bmp(encode_bmp(frame))
+    assert image.flags.writeable and image.flags.c_contiguous
+    np.testing.assert_array_equal(image, frame[:, :, :3])
+    cv2.rectangle(image, (0, 0), (10, 10), (0, 0, 255), 2)
+
+
+def test_decode_bmp_zero_copy_is_opt_in(frame):
+    res = encode_bmp(frame)
+    image = offline_client((64, 48)).decode_bmp(res, copy=False)
+    assert not image.flags.writeable
+    np.testing.assert_array_equal(image, frame[:, :, :3])
+
+
+def test_decode_png_matches_bmp(frame):
+    client = offline_client((64, 48))
+    png = cv2.imencode('.png', frame)[1].tobytes()
+    np.testing.assert_array_equal(client.decode_png(png), client.decode_bmp(encode_bmp(frame)))
+
+
+def test_frame_pool_reuses_slots(frame):
+    pool = FramePool((64, 48), size=2)
+    res = encode_bmp(frame)
+    first, second, third = pool.decode_bmp(res), pool.decode_bmp(res), pool.decode_bmp(res)
+    assert third.bgra is first.bgra and second.bgra is not first.bgra
+    np.testing.assert_array_equal(third.bgr, frame[:, :, :3])
+    assert pool.total_bytes_copied == 3 * 64 * 48 * 4
+
+
+def test_frame_pool_counters_are_consistent_under_threads(frame):
+    pool = FramePool((64, 48), size=4)
+    res = encode_bmp(frame)
+
+    def decode():
+        for _ in range(200):
+            pool.decode_bmp(res)
+
+    threads = [threading.Thread(target=decode) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool.seq == 1600
+    assert pool.total_bytes_copied == 1600 * 64 * 48 * 4
+
+
+def test_image_batch_keeps_formats_of_the_same_view_apart():
+    with FakeUnrealCVServer(resolution=(64, 48)) as server:
+        client = UnrealCV(server.port, server.ip, (64, 48))
+        try:
+            specs = [(0, 'lit', 'png'), (0, 'lit', 'bmp'), (1, 'depth', 'npy')]
+            bundle = client.read_image_batch(specs)
+            assert set(bundle.images) == set(specs) and not bundle.errors
+            np.testing.assert_array_equal(bundle.get(0, 'lit', 'png'), bundle.get(0, 'lit', 'bmp'))
+            assert bundle.get(0, 'lit') is bundle.images[(0, 'lit', 'png')]
+            assert set(bundle.camera(0)) == {'lit'} and bundle.cameras == [0, 1]
+        finally:
+            client.client.disconnect()
+
+
+def test_decode_errors_keep_the_original_message(frame):
+    client = offline_client((64, 48))
+    specs = [(0, 'lit', 'bmp'), (0, 'lit', 'png'), (0, 'lit', 'tiff')]
+    bundle = client.decode_image_batch(specs, [None, b'garbage', encode_bmp(frame)])
+    assert not bundle.images
+    assert bundle.errors[(0, 'lit', 'bmp')].startswith('ValueError: No response')
+    assert "b'garbage'" in bundle.errors[(0, 'lit', 'png')]
+    assert 'Unknown image format tiff' in bundle.errors[(0, 'lit', 'tiff')]
+
+
+def test_decode_executor_follows_num_workers(frame):
+    client = offline_client((64, 48))
+    res = [encode_bmp(frame)]
+    client.decode_image_batch([(0, 'lit', 'bmp')], res, num_workers=2)
+    first = client.decode_executor
+    client.decode_image_batch([(0, 'lit', 'bmp')], res, num_workers=2)
+    assert client.decode_executor is first
+    client.decode_image_batch([(0, 'lit', 'bmp')], res, num_workers=8)
+    assert client.decode_executor is not first and client.decode_workers == 8
+    # the replaced executor is shut down
+    with pytest.raises(RuntimeError):
+        first.submit(int)
+
+
+def test_concurrent_batches_with_different_worker_counts(frame):
+    client = offline_client((64, 48))
+    specs = [(0, 'lit', 'bmp')] * 8
+    res = [encode_bmp(frame)] * 8
+    failures = []
+
+    def decode(num_workers):
+        for _ in range(20):
+            bundle = client.decode_image_batch(specs, res, num_workers=num_workers)
+            if bundle.errors or len(bundle.images) != 1:
+                failures.append(bundle.errors)
+
+    threads = [threading.Thread(target=decode, args=(n,)) for n in (1, 2, 3, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == []
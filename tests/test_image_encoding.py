@@ -0,0 +1,82 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from llm.image_encoding import ImageEncoder, frame_hash
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    return (np.linspace(0, 200, 640)[None, :, None] + rng.integers(0, 40, (480, 640, 3))).astype(np.uint8)
+
+
+def decode(encoded):
+    return cv2.imdecode(np.frombuffer(base64.b64decode(encoded), np.uint8), cv2.IMREAD_UNCHANGED)
+
+
+@pytest.mark.parametrize("quality,level", [(100, 0), (85, 1), (0, 9)])
+def test_png_quality_maps_to_a_compression_level(quality, level):
+    assert ImageEncoder(format='png', quality=quality).encode_params[1] == level
+
+
+def test_png_is_lossless_at_the_default_quality(frame):
+    encoder = ImageEncoder(format='png', max_side=None)
+    np.testing.assert_array_equal(decode(encoder.encode(frame)), frame)
+
+
+@pytest.mark.parametrize("quality", [-1, 101])
+def test_quality_out_of_range_is_rejected(quality):
+    with pytest.raises(ValueError):
+        ImageEncoder(quality=quality)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        ImageEncoder(format='gif')
+
+
+def test_frames_are_downscaled_to_max_side(frame):
+    assert decode(ImageEncoder(max_side=320).encode(frame)).shape == (240, 320, 3)
+
+
+def test_encoding_is_memoized_by_identity(frame):
+    encoder = ImageEncoder()
+    first = encoder.encode(frame)
+    assert encoder.encode(frame) == first
+    # an equal copy is another array, it is encoded again to the same bytes
+    assert encoder.encode(frame.copy()) == first
+    assert (encoder.hits, encoder.misses) == (1, 2)
+
+
+def test_in_place_edits_of_sampled_rows_are_noticed(frame):
+    encoder = ImageEncoder(format='png', max_side=None)
+    encoder.encode(frame)
+    frame[:, :, 0] = 0
+    np.testing.assert_array_equal(decode(encoder.encode(frame)), frame)
+    assert encoder.misses == 2
+
+
+def test_collected_frames_do_not_serve_stale_encodings():
+    encoder = ImageEncoder(format='png', max_side=None)
+    for value in range(20):
+        # a new array of the same shape often reuses the id and buffer of the collected one,
+        # and row 1 is not part of the checksum of a 96-row frame
+        image = np.zeros((96, 64, 3), dtype=np.uint8)
+        image[1] = value
+        assert decode(encoder.encode(image))[1, 0, 0] == value
+        del image
+
+
+def test_frame_hash_follows_content(frame):
+    changed = frame.copy()
+    assert frame_hash(changed) == frame_hash(frame)
+    changed[0, 0, 0] ^= 1
+    assert frame_hash(changed) != frame_hash(frame)
+
+
+def test_data_url_uses_the_format_mime(frame):
+    assert ImageEncoder(format='webp').data_url(frame).startswith('data:image/webp;base64,')
+    assert ImageEncoder().data_url('abc') == 'data:image/jpeg;base64,abc'
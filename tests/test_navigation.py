@@ -0,0 +1,108 @@
+import importlib
+import os
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from A2A.base import ActionBuffer  # noqa: E402
+from A2A.navigation import NavigationEngine  # noqa: E402
+from Config import Config  # noqa: E402
+from UE.Communicator import Communicator  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+from UE.world_state import WorldStateCache  # noqa: E402
+from utils.Types import Vector  # noqa: E402
+
+A2A_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'A2A')
+
+
+@pytest.fixture
+def agent_module(monkeypatch):
+    # A2A.agent loads functions.json relative to the working directory
+    monkeypatch.chdir(A2A_DIR)
+    try:
+        return importlib.import_module('A2A.agent')
+    except ImportError as e:
+        pytest.skip(f"A2A.agent can not be imported in this tree: {e}")
+
+
+@pytest.fixture
+def world():
+    with FakeUnrealCVServer() as server:
+        communicator = Communicator(server.port, '127.0.0.1', server.resolution)
+        server.handle('vset /objects/spawn /Game/BP_DeliveryManager.BP_DeliveryManager_C GEN_DeliveryManager')
+        communicator.delivery_manager_name = 'GEN_DeliveryManager'
+        names = ['GEN_BP_DeliveryMan_C_0', 'GEN_BP_DeliveryMan_C_1']
+        for i, name in enumerate(names):
+            server.handle(f'vset /objects/spawn /Game/BP_DeliveryMan.BP_DeliveryMan_C {name}')
+            server.handle(f'vset /object/{name}/location 0 {i * 1000} 110')
+        world_state = WorldStateCache(communicator, actor_names=names)
+        yield server, communicator, world_state, names
+        communicator.client.disconnect()
+
+
+def test_engine_brings_every_agent_to_its_waypoint(world):
+    server, communicator, world_state, names = world
+    buffer = ActionBuffer(unrealcv_client=communicator)
+    engine = NavigationEngine(buffer, world_state)
+    goals = {names[0]: (1500.0, 800.0), names[1]: (-1200.0, 1000.0)}
+    events = {name: engine.set_waypoints(name, [goal]) for name, goal in goals.items()}
+    engine.run(dt=0.0, max_ticks=200)
+    for name, goal in goals.items():
+        assert events[name].is_set()
+        position = np.array(server.actors[name].location[:2])
+        assert np.hypot(*(position - goal)) < Config.WALK_ARRIVE_WAYPOINT_DISTANCE
+
+
+def test_engine_thread_shares_the_connection_with_agent_pose_reads(world, capfd):
+    server, communicator, world_state, names = world
+    engine = NavigationEngine(ActionBuffer(unrealcv_client=communicator), world_state)
+    goals = {names[0]: (1500.0, 800.0), names[1]: (-1200.0, 1000.0)}
+    events = [engine.set_waypoints(name, [goal]) for name, goal in goals.items()]
+    done = threading.Event()
+
+    def read_poses():
+        # what A2Agent.update_position_and_direction does from the agent threads
+        while not done.is_set():
+            for name in names:
+                world_state.get_pose(name, fresh=True)
+                communicator.d_get_location(name)
+
+    readers = [threading.Thread(target=read_poses) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    engine.start(dt=0.0)
+    try:
+        assert all(event.wait(30) for event in events)
+    finally:
+        engine.stop()
+        done.set()
+        for reader in readers:
+            reader.join()
+    output = capfd.readouterr()
+    assert 'Error' not in output.out and 'mismatch' not in output.err
+
+
+def test_navigate_times_out_when_the_engine_is_not_ticking(world, agent_module, monkeypatch):
+    server, communicator, world_state, names = world
+    monkeypatch.setattr(Config, 'NAVIGATION_MIN_TIMEOUT', 0.05)
+    monkeypatch.setattr(Config, 'NAVIGATION_TIMEOUT_FACTOR', 0.0)
+    engine = NavigationEngine(ActionBuffer(unrealcv_client=communicator), world_state)
+    agent = agent_module.A2Agent.__new__(agent_module.A2Agent)
+    agent.name = names[0]
+    agent.planner = None
+    agent.position = Vector(0, 0)
+    agent.navigation_engine = engine
+    with pytest.raises(TimeoutError):
+        agent.navigate([1000, 0])
+    assert not engine.is_active(names[0])
+
+
+def test_navigation_timeout_scales_with_route_length(agent_module):
+    agent = agent_module.A2Agent.__new__(agent_module.A2Agent)
+    agent.position = Vector(0, 0)
+    route = [Vector(0, 100000), Vector(100000, 100000)]
+    expected = 200000 / Config.MIN_SPEED * Config.NAVIGATION_TIMEOUT_FACTOR
+    assert agent.navigation_timeout(route) == pytest.approx(expected)
+    assert agent.navigation_timeout([Vector(1, 1)]) == Config.NAVIGATION_MIN_TIMEOUT
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from utils.Types import Vector, Road
+from utils.planner import RoadGraph, RoadPlanner
+
+
+def _grid_roads(n=5, spacing=1000):
+    # n x n intersections connected to their right and upper neighbours
+    roads = []
+    for i in range(n):
+        for j in range(n):
+            here = Vector(i * spacing, j * spacing)
+            if i + 1 < n:
+                roads.append(Road(here, Vector((i + 1) * spacing, j * spacing)))
+            if j + 1 < n:
+                roads.append(Road(here, Vector(i * spacing, (j + 1) * spacing)))
+    return roads
+
+
+def _path_length(graph, path):
+    return sum(graph.nodes[a].distance(graph.nodes[b]) for a, b in zip(path, path[1:]))
+
+
+def test_graph_merges_shared_endpoints():
+    graph = RoadGraph.from_roads(_grid_roads(3))
+    assert len(graph) == 9
+    assert len(graph.roads) == 12
+    center = graph.nearest_node(Vector(1010, 990))
+    assert graph.nodes[center] == Vector(1000, 1000)
+    assert len(graph.adjacency[center]) == 4
+
+
+def test_shortest_path_is_manhattan_on_a_grid():
+    graph = RoadGraph.from_roads(_grid_roads(5))
+    planner = RoadPlanner(graph)
+    start, goal = graph.nearest_node(Vector(0, 0)), graph.nearest_node(Vector(4000, 3000))
+    path = planner.shortest_path(start, goal)
+    assert path[0] == start and path[-1] == goal
+    assert _path_length(graph, path) == pytest.approx(7000)
+
+
+def test_plan_appends_the_goal_and_uses_the_cache():
+    graph = RoadGraph.from_roads(_grid_roads(3))
+    planner = RoadPlanner(graph)
+    goal = Vector(2000, 2100)
+    waypoints = planner.plan(Vector(10, -20), goal)
+    assert waypoints[0] == Vector(0, 0)
+    assert waypoints[-2] == Vector(2000, 2000)
+    assert waypoints[-1] == goal
+    assert planner.plan(Vector(10, -20), goal) == waypoints
+    assert (planner.hits, planner.misses) == (1, 1)
+
+
+def test_cache_is_dropped_when_the_graph_changes():
+    graph = RoadGraph.from_roads([Road(Vector(0, 0), Vector(1000, 0)), Road(Vector(1000, 0), Vector(2000, 0))])
+    planner = RoadPlanner(graph)
+    assert planner.plan(Vector(0, 0), Vector(2000, 0)) == [Vector(0, 0), Vector(1000, 0), Vector(2000, 0)]
+    graph.remove_road(1)
+    # the far node still exists but is no longer connected
+    assert planner.plan(Vector(0, 0), Vector(2000, 0)) == [Vector(2000, 0)]
+    assert planner.hits == 0
+
+
+def test_lru_cache_is_bounded():
+    graph = RoadGraph.from_roads(_grid_roads(4))
+    planner = RoadPlanner(graph, cache_size=3)
+    for goal in range(1, 8):
+        planner.shortest_path(0, goal)
+    assert len(planner.cache) == 3
+    assert list(planner.cache) == [(0, 5), (0, 6), (0, 7)]
+
+
+def test_plan_batch_matches_individual_plans():
+    rng = np.random.default_rng(0)
+    graph = RoadGraph.from_roads(_grid_roads(6))
+    starts = [Vector(*p) for p in rng.uniform(0, 5000, (12, 2))]
+    goals = [Vector(5000, 5000)] * 6 + [Vector(*p) for p in rng.uniform(0, 5000, (6, 2))]
+    batch = RoadPlanner(graph).plan_batch(starts, goals)
+    single = RoadPlanner(graph)
+    for start, goal, waypoints in zip(starts, goals, batch):
+        expected = single.plan(start, goal)
+        assert waypoints[0] == expected[0] and waypoints[-1] == expected[-1]
+        assert _path_length(graph, [graph.nearest_node(w) for w in waypoints[:-1]]) == \
+            pytest.approx(_path_length(graph, [graph.nearest_node(w) for w in expected[:-1]]))
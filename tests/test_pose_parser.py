@@ -0,0 +1,62 @@
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE import Communicator  # noqa: E402
+from UE.pose_parser import PoseIndex  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+from utils.Types import Vector  # noqa: E402
+
+
+def test_index_reads_every_name_in_one_pass():
+    info = {
+        'DLocations': 'GEN_DELIVERY_MAN_0X=1.500 Y=-2.000 Z=110.000, GEN_DELIVERY_MAN_1X=3.000 Y=4.000 Z=110.000',
+        'DRotations': 'GEN_DELIVERY_MAN_0P=0.000 Y=90.000 R=0.000, GEN_DELIVERY_MAN_1P=0.000 Y=-45.500 R=0.000',
+        'SLocations': 'GEN_DELIVERY_MAN_0X=9.000 Y=9.000 Z=0.000, ScooterX=5.000 Y=6.000 Z=0.000',
+        'SRotations': 'GEN_DELIVERY_MAN_0P=0.000 Y=9.000 R=0.000, ScooterP=0.000 Y=180.000 R=0.000',
+    }
+    index = PoseIndex.from_informations(json.dumps(info))
+    assert len(index) == 3
+    # delivery men take precedence over a scooter of the same name
+    assert index.get('GEN_DELIVERY_MAN_0') == (1.5, -2.0, 90.0)
+    assert index.get('GEN_DELIVERY_MAN_1') == (3.0, 4.0, -45.5)
+    assert index.get('Scooter') == (5.0, 6.0, 180.0)
+    assert index.get('GEN_DELIVERY_MAN_2') is None
+
+
+def test_missing_rotation_is_reported_separately():
+    index = PoseIndex.from_informations({'DLocations': 'AX=1.000 Y=2.000 Z=0.000', 'DRotations': ''})
+    assert 'A' not in index
+    assert index.missing_rotation == {'A'}
+
+
+def test_arrays_mark_missing_names_with_nan():
+    index = PoseIndex.from_informations({'DLocations': 'AX=1.000 Y=2.000 Z=0.000',
+                                         'DRotations': 'AP=0.000 Y=30.000 R=0.000'})
+    positions, yaws, found = index.arrays(['B', 'A'])
+    assert found.tolist() == [False, True]
+    assert np.isnan(positions[0]).all() and np.isnan(yaws[0])
+    assert positions[1].tolist() == [1.0, 2.0] and yaws[1] == 30.0
+
+
+def test_communicator_poses_from_the_fake_server(capsys):
+    men = [SimpleNamespace(id=i, position=Vector(i * 100.0, 50.0), direction=Vector(0.0, 1.0)) for i in range(3)]
+    with FakeUnrealCVServer() as server:
+        communicator = Communicator(server.port, server.ip, server.resolution)
+        try:
+            communicator.spawn_delivery_manager()
+            assert communicator.spawn_delivery_men(men) == {}
+            communicator.destroy('GEN_DELIVERY_MAN_2')
+            positions, yaws, found = communicator.get_poses([0, 1, 2])
+            assert found.tolist() == [True, True, False]
+            np.testing.assert_allclose(positions[:2], [[0.0, 50.0], [100.0, 50.0]])
+            np.testing.assert_allclose(yaws[:2], 90.0)
+
+            poses = communicator.get_position_and_direction([1, 2])
+            assert poses == {1: (Vector(100.0, 50.0), 90.0)}
+            assert 'Could not parse location for GEN_DELIVERY_MAN_2' in capsys.readouterr().out
+        finally:
+            communicator.client.disconnect()
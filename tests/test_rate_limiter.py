@@ -0,0 +1,53 @@
+import pytest
+
+from llm import rate_limiter
+from llm.rate_limiter import TokenBucket, backoff_delay, estimate_tokens, get_rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters():
+    rate_limiter._limiters.clear()
+    yield
+    rate_limiter._limiters.clear()
+
+
+@pytest.mark.parametrize("rpm", [20, 31, 250, 500, 1000000])
+def test_limiter_fetched_twice_keeps_its_state(rpm):
+    limiter = get_rate_limiter("model", rpm, rpm * 10)
+    requests, tokens = limiter.requests, limiter.tokens
+    requests.reserve(rpm)
+    again = get_rate_limiter("model", rpm, rpm * 10)
+    assert again is limiter
+    assert again.requests is requests and again.tokens is tokens
+    assert again.requests.tokens <= 1
+
+
+def test_limiter_is_rebuilt_when_limits_change():
+    limiter = get_rate_limiter("model", 500)
+    bucket = limiter.requests
+    assert get_rate_limiter("model", 600).requests is not bucket
+    assert limiter.requests.rate_per_min == 600
+
+
+def test_bucket_waits_once_overdrawn():
+    bucket = TokenBucket(60)
+    for _ in range(60):
+        assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_credit_never_exceeds_capacity():
+    bucket = TokenBucket(10)
+    bucket.credit(100)
+    assert bucket.tokens == 10
+
+
+def test_estimate_tokens_counts_images_and_completion():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "x" * 400},
+                                             {"type": "image_url", "image_url": {"url": "data:"}}]}]
+    assert estimate_tokens(messages, max_tokens=100, image_tokens=765) > 765 + 100
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(1, 20):
+        assert 0.0 <= backoff_delay(attempt, base=1.0, max_delay=8.0) <= 8.0
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from llm.replay import (Cassette, RecordingModel, ReplayModel, ScriptedModel, LatencyDistribution,
+                        call_fingerprint, tool_call)
+
+
+class _Model:
+    model = 'test-model'
+
+    def __init__(self):
+        self.calls = 0
+
+    def function_calling(self, system_prompt, user_prompt, images=None, functions=None, action_history=None,
+                         **kwargs):
+        self.calls += 1
+        return [[tool_call('move_forward', {'distance': self.calls}, call_id=f'call_{self.calls}')]]
+
+    def generate(self, system_prompt, user_prompt, images=None, action_history=None, **kwargs):
+        self.calls += 1
+        return ScriptedModel([f'answer {self.calls}']).generate(system_prompt, user_prompt)
+
+
+def test_fingerprint_keys_images_by_content_and_ignores_retry():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    a = call_fingerprint('generate', 'm', 'sys', 'user', image.copy(), max_tokens=10)
+    b = call_fingerprint('generate', 'm', 'sys', 'user', [image.copy()], max_tokens=10)
+    assert a == b
+    image[0, 0, 0] = 1
+    assert call_fingerprint('generate', 'm', 'sys', 'user', image, max_tokens=10) != a
+    assert call_fingerprint('generate', 'm', 'sys', 'user', None, max_tokens=None) == \
+        call_fingerprint('generate', 'm', 'sys', 'user')
+
+
+def test_record_then_replay_offline(tmp_path):
+    path = str(tmp_path / 'calls' / 'cassette.jsonl')
+    recorder = RecordingModel(_Model(), path)
+    recorded = [recorder.function_calling('sys', 'go', retry=3)[0][0] for _ in range(2)]
+    recorder.generate('sys', 'why')
+    assert len(Cassette(path)) == 3
+
+    replay = ReplayModel(path, 'test-model')
+    # retry does not change the fingerprint, the two responses come back in recording order
+    for expected in recorded:
+        call = replay.function_calling('sys', 'go', retry=1)[0][0]
+        assert call.function.name == 'move_forward'
+        assert call.function.arguments == expected['function']['arguments']
+    assert replay.generate('sys', 'why').text == ['answer 3']
+    with pytest.raises(KeyError):
+        replay.generate('sys', 'something else')
+    assert (replay.calls, replay.misses) == (3, 1)
+
+
+def test_replay_loops_or_raises_when_used_up(tmp_path):
+    path = str(tmp_path / 'cassette.jsonl')
+    RecordingModel(_Model(), path).generate('sys', 'why')
+    looping = ReplayModel(path, 'test-model')
+    assert looping.generate('sys', 'why').text == looping.generate('sys', 'why').text
+    strict = ReplayModel(path, 'test-model', loop=False)
+    strict.generate('sys', 'why')
+    with pytest.raises(KeyError):
+        strict.generate('sys', 'why')
+
+
+def test_scripted_model_cycles_a_list_and_calls_a_callable():
+    scripted = ScriptedModel([tool_call('stop', {}), tool_call('turn', {'angle': 90})])
+    names = [scripted.function_calling('sys', 'user')[0][0].function.name for _ in range(3)]
+    assert names == ['stop', 'turn', 'stop']
+
+    prompts = []
+
+    def script(kind, system_prompt, user_prompt, **call):
+        prompts.append((kind, user_prompt))
+        return f'echo {user_prompt}'
+
+    output = ScriptedModel(script).generate('sys', 'hello', num_return_sequences=2)
+    assert output.text == ['echo hello', 'echo hello']
+    assert prompts == [('generate', 'hello')]
+
+
+def test_latency_distribution():
+    assert LatencyDistribution('constant', 0.5).sample() == 0.5
+    assert LatencyDistribution('normal', -10.0, 0.1, seed=0).sample() == 0.0
+    a = [LatencyDistribution('lognormal', 1.0, 0.5, seed=7).sample() for _ in range(2)]
+    assert a[0] == a[1] > 0
+    low, high = 0.1, 0.2
+    assert all(low <= LatencyDistribution('uniform', low, high, seed=i).sample() <= high for i in range(20))
+    with pytest.raises(ValueError):
+        LatencyDistribution('pareto')
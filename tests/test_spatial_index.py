@@ -0,0 +1,124 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.Types import Vector, Road
+from utils.spatial_index import SpatialIndex
+
+
+def _random_roads(rng, n=60, extent=40000):
+    roads = []
+    for _ in range(n):
+        start = Vector(*rng.uniform(-extent, extent, 2))
+        roads.append(Road(start, start + Vector(*rng.uniform(-8000, 8000, 2))))
+    return roads
+
+
+def _brute_segment(roads, position):
+    best = None
+    for i, road in enumerate(roads):
+        d = SpatialIndex._project(position.x, position.y, road.start.x, road.start.y, road.end.x, road.end.y)[3]
+        if best is None or d < best[1]:
+            best = (i, d)
+    return best
+
+
+def test_nearest_segment_matches_brute_force():
+    rng = np.random.default_rng(1)
+    roads = _random_roads(rng)
+    index = SpatialIndex.from_roads(roads, cell_size=5000)
+    for _ in range(200):
+        position = Vector(*rng.uniform(-60000, 60000, 2))
+        segment_id, _, _, d = index.nearest_segment(position)
+        assert d == pytest.approx(_brute_segment(roads, position)[1])
+
+
+def test_nearest_segments_batch_matches_single_queries():
+    rng = np.random.default_rng(2)
+    roads = _random_roads(rng)
+    index = SpatialIndex.from_roads(roads, cell_size=5000)
+    positions = rng.uniform(-60000, 60000, (100, 2))
+    ids, projections, distances = index.nearest_segments(positions)
+    for position, d in zip(positions, distances):
+        assert d == pytest.approx(index.nearest_segment(Vector(*position))[3])
+    assert all(i is not None for i in ids)
+    assert not np.isnan(projections).any()
+
+
+def test_nearest_point_and_points_within_match_brute_force():
+    rng = np.random.default_rng(3)
+    points = [Vector(*p) for p in rng.uniform(-30000, 30000, (80, 2))]
+    index = SpatialIndex.from_roads([], points, cell_size=4000)
+    for _ in range(100):
+        position = Vector(*rng.uniform(-40000, 40000, 2))
+        distances = [position.distance(p) for p in points]
+        point_id, d = index.nearest_point(position)
+        assert d == pytest.approx(min(distances))
+        expected = sorted((i for i, dist in enumerate(distances) if dist <= 8000), key=lambda i: distances[i])
+        assert index.points_within(position, 8000) == expected
+
+
+def test_max_distance_and_empty_index():
+    index = SpatialIndex()
+    assert index.nearest_segment(Vector(0, 0)) is None
+    assert index.nearest_point(Vector(0, 0)) is None
+    index.insert_segment('a', Vector(0, 0), Vector(1000, 0))
+    assert index.nearest_segment(Vector(500, 3000), max_distance=1000) is None
+    segment_id, projection, t, d = index.nearest_segment(Vector(500, 300))
+    assert (segment_id, projection, t, d) == ('a', Vector(500, 0), 0.5, 300)
+
+
+def test_remove_and_reinsert_segment():
+    index = SpatialIndex(cell_size=1000)
+    index.insert_segment('a', Vector(0, 0), Vector(5000, 0))
+    index.insert_segment('b', Vector(0, 10000), Vector(5000, 10000))
+    assert index.nearest_segment(Vector(2500, 100))[0] == 'a'
+    assert index.remove_segment('a')
+    assert not index.remove_segment('a')
+    assert index.nearest_segment(Vector(2500, 100))[0] == 'b'
+    # moving a segment drops it from its old cells
+    index.insert_segment('b', Vector(0, -10000), Vector(5000, -10000))
+    assert len(index) == 1
+    assert index.segments_within(Vector(2500, 10000), 500) == []
+    assert index.segments_within(Vector(2500, -10000), 500) == ['b']
+
+
+def test_nearest_sidewalk_point_is_on_the_position_side():
+    index = SpatialIndex()
+    index.insert_segment(0, Vector(0, 0), Vector(10000, 0))
+    _, above = index.nearest_sidewalk_point(Vector(5000, 3000), offset=1700)
+    _, below = index.nearest_sidewalk_point(Vector(5000, -3000), offset=1700)
+    assert above == Vector(5000, 1700)
+    assert below == Vector(5000, -1700)
+    assert math.isclose(above.distance(below), 3400)
+
+
+def test_far_queries_on_a_sparse_map_match_brute_force():
+    rng = np.random.default_rng(4)
+    # a few clusters far apart on a fine grid, most cells between them are empty
+    roads = []
+    for center in rng.uniform(-1e6, 1e6, (4, 2)):
+        for p in center + rng.uniform(-300, 300, (5, 2)):
+            roads.append(Road(Vector(*p), Vector(*(p + rng.uniform(-50, 50, 2)))))
+    index = SpatialIndex.from_roads(roads, [road.start for road in roads], cell_size=100)
+    positions = rng.uniform(-2e6, 2e6, (20, 2))
+    _, _, distances = index.nearest_segments(positions)
+    for position, d in zip(positions, distances):
+        position = Vector(*position)
+        expected = _brute_segment(roads, position)[1]
+        assert index.nearest_segment(position)[3] == pytest.approx(expected)
+        assert d == pytest.approx(expected)
+        assert index.nearest_point(position)[1] == pytest.approx(min(position.distance(r.start) for r in roads))
+
+
+def test_removals_shrink_the_bounds():
+    index = SpatialIndex(cell_size=100)
+    index.insert_segment('near', Vector(0, 0), Vector(10, 0))
+    index.insert_segment('far', Vector(1e6, 1e6), Vector(1e6 + 10, 1e6))
+    index.remove_segment('far')
+    assert index.nearest_segment(Vector(5e5, 5e5))[0] == 'near'
+    assert index.bounds == (0, 0, 0, 0)
+    index.remove_segment('near')
+    assert index.nearest_segment(Vector(5e5, 5e5)) is None
+    assert index.bounds is None
@@ -0,0 +1,80 @@
+import base64
+import json
+import os
+import threading
+
+from Config import Config
+from llm.trace import TraceSink
+
+
+def read_events(directory):
+    with open(os.path.join(directory, 'trace.jsonl')) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_tracing_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert Config.LLM_TRACE_ENABLED is False
+    sink = TraceSink()
+    assert not sink.record({'kind': 'generate'})
+    assert sink.thread is None and not os.path.exists(Config.LLM_TRACE_DIR)
+
+
+def test_events_are_written_and_images_externalized(tmp_path):
+    sink = TraceSink(directory=str(tmp_path), enabled=True)
+    data = base64.b64encode(b'not really a jpeg').decode()
+    for i in range(3):
+        assert sink.record({'i': i, 'image': f'data:image/jpeg;base64,{data}'})
+    sink.flush()
+    events = read_events(tmp_path)
+    assert [event['i'] for event in events] == [0, 1, 2]
+    ref = events[0]['image']['image_ref']
+    assert all(event['image']['image_ref'] == ref for event in events)
+    with open(os.path.join(tmp_path, ref), 'rb') as f:
+        assert f.read() == b'not really a jpeg'
+    sink.close()
+
+
+def test_flush_while_recording_from_many_threads(tmp_path):
+    sink = TraceSink(directory=str(tmp_path), enabled=True, max_queue=100000)
+
+    def produce(n):
+        for i in range(200):
+            sink.record({'thread': n, 'i': i})
+            if i % 50 == 0:
+                sink.flush()
+
+    threads = [threading.Thread(target=produce, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sink.close()
+    assert len(read_events(tmp_path)) == 1600 == sink.written
+
+
+def test_close_is_terminal(tmp_path):
+    sink = TraceSink(directory=str(tmp_path), enabled=True)
+    sink.record({'i': 0})
+    sink.close()
+    assert not sink.record({'i': 1})
+    assert sink.thread is None
+    sink.flush()
+    assert len(read_events(tmp_path)) == 1
+
+
+def test_unwritable_directory_disables_the_sink(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    sink = TraceSink(directory=str(blocker / 'traces'), enabled=True)
+    assert not sink.record({'i': 0})
+    assert not sink.enabled and sink.thread is None
+
+
+def test_rotation_keeps_backup_count_files(tmp_path):
+    sink = TraceSink(directory=str(tmp_path), enabled=True, max_bytes=200, backup_count=2)
+    for i in range(50):
+        sink.record({'i': i, 'payload': 'x' * 40})
+    sink.close()
+    names = sorted(os.listdir(tmp_path))
+    assert names == ['images', 'trace.1.jsonl', 'trace.2.jsonl', 'trace.jsonl']
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from utils.Types import Vector, Road
+from utils.planner import RoadGraph
+from utils.travel_time import TravelTimeMatrix, multi_source_distances
+
+
+def _ring_graph():
+    # a square of roads plus a long detour, so removing an edge changes some distances
+    corners = [Vector(0, 0), Vector(1000, 0), Vector(1000, 1000), Vector(0, 1000)]
+    roads = [Road(corners[i], corners[(i + 1) % 4]) for i in range(4)]
+    return RoadGraph.from_roads(roads)
+
+
+def _fresh(graph, sources, targets, speed):
+    return TravelTimeMatrix(graph, sources, targets, speed).compute()
+
+
+def test_times_add_access_legs_and_divide_by_speed():
+    graph = _ring_graph()
+    matrix = _fresh(graph, [Vector(0, -30)], [Vector(1000, 1040), Vector(1040, 0)], speed=100)
+    assert matrix.times() == pytest.approx(np.array([[(30 + 2000 + 40) / 100, (30 + 1000 + 40) / 100]]))
+    assert matrix.time(0, 1) == pytest.approx((30 + 1000 + 40) / 100)
+    assert matrix.lookup([0, 0], [1, 0]) == pytest.approx([10.7, 20.7])
+
+
+def test_incremental_updates_match_a_recompute():
+    rng = np.random.default_rng(0)
+    graph = _ring_graph()
+    sources = [Vector(*p) for p in rng.uniform(0, 1000, (5, 2))]
+    targets = [Vector(*p) for p in rng.uniform(0, 1000, (7, 2))]
+    matrix = _fresh(graph, sources, targets, speed=50)
+
+    matrix.add_road(Road(Vector(0, 0), Vector(1000, 1000)))
+    assert matrix.distances == pytest.approx(multi_source_distances(graph, matrix.source_nodes)[:, matrix.target_nodes])
+    assert matrix.version == graph.version
+
+    assert matrix.remove_road(0)
+    assert not matrix.remove_road(0)
+    assert matrix.distances == pytest.approx(multi_source_distances(graph, matrix.source_nodes)[:, matrix.target_nodes])
+
+
+def test_removing_a_bridge_makes_targets_unreachable():
+    graph = RoadGraph.from_roads([Road(Vector(0, 0), Vector(1000, 0))])
+    matrix = _fresh(graph, [Vector(0, 0)], [Vector(1000, 0)], speed=100)
+    assert matrix.time(0, 0) == pytest.approx(10)
+    matrix.remove_road(0)
+    assert matrix.time(0, 0) == np.inf
+
+
+def test_save_and_load_round_trip(tmp_path):
+    graph = _ring_graph()
+    matrix = _fresh(graph, [Vector(0, 0), Vector(500, 0)], [Vector(1000, 1000)], speed=100)
+    path = str(tmp_path / 'times')
+    matrix.save(path)
+    loaded = TravelTimeMatrix.load(path, graph)
+    assert isinstance(loaded.distances, np.memmap)
+    assert loaded.times() == pytest.approx(matrix.times())
+    assert loaded.sources == matrix.sources
+
+
+def test_load_warns_about_a_stale_graph(tmp_path, capsys):
+    graph = _ring_graph()
+    path = str(tmp_path / 'times')
+    _fresh(graph, [Vector(0, 0)], [Vector(1000, 1000)], speed=100).save(path)
+    graph.add_road(Road(Vector(0, 0), Vector(1000, 1000)))
+    TravelTimeMatrix.load(path, graph)
+    assert 'Warning' in capsys.readouterr().out
+
+
+def test_empty_graph_is_rejected():
+    with pytest.raises(ValueError):
+        TravelTimeMatrix(RoadGraph(), [Vector(0, 0)], [Vector(1, 1)])
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from utils.Types import Vector, VectorArray
+
+
+def test_equal_vectors_hash_equal():
+    a = Vector(0.1 + 0.2, 1234.5678901)
+    b = Vector(0.3, 1234.5678904)
+    assert a == b
+    assert hash(a) == hash(b)
+
+
+def test_vectors_work_as_dict_and_set_keys():
+    waypoint = Vector(100.0, -200.0)
+    moved = Vector(100.0, -200.0) + Vector(1e-7, -1e-7)
+    assert moved in {waypoint}
+    assert {waypoint: "supply"}[moved] == "supply"
+    assert len({Vector(1.0, 2.0), Vector(1.0 + 1e-9, 2.0), Vector(3.0, 2.0)}) == 2
+
+
+def test_vector_keeps_full_precision_until_rounded():
+    v = Vector(1.23456789, 2.0)
+    assert v.x == 1.23456789
+    assert v.rounded(2).x == 1.23
+
+
+def test_vector_array_matches_scalar_vectors():
+    rng = np.random.default_rng(0)
+    vectors = [Vector(*rng.uniform(-100, 100, 2)) for _ in range(50)]
+    target = Vector(3.0, -4.0)
+    array = VectorArray.from_vectors(vectors)
+    distances = array.distance(target)
+    for v, d in zip(vectors, distances):
+        assert d == pytest.approx(v.distance(target))
+    normalized = (array - target).normalize()
+    for v, n in zip(vectors, normalized):
+        assert n == (v - target).normalize()
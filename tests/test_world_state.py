@@ -0,0 +1,88 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("UE", reason="the UE package needs the external Base package")
+from UE import Communicator  # noqa: E402
+from UE.unrealcv_fake import FakeUnrealCVServer  # noqa: E402
+from UE.world_state import WorldStateCache  # noqa: E402
+from utils.Types import Vector  # noqa: E402
+
+
+@pytest.fixture
+def world():
+    men = [SimpleNamespace(id=i, position=Vector(i * 100.0, 0.0), direction=Vector(1.0, 0.0)) for i in range(2)]
+    with FakeUnrealCVServer() as server:
+        communicator = Communicator(server.port, server.ip, server.resolution)
+        communicator.spawn_delivery_manager()
+        communicator.spawn_delivery_men(men)
+        try:
+            yield server, communicator
+        finally:
+            communicator.client.disconnect()
+
+
+def test_snapshot_is_served_until_the_ttl_expires(world):
+    server, communicator = world
+    cache = WorldStateCache(communicator, ttl=60)
+    assert cache.get_pose('GEN_DELIVERY_MAN_1') == (100.0, 0.0, 0.0)
+    requests = server.request_count
+    communicator.d_step_forward('GEN_DELIVERY_MAN_1')
+    # still the old snapshot, no request was sent for it
+    assert cache.get_pose('GEN_DELIVERY_MAN_1') == (100.0, 0.0, 0.0)
+    assert server.request_count == requests + 1
+    assert cache.get_pose('GEN_DELIVERY_MAN_1', fresh=True) == (200.0, 0.0, 0.0)
+    assert cache.refreshes == 2
+
+
+def test_tracked_actors_outside_the_payload_are_batched(world):
+    server, communicator = world
+    communicator.spawn('/Game/Props/BP_Cone.BP_Cone_C', 'cone')
+    communicator.set_location((5.0, 6.0, 0.0), 'cone')
+    communicator.set_orientation((0.0, 45.0, 0.0), 'cone')
+    cache = WorldStateCache(communicator, ttl=60, actor_names=['cone', 'ghost'])
+    positions, yaws, found = cache.get_poses(['GEN_DELIVERY_MAN_0', 'cone', 'ghost'])
+    assert found.tolist() == [True, True, False]
+    assert positions[1].tolist() == [5.0, 6.0] and yaws[1] == 45.0
+
+
+def test_concurrent_readers_share_one_refresh(world, monkeypatch):
+    server, communicator = world
+    cache = WorldStateCache(communicator, ttl=0)
+    cache.snapshot()
+    get_informations = communicator.get_informations
+
+    def slow_get_informations(name):
+        # long enough for every reader to queue behind the first refresh
+        time.sleep(0.2)
+        return get_informations(name)
+
+    monkeypatch.setattr(communicator, 'get_informations', slow_get_informations)
+    barrier = threading.Barrier(8)
+    versions = []
+
+    def read():
+        barrier.wait()
+        versions.append(cache.refresh().version)
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert versions == [2] * len(threads)
+    assert cache.refreshes == 2
+
+
+def test_background_refresh_keeps_the_snapshot_warm(world):
+    server, communicator = world
+    cache = WorldStateCache(communicator, ttl=0.02).start()
+    try:
+        first = cache.current.version
+        time.sleep(0.2)
+        assert cache.current.version > first
+    finally:
+        cache.stop()
+    assert cache.thread is None
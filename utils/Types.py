@@ -1,56 +1,166 @@
-from dataclasses import dataclass
+import numpy as np
+
 
-@dataclass
 class Vector:
-    x: float
-    y: float
+    """2D vector. Values are kept at full precision, call `rounded()` to round explicitly."""
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x: float, y: float):
+        self.x = x
+        self.y = y
+
+    def rounded(self, ndigits: int = 4) -> 'Vector':
+        return Vector(round(self.x, ndigits), round(self.y, ndigits))
 
-    def __post_init__(self):
-        self.x = round(self.x, 4)
-        self.y = round(self.y, 4)
-    
     def normalize(self) -> 'Vector':
         """normalize the vector"""
 
-        magnitude = (self.x ** 2 + self.y ** 2) ** 0.5
+        magnitude = (self.x * self.x + self.y * self.y) ** 0.5
         if magnitude == 0:
             return Vector(0, 0)
-        return Vector(round(self.x / magnitude, 4), round(self.y / magnitude, 4))
-    
+        return Vector(self.x / magnitude, self.y / magnitude)
+
     def __add__(self, other: 'Vector') -> 'Vector':
         return Vector(self.x + other.x, self.y + other.y)
-    
+
     def __sub__(self, other: 'Vector') -> 'Vector':
         return Vector(self.x - other.x, self.y - other.y)
-    
+
     def __mul__(self, other: float) -> 'Vector':
         return Vector(self.x * other, self.y * other)
-    
+
     def __truediv__(self, other: float) -> 'Vector':
         return Vector(self.x / other, self.y / other)
-    
+
     def distance(self, other: 'Vector') -> float:
-        return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2) ** 0.5
-    
+        dx = self.x - other.x
+        dy = self.y - other.y
+        return (dx * dx + dy * dy) ** 0.5
+
     def __eq__(self, other: 'Vector') -> bool:
         # compare two vectors with a tolerance
         return abs(self.x - other.x) < 1e-3 and abs(self.y - other.y) < 1e-3
-    
+
     def __hash__(self) -> int:
-        return hash((self.x, self.y))
-    
+        # quantized to the __eq__ tolerance so that nearly equal vectors land in the same bucket;
+        # pairs straddling a 1e-3 grid line can still differ, use rounded() keys where that matters
+        return hash((round(self.x, 3), round(self.y, 3)))
+
     def dot(self, other: 'Vector') -> float:
-        return round(self.x * other.x + self.y * other.y, 4)
-    
+        return self.x * other.x + self.y * other.y
+
     def cross(self, other: 'Vector') -> float:
-        return round(self.x * other.y - self.y * other.x, 4)
+        return self.x * other.y - self.y * other.x
 
     def length(self) -> float:
-        return round(((self.x ** 2 + self.y ** 2) ** 0.5), 4)
-    
+        return (self.x * self.x + self.y * self.y) ** 0.5
+
     def __str__(self) -> str:
-        return f"Vector(x={self.x}, y={self.y})"
-    
+        return f"Vector(x={round(self.x, 4)}, y={round(self.y, 4)})"
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class VectorArray:
+    """N 2D vectors backed by one (N, 2) float64 array.
+
+    Arithmetic and geometry work on all rows at once and broadcast against a single
+    Vector, another VectorArray of the same length or an (N,) array of scalars.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = np.asarray(data, dtype=np.float64).reshape(-1, 2)
+
+    @classmethod
+    def from_vectors(cls, vectors) -> 'VectorArray':
+        return cls(np.array([(v.x, v.y) for v in vectors], dtype=np.float64))
+
+    def to_vectors(self) -> list:
+        return [Vector(float(x), float(y)) for x, y in self.data]
+
+    @staticmethod
+    def _operand(other):
+        if isinstance(other, VectorArray):
+            return other.data
+        if isinstance(other, Vector):
+            return np.array([other.x, other.y])
+        return np.asarray(other, dtype=np.float64)
+
+    @staticmethod
+    def _scalar(other):
+        other = np.asarray(other, dtype=np.float64)
+        return other[:, None] if other.ndim == 1 else other
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            x, y = self.data[index]
+            return Vector(float(x), float(y))
+        return VectorArray(self.data[index])
+
+    def __iter__(self):
+        return iter(self.to_vectors())
+
+    def __add__(self, other) -> 'VectorArray':
+        return VectorArray(self.data + self._operand(other))
+
+    def __sub__(self, other) -> 'VectorArray':
+        return VectorArray(self.data - self._operand(other))
+
+    def __mul__(self, other) -> 'VectorArray':
+        return VectorArray(self.data * self._scalar(other))
+
+    def __truediv__(self, other) -> 'VectorArray':
+        return VectorArray(self.data / self._scalar(other))
+
+    def length(self) -> np.ndarray:
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+
+    def normalize(self) -> 'VectorArray':
+        lengths = self.length()
+        out = np.zeros_like(self.data)
+        nonzero = lengths > 0
+        out[nonzero] = self.data[nonzero] / lengths[nonzero, None]
+        return VectorArray(out)
+
+    def distance(self, other) -> np.ndarray:
+        """Row-wise distance to a Vector or to the matching rows of another VectorArray."""
+        diff = self.data - self._operand(other)
+        return np.hypot(diff[:, 0], diff[:, 1])
+
+    def pairwise_distance(self, other) -> np.ndarray:
+        """(N, M) distances between every row of self and every row of other."""
+        diff = self.data[:, None, :] - self._operand(other).reshape(-1, 2)[None, :, :]
+        return np.hypot(diff[..., 0], diff[..., 1])
+
+    def dot(self, other) -> np.ndarray:
+        other = self._operand(other)
+        return self.data[:, 0] * other[..., 0] + self.data[:, 1] * other[..., 1]
+
+    def cross(self, other) -> np.ndarray:
+        other = self._operand(other)
+        return self.data[:, 0] * other[..., 1] - self.data[:, 1] * other[..., 0]
+
+    def angle_between(self, other, signed=False) -> np.ndarray:
+        """Angle in degrees from each row to other, in [0, 180] or signed in (-180, 180]."""
+        angles = np.degrees(np.arctan2(self.cross(other), self.dot(other)))
+        return angles if signed else np.abs(angles)
+
+    def __str__(self) -> str:
+        return f"VectorArray({np.round(self.data, 4).tolist()})"
+
     def __repr__(self) -> str:
         return self.__str__()
 
@@ -62,5 +172,3 @@ class Road:
         self.direction = (end - start).normalize()
         self.length = start.distance(end)
         self.center = (start + end) / 2
-
-
@@ -0,0 +1,249 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+
+from utils.Types import Vector, Road
+from utils.spatial_index import SpatialIndex
+
+
+class RoadGraph:
+    """Undirected graph over road segments, weighted by segment length.
+
+    Road endpoints closer than `snap` are merged into one node, so roads that share an
+    intersection are connected. `version` is bumped on every change, which is what path
+    caches key their invalidation on.
+    """
+
+    def __init__(self, snap: float = 1.0, cell_size: float = 5000):
+        self.snap = snap
+        self.nodes = []  # node id -> Vector
+        self.node_ids = {}  # snapped (x, y) -> node id
+        self.adjacency = {}  # node id -> {neighbor id: length}
+        self.roads = {}  # road id -> (node a, node b)
+        self.index = SpatialIndex(cell_size)
+        self.version = 0
+        self.next_road_id = 0
+
+    @classmethod
+    def from_roads(cls, roads, snap: float = 1.0, cell_size: float = 5000):
+        graph = cls(snap, cell_size)
+        for road in roads:
+            graph.add_road(road)
+        return graph
+
+    def _key(self, position: Vector):
+        return (round(position.x / self.snap), round(position.y / self.snap))
+
+    def add_node(self, position: Vector):
+        key = self._key(position)
+        node = self.node_ids.get(key)
+        if node is None:
+            node = len(self.nodes)
+            self.nodes.append(Vector(position.x, position.y))
+            self.node_ids[key] = node
+            self.adjacency[node] = {}
+            self.index.insert_point(node, position)
+        return node
+
+    def add_road(self, road: Road, road_id=None):
+        """Add a road, return its id."""
+        if road_id is None:
+            road_id = self.next_road_id
+            self.next_road_id += 1
+        a, b = self.add_node(road.start), self.add_node(road.end)
+        if a == b:
+            return road_id
+        length = self.nodes[a].distance(self.nodes[b])
+        # parallel roads between the same nodes keep the shorter length
+        self.adjacency[a][b] = min(length, self.adjacency[a].get(b, math.inf))
+        self.adjacency[b][a] = self.adjacency[a][b]
+        self.roads[road_id] = (a, b)
+        self.index.insert_segment(road_id, road.start, road.end)
+        self.version += 1
+        return road_id
+
+    def remove_road(self, road_id):
+        edge = self.roads.pop(road_id, None)
+        if edge is None:
+            return False
+        a, b = edge
+        self.index.remove_segment(road_id)
+        remaining = [self.nodes[u].distance(self.nodes[v]) for u, v in self.roads.values() if {u, v} == {a, b}]
+        if remaining:
+            self.adjacency[a][b] = self.adjacency[b][a] = min(remaining)
+        else:
+            self.adjacency[a].pop(b, None)
+            self.adjacency[b].pop(a, None)
+        self.version += 1
+        return True
+
+    def nearest_node(self, position: Vector):
+        hit = self.index.nearest_point(position)
+        return None if hit is None else hit[0]
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+class RoadPlanner:
+    """A* over a RoadGraph with an LRU cache of (start node, goal node) -> node path.
+
+    The cache is dropped whenever the graph version changes.
+
+    Args:
+        graph (RoadGraph): Graph to plan on.
+        cache_size (int): Maximum number of cached paths.
+    """
+
+    def __init__(self, graph: RoadGraph, cache_size: int = 4096):
+        self.graph = graph
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_version = graph.version
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key):
+        with self.lock:
+            if self.cache_version != self.graph.version:
+                self.cache.clear()
+                self.cache_version = self.graph.version
+            path = self.cache.get(key)
+            if path is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+            return path
+
+    def _store(self, key, path):
+        with self.lock:
+            if self.cache_version != self.graph.version:
+                return
+            self.cache[key] = path
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def shortest_path(self, start: int, goal: int):
+        """Node ids from start to goal (inclusive), None if the goal is unreachable."""
+        key = (start, goal)
+        path = self._cached(key)
+        if path is not None:
+            return list(path)
+        self.misses += 1
+        path = self._astar(start, goal)
+        if path is not None:
+            self._store(key, tuple(path))
+        return path
+
+    def _astar(self, start, goal):
+        nodes, adjacency = self.graph.nodes, self.graph.adjacency
+        target = nodes[goal]
+        g = {start: 0.0}
+        parent = {start: None}
+        heap = [(nodes[start].distance(target), 0.0, start)]
+        closed = set()
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parent[node]
+                return path[::-1]
+            if node in closed:
+                continue
+            closed.add(node)
+            for neighbor, length in adjacency[node].items():
+                new_cost = cost + length
+                if new_cost < g.get(neighbor, math.inf):
+                    g[neighbor] = new_cost
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (new_cost + nodes[neighbor].distance(target), new_cost, neighbor))
+        return None
+
+    def _waypoints(self, path, goal: Vector):
+        waypoints = [self.graph.nodes[node] for node in path]
+        if not waypoints or waypoints[-1].distance(goal) > 0:
+            waypoints.append(goal)
+        return waypoints
+
+    def plan(self, start: Vector, goal: Vector):
+        """Waypoints from the road node nearest to `start` to `goal`.
+
+        Returns the node positions along the shortest road path followed by `goal` itself,
+        or just `[goal]` if either end is off the graph or no path exists.
+        """
+        start_node = self.graph.nearest_node(start)
+        goal_node = self.graph.nearest_node(goal)
+        if start_node is None or goal_node is None:
+            return [goal]
+        path = self.shortest_path(start_node, goal_node)
+        if path is None:
+            return [goal]
+        return self._waypoints(path, goal)
+
+    def plan_batch(self, starts, goals):
+        """Plan for many agents in one call.
+
+        Agents sharing a goal node are served by one Dijkstra search grown from that goal
+        (roads are undirected), instead of one A* per agent; the paths go into the cache.
+        """
+        goals = list(goals)
+        start_nodes = [self.graph.nearest_node(start) for start in starts]
+        goal_nodes = [self.graph.nearest_node(goal) for goal in goals]
+        plans = [None] * len(goals)
+        by_goal = {}
+        for i, (s, g) in enumerate(zip(start_nodes, goal_nodes)):
+            if s is None or g is None:
+                plans[i] = [goals[i]]
+                continue
+            path = self._cached((s, g))
+            if path is not None:
+                plans[i] = self._waypoints(path, goals[i])
+            else:
+                by_goal.setdefault(g, []).append(i)
+
+        for goal_node, rows in by_goal.items():
+            if len(rows) == 1:
+                i = rows[0]
+                path = self.shortest_path(start_nodes[i], goal_node)
+                plans[i] = [goals[i]] if path is None else self._waypoints(path, goals[i])
+                continue
+            parent = self._dijkstra_tree(goal_node, {start_nodes[i] for i in rows})
+            for i in rows:
+                self.misses += 1
+                node = start_nodes[i]
+                if node not in parent:
+                    plans[i] = [goals[i]]
+                    continue
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parent[node]
+                self._store((start_nodes[i], goal_node), tuple(path))
+                plans[i] = self._waypoints(path, goals[i])
+        return plans
+
+    def _dijkstra_tree(self, source, targets):
+        # parent pointers towards `source`, stops once every target is settled
+        adjacency = self.graph.adjacency
+        dist = {source: 0.0}
+        parent = {source: None}
+        heap = [(0.0, source)]
+        remaining = set(targets)
+        closed = set()
+        while heap and remaining:
+            cost, node = heapq.heappop(heap)
+            if node in closed:
+                continue
+            closed.add(node)
+            remaining.discard(node)
+            for neighbor, length in adjacency[node].items():
+                new_cost = cost + length
+                if new_cost < dist.get(neighbor, math.inf):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = node
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return {node: parent[node] for node in closed}
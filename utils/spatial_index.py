@@ -0,0 +1,313 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+from utils.Types import Vector, Road
+from Config.config import Config
+
+
+class SpatialIndex:
+    """Uniform grid over road segments and waypoint nodes.
+
+    Segments are registered in every cell their bounding box touches, points in the cell
+    that contains them, so inserts and removals only touch a few cells. Queries walk
+    rings of cells outwards from the query position and stop as soon as no closer item
+    can exist; once a ring would cover more cells than are occupied, the occupied cells left
+    are scanned directly, so a query never visits more cells than the map holds.
+
+    Args:
+        cell_size (float): Grid cell edge length, about the typical road segment length works well.
+    """
+
+    def __init__(self, cell_size: float = 5000):
+        self.cell_size = cell_size
+        self.segment_cells = defaultdict(set)  # cell -> segment ids
+        self.point_cells = defaultdict(set)  # cell -> point ids
+        self.segments = {}  # id -> (x1, y1, x2, y2)
+        self.points = {}  # id -> (x, y)
+        self.bounds = None  # (min cell x, min cell y, max cell x, max cell y)
+        self.bounds_stale = False  # a removal emptied a cell, bounds are recomputed on the next query
+
+    @classmethod
+    def from_roads(cls, roads, waypoints=(), cell_size: float = 5000):
+        """Index built from a list of Roads (ids are list indices) and optional waypoint Vectors."""
+        index = cls(cell_size)
+        for i, road in enumerate(roads):
+            index.insert_road(i, road)
+        for i, point in enumerate(waypoints):
+            index.insert_point(i, point)
+        return index
+
+    def __len__(self):
+        return len(self.segments)
+
+    # ------------------------------------------------------------------ update
+    def _cell(self, x: float, y: float):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _segment_cell_range(self, x1, y1, x2, y2):
+        cx1, cy1 = self._cell(min(x1, x2), min(y1, y2))
+        cx2, cy2 = self._cell(max(x1, x2), max(y1, y2))
+        return [(cx, cy) for cx in range(cx1, cx2 + 1) for cy in range(cy1, cy2 + 1)]
+
+    def _grow(self, cx1, cy1, cx2, cy2):
+        if self.bounds_stale:
+            return
+        if self.bounds is None:
+            self.bounds = (cx1, cy1, cx2, cy2)
+        else:
+            bx1, by1, bx2, by2 = self.bounds
+            self.bounds = (min(bx1, cx1), min(by1, cy1), max(bx2, cx2), max(by2, cy2))
+
+    def insert_segment(self, segment_id, start: Vector, end: Vector):
+        if segment_id in self.segments:
+            self.remove_segment(segment_id)
+        coords = (float(start.x), float(start.y), float(end.x), float(end.y))
+        self.segments[segment_id] = coords
+        cells = self._segment_cell_range(*coords)
+        for cell in cells:
+            self.segment_cells[cell].add(segment_id)
+        self._grow(*cells[0], *cells[-1])
+
+    def insert_road(self, segment_id, road: Road):
+        self.insert_segment(segment_id, road.start, road.end)
+
+    def remove_segment(self, segment_id):
+        coords = self.segments.pop(segment_id, None)
+        if coords is None:
+            return False
+        for cell in self._segment_cell_range(*coords):
+            ids = self.segment_cells.get(cell)
+            if ids is not None:
+                ids.discard(segment_id)
+                if not ids:
+                    del self.segment_cells[cell]
+                    self.bounds_stale = True
+        return True
+
+    def insert_point(self, point_id, position: Vector):
+        if point_id in self.points:
+            self.remove_point(point_id)
+        coords = (float(position.x), float(position.y))
+        self.points[point_id] = coords
+        cell = self._cell(*coords)
+        self.point_cells[cell].add(point_id)
+        self._grow(*cell, *cell)
+
+    def remove_point(self, point_id):
+        coords = self.points.pop(point_id, None)
+        if coords is None:
+            return False
+        cell = self._cell(*coords)
+        ids = self.point_cells.get(cell)
+        if ids is not None:
+            ids.discard(point_id)
+            if not ids:
+                del self.point_cells[cell]
+                self.bounds_stale = True
+        return True
+
+    # ----------------------------------------------------------------- queries
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def _shrink(self):
+        cells = list(self.segment_cells) + list(self.point_cells)
+        if cells:
+            xs, ys = zip(*cells)
+            self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        else:
+            self.bounds = None
+        self.bounds_stale = False
+
+    def _max_ring(self, cx, cy):
+        if self.bounds_stale:
+            self._shrink()
+        if self.bounds is None:
+            return -1
+        bx1, by1, bx2, by2 = self.bounds
+        return max(cx - bx1, bx2 - cx, cy - by1, by2 - cy, 0)
+
+    def _rings(self, cx, cy, occupied):
+        # (r, cells) rings outwards; when a ring would cover more cells than are occupied,
+        # the occupied cells at distance r or more come as one last group instead
+        for r in range(self._max_ring(cx, cy) + 1):
+            if (2 * r + 1) ** 2 > len(occupied):
+                yield r, [cell for cell in list(occupied) if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= r]
+                return
+            yield r, self._ring(cx, cy, r)
+
+    @staticmethod
+    def _project(x, y, x1, y1, x2, y2):
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / length2))
+        px, py = x1 + t * dx, y1 + t * dy
+        return px, py, t, math.hypot(x - px, y - py)
+
+    def nearest_segment(self, position: Vector, max_distance: float = math.inf):
+        """Closest segment to a position.
+
+        Returns:
+            (segment_id, projection (Vector), t along the segment in [0, 1], distance),
+            or None if no segment is within max_distance.
+        """
+        x, y = float(position.x), float(position.y)
+        cx, cy = self._cell(x, y)
+        best = None
+        seen = set()
+        for r, cells in self._rings(cx, cy, self.segment_cells):
+            # every segment not seen yet is at least (r - 1) cells away
+            if best is not None and (r - 1) * self.cell_size > best[3]:
+                break
+            if (r - 1) * self.cell_size > max_distance:
+                break
+            for cell in cells:
+                for segment_id in self.segment_cells.get(cell, ()):
+                    if segment_id in seen:
+                        continue
+                    seen.add(segment_id)
+                    px, py, t, d = self._project(x, y, *self.segments[segment_id])
+                    if d <= max_distance and (best is None or d < best[3]):
+                        best = (segment_id, Vector(px, py), t, d)
+        return best
+
+    def nearest_point(self, position: Vector, max_distance: float = math.inf):
+        """Closest waypoint node, (point_id, distance) or None."""
+        x, y = float(position.x), float(position.y)
+        cx, cy = self._cell(x, y)
+        best = None
+        for r, cells in self._rings(cx, cy, self.point_cells):
+            if best is not None and (r - 1) * self.cell_size > best[1]:
+                break
+            if (r - 1) * self.cell_size > max_distance:
+                break
+            for cell in cells:
+                for point_id in self.point_cells.get(cell, ()):
+                    px, py = self.points[point_id]
+                    d = math.hypot(x - px, y - py)
+                    if d <= max_distance and (best is None or d < best[1]):
+                        best = (point_id, d)
+        return best
+
+    def nearest_sidewalk_point(self, position: Vector, offset: float = Config.SIDEWALK_OFFSET):
+        """Projection onto the nearest road, moved `offset` towards the position's side of the road."""
+        hit = self.nearest_segment(position)
+        if hit is None:
+            return None
+        segment_id, projection, _, _ = hit
+        x1, y1, x2, y2 = self.segments[segment_id]
+        direction = Vector(x2 - x1, y2 - y1).normalize()
+        normal = Vector(-direction.y, direction.x)
+        side = 1.0 if direction.cross(position - Vector(x1, y1)) >= 0 else -1.0
+        return segment_id, projection + normal * (offset * side)
+
+    def _cells_in_radius(self, x, y, radius):
+        cx1, cy1 = self._cell(x - radius, y - radius)
+        cx2, cy2 = self._cell(x + radius, y + radius)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield (cx, cy)
+
+    def points_within(self, position: Vector, radius: float):
+        """Ids of the waypoint nodes within radius, sorted by distance."""
+        x, y = float(position.x), float(position.y)
+        hits = []
+        for cell in self._cells_in_radius(x, y, radius):
+            for point_id in self.point_cells.get(cell, ()):
+                px, py = self.points[point_id]
+                d = math.hypot(x - px, y - py)
+                if d <= radius:
+                    hits.append((d, point_id))
+        return [point_id for _, point_id in sorted(hits, key=lambda hit: hit[0])]
+
+    def segments_within(self, position: Vector, radius: float):
+        """Ids of the segments passing within radius, sorted by distance."""
+        x, y = float(position.x), float(position.y)
+        hits = {}
+        for cell in self._cells_in_radius(x, y, radius):
+            for segment_id in self.segment_cells.get(cell, ()):
+                if segment_id in hits:
+                    continue
+                d = self._project(x, y, *self.segments[segment_id])[3]
+                hits[segment_id] = d
+        return [segment_id for segment_id, d in sorted(hits.items(), key=lambda hit: hit[1]) if d <= radius]
+
+    # ------------------------------------------------------------------- batch
+    def nearest_segments(self, positions, max_distance: float = math.inf):
+        """Nearest segment for many positions at once.
+
+        Candidates are gathered per grid cell, then every position of that cell is projected
+        onto all of them with NumPy.
+
+        Args:
+            positions: (N, 2) array-like or VectorArray.
+
+        Returns:
+            ids (list): segment id per position, None where nothing is within max_distance.
+            projections (np.ndarray): (N, 2), NaN where nothing was found.
+            distances (np.ndarray): (N,), inf where nothing was found.
+        """
+        positions = np.asarray(getattr(positions, 'data', positions), dtype=np.float64).reshape(-1, 2)
+        n = len(positions)
+        ids = [None] * n
+        projections = np.full((n, 2), np.nan)
+        distances = np.full(n, np.inf)
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        groups = defaultdict(list)
+        for i, cell in enumerate(map(tuple, cells)):
+            groups[cell].append(i)
+
+        for (cx, cy), rows in groups.items():
+            rows = np.array(rows)
+            # candidates: rings until a hit exists and the next ring cannot be closer for any row
+            candidates = []
+            seen = set()
+            worst = math.inf
+            for r, ring in self._rings(cx, cy, self.segment_cells):
+                if (r - 1) * self.cell_size > min(worst, max_distance):
+                    break
+                count = len(candidates)
+                for cell in ring:
+                    for segment_id in self.segment_cells.get(cell, ()):
+                        if segment_id not in seen:
+                            seen.add(segment_id)
+                            candidates.append(segment_id)
+                if len(candidates) > count:
+                    worst = float(self._project_many(positions[rows], candidates)[2].max())
+            if not candidates:
+                continue
+            best, proj, dist = self._project_many(positions[rows], candidates)
+            ok = dist <= max_distance
+            for k in np.flatnonzero(ok):
+                ids[rows[k]] = candidates[best[k]]
+            projections[rows[ok]] = proj[ok]
+            distances[rows[ok]] = dist[ok]
+        return ids, projections, distances
+
+    def _project_many(self, points, segment_ids):
+        segments = np.array([self.segments[segment_id] for segment_id in segment_ids])
+        start, delta = segments[:, :2], segments[:, 2:] - segments[:, :2]
+        length2 = np.einsum('ij,ij->i', delta, delta)
+        rel = points[:, None, :] - start[None, :, :]
+        t = np.einsum('nmj,mj->nm', rel, delta) / np.where(length2 == 0, 1, length2)
+        t = np.clip(np.where(length2 == 0, 0, t), 0, 1)
+        proj = start[None, :, :] + t[..., None] * delta[None, :, :]
+        d = np.hypot(*(points[:, None, :] - proj).transpose(2, 0, 1))
+        best = np.argmin(d, axis=1)
+        rows = np.arange(len(points))
+        return best, proj[rows, best], d[rows, best]
+
+    def points_within_batch(self, positions, radius: float):
+        """points_within for many positions, one list of ids per position."""
+        positions = np.asarray(getattr(positions, 'data', positions), dtype=np.float64).reshape(-1, 2)
+        return [self.points_within(Vector(x, y), radius) for x, y in positions]
@@ -0,0 +1,172 @@
+import heapq
+import json
+
+import numpy as np
+
+from utils.Types import Vector
+from Config.config import Config
+
+
+def multi_source_distances(graph, sources):
+    """(len(sources), len(graph)) shortest road distances from every source node to every node."""
+    out = np.empty((len(sources), len(graph)))
+    for i, source in enumerate(sources):
+        out[i] = single_source_distances(graph, source)
+    return out
+
+
+def single_source_distances(graph, source):
+    """Dijkstra from one node, (len(graph),) distances."""
+    dist = np.full(len(graph), np.inf)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if cost > dist[node]:
+            continue
+        for neighbor, length in graph.adjacency[node].items():
+            new_cost = cost + length
+            if new_cost < dist[neighbor]:
+                dist[neighbor] = new_cost
+                heapq.heappush(heap, (new_cost, neighbor))
+    return dist
+
+
+class TravelTimeMatrix:
+    """Many-to-many travel times between supply points and destinations over a RoadGraph.
+
+    Every point is attached to its nearest road node; the matrix stores node-to-node road
+    distances and a lookup adds the straight-line access legs and divides by `speed`.
+    Road changes are applied incrementally with `add_road` / `remove_road`.
+
+    Args:
+        graph (RoadGraph): Road network.
+        sources (list): Supply point positions (Vector).
+        targets (list): Destination positions (Vector).
+        speed (float): Travel speed in cm/s.
+    """
+
+    def __init__(self, graph, sources, targets, speed=Config.MIN_SPEED):
+        self.graph = graph
+        self.speed = speed
+        self.sources = [Vector(p.x, p.y) for p in sources]
+        self.targets = [Vector(p.x, p.y) for p in targets]
+        self.source_nodes, self.source_access = self._attach(self.sources)
+        self.target_nodes, self.target_access = self._attach(self.targets)
+        self.distances = None  # (S, T) road distances between the attached nodes
+        self.version = None  # graph version the distances are valid for
+
+    def _attach(self, points):
+        nodes = np.zeros(len(points), dtype=np.int64)
+        access = np.zeros(len(points))
+        for i, point in enumerate(points):
+            node = self.graph.nearest_node(point)
+            if node is None:
+                raise ValueError("Road graph has no nodes")
+            nodes[i] = node
+            access[i] = point.distance(self.graph.nodes[node])
+        return nodes, access
+
+    def compute(self):
+        self.distances = multi_source_distances(self.graph, self.source_nodes)[:, self.target_nodes]
+        self.version = self.graph.version
+        return self
+
+    # ------------------------------------------------------------------ lookup
+    def lookup(self, source_ids, target_ids):
+        """Travel times in seconds for matching (source, target) index pairs, inf if unreachable."""
+        source_ids = np.asarray(source_ids, dtype=np.int64)
+        target_ids = np.asarray(target_ids, dtype=np.int64)
+        distance = self.source_access[source_ids] + self.distances[source_ids, target_ids] + \
+            self.target_access[target_ids]
+        return distance / self.speed
+
+    def time(self, source_id, target_id):
+        return float(self.lookup([source_id], [target_id])[0])
+
+    def times(self):
+        """Full (S, T) travel time matrix in seconds."""
+        return (self.source_access[:, None] + self.distances + self.target_access[None, :]) / self.speed
+
+    # ------------------------------------------------------------- incremental
+    def _node_rows(self, node_distances):
+        return node_distances[self.source_nodes], node_distances[self.target_nodes]
+
+    def add_road(self, road):
+        """Add a road to the graph and relax the matrix through it with two searches."""
+        road_id = self.graph.add_road(road)
+        if road_id not in self.graph.roads:
+            return road_id
+        u, v = self.graph.roads[road_id]
+        w = self.graph.adjacency[u][v]
+        su, tu = self._node_rows(single_source_distances(self.graph, u))
+        sv, tv = self._node_rows(single_source_distances(self.graph, v))
+        # undirected: d(s, u) == d(u, s), so both searches give source and target legs
+        through = np.minimum(su[:, None] + w + tv[None, :], sv[:, None] + w + tu[None, :])
+        np.minimum(self.distances, through, out=self.distances)
+        self.version = self.graph.version
+        return road_id
+
+    def remove_road(self, road_id):
+        """Remove a road and recompute only the source rows whose shortest-path tree could use it."""
+        edge = self.graph.roads.get(road_id)
+        if edge is None:
+            return False
+        u, v = edge
+        w = self.graph.adjacency[u][v]
+        su = single_source_distances(self.graph, u)[self.source_nodes]
+        sv = single_source_distances(self.graph, v)[self.source_nodes]
+        self.graph.remove_road(road_id)
+        if v in self.graph.adjacency[u] and self.graph.adjacency[u][v] <= w:
+            # a parallel road of the same length still connects u and v
+            self.version = self.graph.version
+            return True
+        # the edge is in some shortest-path tree of s only if it is tight for s
+        tight = np.isclose(np.abs(su - sv), w) & np.isfinite(su)
+        rows = np.flatnonzero(tight)
+        if len(rows):
+            self.distances[rows] = multi_source_distances(self.graph, self.source_nodes[rows])[:, self.target_nodes]
+        self.version = self.graph.version
+        return True
+
+    # ------------------------------------------------------------- persistence
+    def save(self, path):
+        """Write `{path}.npy` (the distance matrix) and `{path}.json` (the attachment metadata)."""
+        np.save(f'{path}.npy', np.ascontiguousarray(self.distances, dtype=np.float64))
+        meta = {
+            'speed': self.speed,
+            'version': self.version,
+            'sources': [[p.x, p.y] for p in self.sources],
+            'targets': [[p.x, p.y] for p in self.targets],
+            'source_nodes': self.source_nodes.tolist(),
+            'source_access': self.source_access.tolist(),
+            'target_nodes': self.target_nodes.tolist(),
+            'target_access': self.target_access.tolist(),
+        }
+        with open(f'{path}.json', 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, graph=None, mmap_mode='r'):
+        """Load a saved matrix, memory-mapped by default.
+
+        Use mmap_mode='r+' to apply incremental updates to the file in place. When `graph`
+        is given, the matrix must have been computed for the same graph version.
+        """
+        with open(f'{path}.json', 'r') as f:
+            meta = json.load(f)
+        matrix = cls.__new__(cls)
+        matrix.graph = graph
+        matrix.speed = meta['speed']
+        matrix.sources = [Vector(x, y) for x, y in meta['sources']]
+        matrix.targets = [Vector(x, y) for x, y in meta['targets']]
+        matrix.source_nodes = np.array(meta['source_nodes'], dtype=np.int64)
+        matrix.source_access = np.array(meta['source_access'])
+        matrix.target_nodes = np.array(meta['target_nodes'], dtype=np.int64)
+        matrix.target_access = np.array(meta['target_access'])
+        matrix.distances = np.load(f'{path}.npy', mmap_mode=mmap_mode)
+        matrix.version = meta['version']
+        if graph is not None and graph.version != matrix.version:
+            print(f"Warning: travel times in {path} were computed for graph version {matrix.version}, "
+                  f"the graph is at version {graph.version}")
+        return matrix
@@ -8,7 +8,7 @@ from typing import Optional
 
 def estimated_delivery_time(store_position: Vector, customer_position: Vector):
     distance = (store_position - customer_position).length()
-    return (distance / Config.DELIVERY_MAN_MIN_SPEED) * 3
+    return (distance / Config.MIN_SPEED) * 3
 
 def visualize_map(map_obj: Map, save_path: Optional[str] = None):
     """